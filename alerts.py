@@ -0,0 +1,322 @@
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+from metrics import timed
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Подписки и уже отправленные ставки переживают перезапуск бота
+ALERTS_DB = os.environ.get("ALERTS_DB", "alerts.db")
+
+# Существенное изменение уже отправленной ставки: коэффициент (относительно) или EDGE (абсолютно)
+ALERT_ODDS_CHANGE = float(os.environ.get("ALERT_ODDS_CHANGE", "0.05"))
+ALERT_EDGE_CHANGE = float(os.environ.get("ALERT_EDGE_CHANGE", "0.02"))
+ALERT_SEEN_TTL_HOURS = float(os.environ.get("ALERT_SEEN_TTL_HOURS", "72"))
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота и ~1 в секунду на чат
+ALERT_RATE = float(os.environ.get("ALERT_RATE", "25"))
+ALERT_CHAT_INTERVAL = float(os.environ.get("ALERT_CHAT_INTERVAL", "1.1"))
+ALERT_BETS_PER_MESSAGE = int(os.environ.get("ALERT_BETS_PER_MESSAGE", "5"))
+
+
+def alert_key(bet: Dict) -> str:
+    """
+    Ключ ставки в seen-множестве: лига, матч и тип ставки
+
+    Время начала в ключ не входит: фид может сдвигать его между прогонами,
+    а повтор той же пары в лиге отделяет ALERT_SEEN_TTL_HOURS.
+    """
+    return f"{bet.get('league', '')}|{bet['match']}|{bet['bet_type']}"
+
+
+def parse_chat_id(value: str):
+    """id чата из хранилища: число или @username канала"""
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+class AlertStore:
+    """
+    Подписанные чаты и seen-множество отправленных ставок в SQLite
+
+    chat_id хранится строкой: подписан может быть и канал по @username.
+    """
+
+    def __init__(self, path: str = ALERTS_DB):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._migrate_subscribers(conn)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS subscribers ("
+                "chat_id TEXT PRIMARY KEY, subscribed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                "key TEXT PRIMARY KEY, odds REAL, edge REAL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_updated ON seen (updated_at)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def _migrate_subscribers(conn: sqlite3.Connection):
+        """Таблица прежних версий с chat_id INTEGER: переносит подписки в TEXT-колонку"""
+        columns = {name: type_ for _, name, type_, *_ in conn.execute("PRAGMA table_info(subscribers)")}
+        if columns.get("chat_id", "TEXT").upper() == "TEXT":
+            return
+        with conn:
+            conn.execute("ALTER TABLE subscribers RENAME TO subscribers_old")
+            conn.execute("CREATE TABLE subscribers (chat_id TEXT PRIMARY KEY, subscribed_at REAL NOT NULL)")
+            conn.execute("INSERT INTO subscribers SELECT CAST(chat_id AS TEXT), subscribed_at FROM subscribers_old")
+            conn.execute("DROP TABLE subscribers_old")
+        logger.info("🗄️ Подписки перенесены в формат с chat_id TEXT")
+
+    def _execute(self, sql: str, params=()) -> List[tuple]:
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def subscribe(self, chat_id) -> bool:
+        """Подписывает чат (id или @username канала); False - если уже был подписан"""
+        if self.is_subscribed(chat_id):
+            return False
+        self._execute("INSERT OR IGNORE INTO subscribers VALUES (?, ?)", (str(chat_id), time.time()))
+        return True
+
+    def unsubscribe(self, chat_id) -> bool:
+        if not self.is_subscribed(chat_id):
+            return False
+        self._execute("DELETE FROM subscribers WHERE chat_id = ?", (str(chat_id),))
+        return True
+
+    def is_subscribed(self, chat_id) -> bool:
+        return bool(self._execute("SELECT 1 FROM subscribers WHERE chat_id = ?", (str(chat_id),)))
+
+    def subscribers(self) -> list:
+        rows = self._execute("SELECT chat_id FROM subscribers ORDER BY subscribed_at, rowid")
+        return [parse_chat_id(row[0]) for row in rows]
+
+    def seen(self, keys: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+        """{ключ: (odds, edge)} для уже отправленных ставок из keys"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        result = {}
+        conn = self._connect()
+        try:
+            # Не больше 500 параметров на запрос (лимит SQLite - 999)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, odds, edge FROM seen WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                result.update((key, (odds, edge)) for key, odds, edge in rows)
+        finally:
+            conn.close()
+        return result
+
+    def mark_seen(self, bets: List[Dict]):
+        now = time.time()
+        self._execute_many(
+            "INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?)",
+            [(alert_key(bet), bet["odds"], bet["edge"], now) for bet in bets],
+        )
+
+    def _execute_many(self, sql: str, rows: List[tuple]):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(sql, rows)
+        finally:
+            conn.close()
+
+    def prune(self, max_age_hours: float = ALERT_SEEN_TTL_HOURS) -> int:
+        """Удаляет ставки, не обновлявшиеся дольше max_age_hours"""
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(
+                    "DELETE FROM seen WHERE updated_at < ?", (time.time() - max_age_hours * 3600,)
+                ).rowcount
+        finally:
+            conn.close()
+
+
+def select_alerts(bets: List[Dict], seen: Dict[str, Tuple[float, float]],
+                  odds_change: float = ALERT_ODDS_CHANGE,
+                  edge_change: float = ALERT_EDGE_CHANGE) -> List[Tuple[Dict, Optional[Tuple[float, float]]]]:
+    """
+    Новые и существенно изменившиеся ставки
+
+    Returns:
+        пары (ставка, (прежний коэффициент, прежний EDGE) или None для новой)
+    """
+    alerts = []
+    for bet in bets:
+        previous = seen.get(alert_key(bet))
+        if previous is None:
+            alerts.append((bet, None))
+            continue
+        old_odds, old_edge = previous
+        if (abs(bet["odds"] - old_odds) >= odds_change * old_odds
+                or abs(bet["edge"] - old_edge) >= edge_change):
+            alerts.append((bet, previous))
+    return alerts
+
+
+class _Delivery:
+    """Одно сообщение со ставками, разосланное по нескольким чатам"""
+
+    __slots__ = ("bets", "remaining", "delivered")
+
+    def __init__(self, bets: List[Dict], chats: int):
+        self.bets = bets
+        self.remaining = chats
+        self.delivered = False
+
+
+class AlertDispatcher:
+    """
+    Рассылка новых VALUE ставок подписанным чатам
+
+    publish() сравнивает результат анализа с seen-множеством и ставит в очередь
+    только новые и существенно изменившиеся ставки - по ALERT_BETS_PER_MESSAGE
+    в одном сообщении. Фоновая задача отправляет очередь с общим лимитом rate
+    сообщений в секунду и не чаще одного сообщения в chat_interval на чат,
+    а на RetryAfter от Telegram выжидает указанное время.
+
+    Ставки попадают в seen-множество только после того, как сообщение с ними
+    обошло все чаты и хотя бы в один было доставлено: неотправленные
+    (ошибка, остановка с непустой очередью) будут предложены снова.
+    """
+
+    def __init__(self, bot, store: AlertStore, format_message: Callable[[List[tuple]], str],
+                 rate: float = ALERT_RATE, chat_interval: float = ALERT_CHAT_INTERVAL,
+                 bets_per_message: int = ALERT_BETS_PER_MESSAGE):
+        self.bot = bot
+        self.store = store
+        self.format_message = format_message
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.bets_per_message = bets_per_message
+        self.sent = 0
+        self.failed = 0
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._pending: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._next_send = 0.0
+        self._next_chat_send: Dict[int, float] = {}
+
+    async def publish(self, bets: List[Dict]) -> int:
+        """Ставит в очередь рассылку новых ставок; возвращает число таких ставок"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.store.prune)
+        seen = await loop.run_in_executor(None, self.store.seen, [alert_key(bet) for bet in bets])
+        # Ставки, которые ещё ждут отправки в очереди, второй раз не ставим
+        alerts = [alert for alert in select_alerts(bets, seen) if alert_key(alert[0]) not in self._pending]
+        if not alerts:
+            return 0
+
+        chats = await loop.run_in_executor(None, self.store.subscribers)
+        if not chats:
+            return 0
+
+        batches = [alerts[start:start + self.bets_per_message]
+                   for start in range(0, len(alerts), self.bets_per_message)]
+        # Чередуем чаты, чтобы лимит на один чат не задерживал остальных
+        for batch in batches:
+            delivery = _Delivery([bet for bet, _ in batch], len(chats))
+            for bet in delivery.bets:
+                key = alert_key(bet)
+                self._pending[key] = self._pending.get(key, 0) + 1
+            text = self.format_message(batch)
+            for chat_id in chats:
+                self._queue.put_nowait((chat_id, text, delivery))
+
+        logger.info(f"🔔 Новых ставок: {len(alerts)}, сообщений в очереди: {len(batches) * len(chats)}")
+        return len(alerts)
+
+    async def _wait_turn(self, chat_id: int):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        send_at = max(now, self._next_send, self._next_chat_send.get(chat_id, 0.0))
+        self._next_send = send_at + 1.0 / self.rate
+        self._next_chat_send[chat_id] = send_at + self.chat_interval
+        if send_at > now:
+            await asyncio.sleep(send_at - now)
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        """Отправляет сообщение с повторами на RetryAfter; True - доставлено"""
+        for attempt in range(3):
+            await self._wait_turn(chat_id)
+            try:
+                with timed("telegram_send"):
+                    await self.bot.send_message(chat_id, text, parse_mode="Markdown")
+                self.sent += 1
+                return True
+            except RetryAfter as e:
+                logger.warning(f"⏳ Flood control Telegram: жду {e.retry_after} сек")
+                self._next_send = asyncio.get_running_loop().time() + e.retry_after
+            except Forbidden:
+                logger.info(f"🚫 Чат {chat_id} заблокировал бота, отписываю")
+                await asyncio.get_running_loop().run_in_executor(None, self.store.unsubscribe, chat_id)
+                return False
+            except TelegramError as e:
+                logger.error(f"❌ Не удалось отправить уведомление в {chat_id}: {e}")
+                break
+        self.failed += 1
+        return False
+
+    async def _finish(self, delivery: _Delivery):
+        """Сообщение обошло все чаты: доставленные ставки - в seen, остальные снова станут кандидатами"""
+        for bet in delivery.bets:
+            key = alert_key(bet)
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+        if delivery.delivered:
+            await asyncio.get_running_loop().run_in_executor(None, self.store.mark_seen, delivery.bets)
+
+    async def _run(self):
+        while True:
+            chat_id, text, delivery = await self._queue.get()
+            try:
+                try:
+                    delivery.delivered |= await self._send(chat_id, text)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка рассылки в {chat_id}: {e}", exc_info=True)
+                delivery.remaining -= 1
+                if not delivery.remaining:
+                    await self._finish(delivery)
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Дожидается отправки очереди (не дольше timeout) и останавливает рассылку"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не отправлено уведомлений: {self._queue.qsize()}")
+        self._task.cancel()
+        self._task = None
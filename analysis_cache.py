@@ -0,0 +1,114 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CachedResult:
+    """Результат анализа с моментом расчёта"""
+
+    __slots__ = ("value", "created_at")
+
+    def __init__(self, value: Any, created_at: float):
+        self.value = value
+        self.created_at = created_at
+
+    @property
+    def age(self) -> float:
+        """Возраст результата в секундах"""
+        return time.monotonic() - self.created_at
+
+
+class AnalysisCache:
+    """
+    Общий TTL-кэш результатов анализа
+
+    Ключ - параметры фильтров. Одновременные запросы с одним ключом
+    ждут один и тот же расчёт, а не запускают его заново.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, CachedResult] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def peek(self, key: Hashable) -> Optional[CachedResult]:
+        """Возвращает свежий результат без расчёта или None"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.age < self.ttl:
+            return entry
+        return None
+
+    def latest(self, key: Hashable) -> Optional[CachedResult]:
+        """Последний опубликованный результат независимо от TTL"""
+        return self._entries.get(key)
+
+    def is_running(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Optional[CachedResult]:
+        """Принудительно пересчитывает ключ; если расчёт уже идёт - пропускает и возвращает None"""
+        if self.is_running(key):
+            return None
+        task = asyncio.ensure_future(self._compute(key, compute))
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> CachedResult:
+        """
+        Возвращает свежий результат из кэша или рассчитывает его
+
+        Args:
+            key: параметры фильтров, например (1.3, 1.9, 0.60)
+            compute: фабрика корутины расчёта, вызывается только при промахе
+        """
+        entry = self.peek(key)
+        if entry is not None:
+            return entry
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, compute))
+            self._inflight[key] = task
+        else:
+            logger.info(f"⏳ Жду уже запущенный анализ для {key}")
+
+        # shield: отмена одного ожидающего не отменяет расчёт для остальных
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> CachedResult:
+        try:
+            started = time.monotonic()
+            value = await compute()
+            entry = CachedResult(value, time.monotonic())
+            self._entries[key] = entry
+            logger.info(f"✅ Анализ для {key} рассчитан за {entry.created_at - started:.2f} сек")
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    def put(self, key: Hashable, value: Any, age: float = 0.0) -> CachedResult:
+        """Публикует готовый результат (например, рассчитанный другой репликой) возраста age секунд"""
+        entry = CachedResult(value, time.monotonic() - age)
+        self._entries[key] = entry
+        return entry
+
+    def invalidate(self, key: Hashable = None):
+        """Сбрасывает один ключ или весь кэш"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+def format_age(seconds: float) -> str:
+    """Человекочитаемый возраст результата"""
+    if seconds < 60:
+        return "только что"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин назад"
+    return f"{minutes // 60} ч {minutes % 60} мин назад"
@@ -0,0 +1,261 @@
+import os
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from deep_analysis_v2 import MIN_EDGE
+from model import EloEngine, TeamXGIndex, market_probabilities
+from real_apis import GENERATED_BOOKMAKERS, value_bet_mask
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Рынок -> (колонка коэффициента, условие выигрыша по голам)
+BACKTEST_MARKETS = {
+    "home": ("odds_home", lambda h, a: h > a),
+    "over": ("odds_over_2_5", lambda h, a: h + a > 2.5),
+    "under": ("odds_under_2_5", lambda h, a: h + a < 2.5),
+    "both_score": ("odds_both_score", lambda h, a: (h > 0) & (a > 0)),
+    "double_1x": ("odds_double_1x", lambda h, a: h >= a),
+    "double_x2": ("odds_double_x2", lambda h, a: h <= a),
+}
+
+# Рынки real_apis.analyze_matches: рынок бэктеста -> ключ коэффициента в ANALYSIS_MARKETS
+ANALYSIS_MARKET_KEYS = {
+    "over": "over_2_5",
+    "under": "under_2_5",
+    "both_score": "both_score",
+    "double_1x": "double_1x",
+    "double_x2": "double_x2",
+}
+
+# deep_analysis_v2.find_value_bets ставит П1 по коэффициенту на победу хозяев
+MATCH_MARKET = "home"
+
+# Порог вероятности, с которого _value_bet ставит П1 (ниже - 1X или П2 по расчётному
+# коэффициенту, которого нет в линии; такие ставки в бэктест не входят)
+MATCH_HOME_PROBABILITY = 0.60
+
+# Фильтры по умолчанию - те же, что у бота
+DEFAULT_PARAMS = {
+    # real_apis.analyze_matches (двойные шансы - в DOUBLE_ODDS_RANGE, от MIN_BOOKMAKERS котировок)
+    "min_value": 0.025,
+    "odd_min": 1.3,
+    "odd_max": 3.5,
+    # deep_analysis_v2.find_value_bets; min_probability - порог обеих стратегий
+    "match_odd_min": 1.3,
+    "match_odd_max": 1.9,
+    "min_probability": 0.60,
+    "min_edge": MIN_EDGE,
+}
+
+# Разница Elo в 400 пунктов меняет ожидаемые голы примерно в e^0.5 раз
+ELO_XG_SCALE = 800.0
+
+CALIBRATION_BINS = np.linspace(0.0, 1.0, 11)
+
+
+def prepare_backtest(history: pd.DataFrame, rho: float = 0.0) -> pd.DataFrame:
+    """
+    Модельные вероятности рынков для каждого исторического матча
+
+    Используется только информация до даты матча: Elo до матча и средние xG
+    по предыдущим играм команд. Возвращает history, отсортированную по дате,
+    с колонками prob_<рынок> и won_<рынок>.
+    """
+    frame = history.assign(date=pd.to_datetime(history['date'])).sort_values('date', kind="stable")
+    frame = frame.reset_index(drop=True)
+
+    # Рейтинги до матча: EloEngine.update возвращает их без заглядывания вперёд
+    frame = EloEngine().update(frame).reset_index(drop=True)
+
+    # Средние xG строго до даты матча
+    index = TeamXGIndex.from_frame(frame)
+    home_xg = np.array([index.query(t, d)[0] for t, d in zip(frame['home_team'].tolist(), frame['date'].tolist())])
+    away_xg = np.array([index.query(t, d)[1] for t, d in zip(frame['away_team'].tolist(), frame['date'].tolist())])
+
+    tilt = np.exp((frame['home_elo'].to_numpy() - frame['away_elo'].to_numpy()) / ELO_XG_SCALE)
+    probs = market_probabilities(home_xg * tilt, away_xg / tilt, rho=rho)
+
+    home_goals = frame['home_goals'].to_numpy()
+    away_goals = frame['away_goals'].to_numpy()
+    columns = {}
+    for market, (_, won) in BACKTEST_MARKETS.items():
+        columns[f"prob_{market}"] = probs[market]
+        columns[f"won_{market}"] = won(home_goals, away_goals)
+    return frame.assign(**columns)
+
+
+def _prior_rates(dates: np.ndarray, won: np.ndarray) -> np.ndarray:
+    """Частота исхода по матчам строго до даты (со сглаживанием Лапласа)"""
+    daily = pd.DataFrame({"won": won.astype(float), "count": 1.0}).groupby(dates).sum()
+    before = daily.cumsum().shift(1, fill_value=0.0)
+    rates = (before["won"] + 1) / (before["count"] + 2)
+    return rates.reindex(dates).to_numpy()
+
+
+def add_synthetic_odds(frame: pd.DataFrame, margin: float = 0.04, noise: float = 0.05,
+                       seed: int = 0, bookmakers: int = len(GENERATED_BOOKMAKERS)) -> pd.DataFrame:
+    """
+    Закрывающие коэффициенты для прогона без реального фида
+
+    "Рынок" оценивает исход по его частоте во всех матчах до даты - без модели,
+    иначе EDGE считался бы от собственных вероятностей модели и был бы круговым.
+    Такой прогон показывает, насколько модель лучше базовых частот; для оценки
+    стратегии против букмекеров нужны настоящие odds_* и число котировок bookmakers.
+    """
+    rng = np.random.default_rng(seed)
+    dates = frame['date'].to_numpy()
+    columns = {"bookmakers": np.full(len(frame), bookmakers)}
+    for market, (odds_column, _) in BACKTEST_MARKETS.items():
+        base_rate = _prior_rates(dates, frame[f"won_{market}"].to_numpy())
+        market_prob = np.clip(base_rate * rng.normal(1.0, noise, len(frame)), 0.02, 0.98)
+        columns[odds_column] = (1 + margin) / market_prob
+    return frame.assign(**columns)
+
+
+def select_bets(frame: pd.DataFrame, params: Optional[Dict] = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Ставки, которые бот сделал бы на матчах frame
+
+    Рынки ANALYSIS_MARKET_KEYS отбираются real_apis.value_bet_mask (правила
+    analyze_matches), П1 - по правилам deep_analysis_v2.find_value_bets.
+    Нужны колонки prob_*, odds_* и bookmakers (число котировок).
+
+    Returns:
+        (рынки, odds, selected): odds и selected - массивы матчи × рынки
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    analysis = [m for m in ANALYSIS_MARKET_KEYS if BACKTEST_MARKETS[m][0] in frame]
+    markets = analysis + ([MATCH_MARKET] if BACKTEST_MARKETS[MATCH_MARKET][0] in frame else [])
+
+    probs = np.column_stack([frame[f"prob_{m}"].to_numpy(dtype=float) for m in markets])
+    odds = np.column_stack([frame[BACKTEST_MARKETS[m][0]].to_numpy(dtype=float) for m in markets])
+
+    counts = np.broadcast_to(frame["bookmakers"].to_numpy()[:, None], (len(frame), len(analysis)))
+    selected = value_bet_mask(
+        [ANALYSIS_MARKET_KEYS[m] for m in analysis], odds[:, :len(analysis)], counts, probs[:, :len(analysis)],
+        params["min_value"], params["odd_min"], params["odd_max"], params["min_probability"],
+    )
+
+    if MATCH_MARKET in markets:
+        home_prob, home_odds = probs[:, -1], odds[:, -1]
+        home = (
+            (home_odds >= params["match_odd_min"]) & (home_odds <= params["match_odd_max"])
+            & (home_prob >= max(params["min_probability"], MATCH_HOME_PROBABILITY))
+            & (home_prob - 1 / home_odds > params["min_edge"])
+        )
+        selected = np.column_stack([selected, home])
+    return markets, odds, selected
+
+
+def run_backtest(frame: pd.DataFrame, params: Optional[Dict] = None) -> Dict:
+    """
+    Отбирает ставки, как бот (select_bets), рассчитывает их по результатам и считает метрики
+
+    Ставка - 1 единица.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    markets, odds, selected = select_bets(frame, params)
+    probs = np.column_stack([frame[f"prob_{m}"].to_numpy() for m in markets])
+    won = np.column_stack([frame[f"won_{m}"].to_numpy() for m in markets])
+
+    profit = np.where(won, odds - 1, -1.0) * selected
+    bets = int(selected.sum())
+    wins = int((won & selected).sum())
+    total_profit = float(profit.sum())
+
+    # Просадка по дневному P&L в хронологическом порядке
+    daily = pd.Series(profit.sum(axis=1)).groupby(frame['date'].to_numpy()).sum()
+    equity = daily.cumsum().to_numpy()
+    drawdown = float(np.max(np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:] - equity)) if len(equity) else 0.0
+
+    return {
+        "params": params,
+        "bets": bets,
+        "wins": wins,
+        "hit_rate": wins / bets if bets else 0.0,
+        "profit": total_profit,
+        "roi": total_profit / bets * 100 if bets else 0.0,
+        "max_drawdown": drawdown,
+        "calibration": calibration(probs[selected], won[selected]),
+    }
+
+
+def calibration(probs: np.ndarray, won: np.ndarray, bins: np.ndarray = CALIBRATION_BINS) -> List[Dict]:
+    """Средняя предсказанная вероятность против фактической частоты по корзинам"""
+    result = []
+    bucket = np.clip(np.digitize(probs, bins) - 1, 0, len(bins) - 2)
+    for i in range(len(bins) - 1):
+        mask = bucket == i
+        count = int(mask.sum())
+        if count:
+            result.append({
+                "bin": (float(bins[i]), float(bins[i + 1])),
+                "count": count,
+                "predicted": float(probs[mask].mean()),
+                "observed": float(won[mask].mean()),
+            })
+    return result
+
+
+_SWEEP_FRAME: Optional[pd.DataFrame] = None
+
+
+def _init_sweep_worker(frame: pd.DataFrame):
+    global _SWEEP_FRAME
+    _SWEEP_FRAME = frame
+
+
+def _sweep_task(params: Dict) -> Dict:
+    return run_backtest(_SWEEP_FRAME, params)
+
+
+def sweep(frame: pd.DataFrame, grid: Dict[str, list], workers: Optional[int] = None) -> List[Dict]:
+    """
+    Перебор сетки фильтров параллельно по процессам
+
+    Args:
+        grid: {параметр: [значения]}, например {"min_value": [0.0, 0.025, 0.05]}
+        workers: число процессов (по умолчанию - число ядер; 1 - без пула)
+
+    Returns:
+        Отчёты run_backtest, отсортированные по ROI
+    """
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(combos) <= 1:
+        reports = [run_backtest(frame, params) for params in combos]
+    else:
+        # Кадр передаётся в каждый процесс один раз через initializer, а не с каждой задачей
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker,
+                                 initargs=(frame,)) as pool:
+            reports = list(pool.map(_sweep_task, combos, chunksize=max(1, len(combos) // (workers * 4))))
+
+    reports.sort(key=lambda r: r["roi"], reverse=True)
+    return reports
+
+
+if __name__ == "__main__":
+    import time
+    from model import load_history
+
+    frame = add_synthetic_odds(prepare_backtest(load_history()))
+    started = time.perf_counter()
+    reports = sweep(frame, {
+        "min_value": [0.0, 0.025, 0.05],
+        "min_probability": [0.6, 0.7],
+        "odd_max": [1.9, 3.5],
+        "min_edge": [0.0, MIN_EDGE, 0.03],
+    })
+    logger.info(f"⏱️ Перебор {len(reports)} комбинаций: {time.perf_counter() - started:.2f} сек")
+
+    for report in reports[:10]:
+        print(f"ROI {report['roi']:+6.1f}% | ставок {report['bets']:4d} | "
+              f"попаданий {report['hit_rate']*100:5.1f}% | просадка {report['max_drawdown']:.1f} | {report['params']}")
@@ -0,0 +1,58 @@
+"""
+Бенчмарк памяти: MatchRecord против вложенных словарей на слейте из 10k матчей
+
+Запуск: python benchmarks/match_memory.py [кол-во матчей]
+"""
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import SyntheticProvider, set_provider
+from real_apis import LEAGUES, generate_realistic_matches
+
+logging.disable(logging.INFO)
+
+
+def build_slate(size: int) -> list:
+    set_provider(SyntheticProvider(seed=42))
+    league_ids = list(LEAGUES.values())
+    slate = []
+    while len(slate) < size:
+        for league_id in league_ids:
+            slate.extend(generate_realistic_matches("bench", league_id))
+    return slate[:size]
+
+
+def measure(factory) -> tuple:
+    """Возвращает (байт на слейт, число живых объектов, отслеживаемых GC)"""
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    tracemalloc.start()
+    data = factory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    objects = len(gc.get_objects()) - objects_before
+    del data
+    gc.collect()
+    return current, objects
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    records_bytes, records_objects = measure(lambda: build_slate(size))
+    dicts_bytes, dicts_objects = measure(lambda: [m.to_dict() for m in build_slate(size)])
+
+    print(f"Матчей: {size}")
+    print(f"MatchRecord:  {records_bytes / 2**20:8.1f} MiB, GC-объектов: {records_objects}")
+    print(f"dict-формат:  {dicts_bytes / 2**20:8.1f} MiB, GC-объектов: {dicts_objects}")
+    print(f"Экономия:     {dicts_bytes / max(records_bytes, 1):8.1f}x по памяти, "
+          f"{dicts_objects / max(records_objects, 1):.1f}x по объектам")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Бенчмарк потока коэффициентов: инкрементальное обновление против полного analyze_matches
+
+Запуск: python benchmarks/odds_stream.py [кол-во тиков] [размер пачки]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from odds_stream import OddsStream, random_ticks, replay
+from providers import SyntheticProvider, set_provider
+from real_apis import MatchSnapshot, analyze_matches
+
+logging.disable(logging.INFO)
+
+
+def main():
+    tick_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    set_provider(SyntheticProvider(seed=42))
+    snapshot = MatchSnapshot()
+    stream = OddsStream(snapshot)
+    ticks = random_ticks(stream, tick_count, seed=42)
+
+    started = time.perf_counter()
+    analyze_matches(snapshot=snapshot)
+    full_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batches = 0
+    for _ in replay(stream, ticks, batch_size):
+        batches += 1
+    stream_time = time.perf_counter() - started
+
+    per_batch = stream_time / max(batches, 1)
+    print(f"Матчей: {len(stream.rows)}, тиков: {len(ticks)}, пачек по {batch_size}: {batches}")
+    print(f"Полный analyze_matches:   {full_time * 1000:8.2f} мс")
+    print(f"Обновление на пачку:      {per_batch * 1000:8.2f} мс")
+    print(f"Обновление на тик:        {stream_time / max(len(ticks), 1) * 1e6:8.1f} мкс")
+    print(f"Изменений применено:      {stream.deltas_applied:8d}")
+    print(f"Ускорение на пачку:       {full_time / max(per_batch, 1e-9):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
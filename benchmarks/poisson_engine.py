@@ -0,0 +1,35 @@
+"""
+Бенчмарк Poisson-движка: матчей в секунду для market_probabilities
+
+Запуск: python benchmarks/poisson_engine.py [кол-во матчей]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import market_probabilities
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = np.random.default_rng(42)
+    home_xg = rng.uniform(0.5, 2.8, size)
+    away_xg = rng.uniform(0.3, 2.2, size)
+
+    for rho in (0.0, -0.1):
+        market_probabilities(home_xg[:100], away_xg[:100], rho=rho)  # прогрев
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            market_probabilities(home_xg, away_xg, rho=rho)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        print(f"rho={rho:+.2f}: {size} матчей за {best * 1000:.1f} мс -> {size / best:,.0f} матчей/сек")
+
+
+if __name__ == "__main__":
+    main()
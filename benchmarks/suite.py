@@ -0,0 +1,264 @@
+"""
+Бенчмарк-набор real_apis и deep_analysis_v2 на слейтах продакшн-размера
+
+Слейты генерирует SyntheticProvider с фиксированным seed: 1k/10k/100k матчей
+и 10-50 букмекеров. Для каждого случая - лучшее время из нескольких прогонов,
+пиковая память (tracemalloc), оставшиеся после прогона блоки и число сборок GC
+(каждая сборка поколения 0 - порядка 700 новых контейнерных объектов).
+Результаты пишутся в JSON (по умолчанию benchmarks/results/<коммит>.json),
+чтобы сравнивать коммиты между собой.
+
+Запуск: python benchmarks/suite.py [--sizes 1000,10000] [--bookmakers 10,50] [--full]
+                                   [--repeat 3] [--workers 1] [--out файл.json] [--compare старый.json]
+"""
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Замеряется генерация слейта, а не чтение его из дискового кэша ответов
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+
+import numpy as np
+
+from deep_analysis_v2 import TEAM_PROFILES, MatchAnalyzer, find_value_bets
+from providers import SyntheticProvider, set_provider
+from real_apis import (ANALYSIS_MARKETS, LEAGUES, MatchSnapshot, analyze_matches, generate_realistic_matches,
+                       get_best_odds)
+
+logging.disable(logging.INFO)
+
+SEED = 42
+BASE_TIME = datetime(2026, 1, 1)
+SIZES = (1_000, 10_000, 100_000)
+BOOKMAKER_COUNTS = (10, 25, 50)
+
+# Слейты крупнее (матчи × букмекеры) запускаются только с --full: 100k × 25 и 100k × 50
+# требуют 1-2 ГБ памяти
+DEFAULT_MAX_CELLS = 1_000_000
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def make_provider(size: int, bookmakers: int = None) -> SyntheticProvider:
+    return SyntheticProvider(
+        SEED, base_time=BASE_TIME,
+        matches_per_league=math.ceil(size / len(LEAGUES)),
+        bookmakers=bookmakers,
+        fixtures_count=size,
+    )
+
+
+def build_slate(provider: SyntheticProvider) -> list:
+    set_provider(provider)
+    return [match for league_name, league_id in LEAGUES.items()
+            for match in generate_realistic_matches(league_name, league_id)]
+
+
+def best_odds_all(slate: list) -> int:
+    market_keys = [market_key for _, market_key, _ in ANALYSIS_MARKETS]
+    for match in slate:
+        bookmakers = match["bookmakers"]
+        for market_key in market_keys:
+            get_best_odds(bookmakers, market_key)
+    return len(slate) * len(market_keys)
+
+
+def match_analyzers(provider: SyntheticProvider) -> list:
+    fixtures = provider.fixtures()
+    odds = provider.fixture_odds(fixtures).tolist()
+    adjustments = provider.match_adjustments(fixtures).tolist()
+    return [
+        MatchAnalyzer(f["home_team"], f["away_team"], f["league"], *o, h2h_adjustment=a[0], motivation_adjustment=a[1])
+        for f, o, a in zip(fixtures, odds, adjustments)
+    ]
+
+
+def analyze_all(analyzers: list) -> int:
+    for analyzer in analyzers:
+        analyzer.analyze_match()
+    return len(analyzers)
+
+
+def measure(run, repeat: int) -> dict:
+    """
+    Лучшее время из repeat прогонов и отдельный прогон под tracemalloc
+
+    run возвращает число элементарных вызовов (для времени на вызов) или None,
+    если замеряется один вызов целиком.
+    """
+    timings = []
+    calls = 1
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        calls = run() or 1
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    collections_before = sum(stats["collections"] for stats in gc.get_stats())
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained = sys.getallocatedblocks() - blocks_before
+    collections = sum(stats["collections"] for stats in gc.get_stats()) - collections_before
+    del result
+    gc.collect()
+
+    best = min(timings)
+    return {
+        "seconds": best,
+        "mean_seconds": sum(timings) / len(timings),
+        "calls": calls,
+        "per_call_us": best / calls * 1e6,
+        "peak_bytes": peak,
+        "retained_blocks": retained,
+        "gc_collections": collections,
+    }
+
+
+def slate_cases(size: int, bookmakers: int):
+    """Случаи real_apis: зависят от числа букмекеров"""
+    provider = make_provider(size, bookmakers)
+    set_provider(provider)
+    yield "generate_realistic_matches", lambda: len(build_slate(provider))
+
+    slate = build_slate(provider)
+    yield "get_best_odds", lambda: best_odds_all(slate)
+
+    snapshot = MatchSnapshot()
+
+    def analyze():
+        analyze_matches(snapshot=snapshot)
+
+    yield "analyze_matches", analyze
+    del slate, snapshot
+
+
+def analysis_cases(size: int, workers: int):
+    """Случаи deep_analysis_v2: коэффициенты фикстур не зависят от числа букмекеров"""
+    provider = make_provider(size)
+    set_provider(provider)
+    TEAM_PROFILES.invalidate()
+    analyzers = match_analyzers(provider)
+    yield "MatchAnalyzer.analyze_match", lambda: analyze_all(analyzers)
+    del analyzers
+
+    def end_to_end():
+        TEAM_PROFILES.invalidate()
+        find_value_bets(provider=provider, workers=workers)
+
+    yield "find_value_bets", end_to_end
+
+
+def run_suite(sizes, bookmaker_counts, repeat: int, workers: int, max_cells: float) -> list:
+    results = []
+
+    def record(case, size, bookmakers, run):
+        row = {"case": case, "matches": size, "bookmakers": bookmakers, **measure(run, repeat)}
+        results.append(row)
+        print(format_row(row), flush=True)
+
+    for size in sizes:
+        for bookmakers in bookmaker_counts:
+            if size * bookmakers > max_cells:
+                print(f"  пропуск {size} × {bookmakers}: больше {max_cells:.0f} ячеек, см. --full")
+                continue
+            for case, run in slate_cases(size, bookmakers):
+                record(case, size, bookmakers, run)
+        for case, run in analysis_cases(size, workers):
+            record(case, size, None, run)
+    return results
+
+
+def format_row(row: dict) -> str:
+    bookmakers = row["bookmakers"] if row["bookmakers"] is not None else "-"
+    per_call = f"{row['per_call_us']:>11.2f} мкс/выз" if row["calls"] > 1 else f"{'':>19}"
+    return (f"{row['case']:<28}{row['matches']:>8}{bookmakers:>5}"
+            f"{row['seconds'] * 1000:>12.1f} мс{per_call}"
+            f"{row['peak_bytes'] / 2**20:>10.1f} MiB{row['retained_blocks']:>9} бл{row['gc_collections']:>6} gc")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def metadata(workers: int, repeat: int) -> dict:
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": SEED,
+        "workers": workers,
+        "repeat": repeat,
+    }
+
+
+def compare(results: list, baseline_path: str):
+    """Печатает изменение времени и пиковой памяти относительно baseline_path"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(row["case"], row["matches"], row["bookmakers"]): row for row in baseline["results"]}
+    print(f"\nСравнение с {baseline['meta'].get('commit', baseline_path)}:")
+    for row in results:
+        old = previous.get((row["case"], row["matches"], row["bookmakers"]))
+        if old is None:
+            continue
+        bookmakers = row["bookmakers"] if row["bookmakers"] is not None else "-"
+        time_delta = row["seconds"] / max(old["seconds"], 1e-12) - 1
+        memory_delta = row["peak_bytes"] / max(old["peak_bytes"], 1) - 1
+        print(f"{row['case']:<28}{row['matches']:>8}{bookmakers:>5}"
+              f"   время {time_delta:+8.1%}   память {memory_delta:+8.1%}")
+
+
+def parse_counts(raw: str) -> tuple:
+    return tuple(int(value) for value in raw.split(",") if value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=parse_counts, default=SIZES)
+    parser.add_argument("--bookmakers", type=parse_counts, default=BOOKMAKER_COUNTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="процессы find_value_bets")
+    parser.add_argument("--full", action="store_true", help="все сочетания, включая 100k × 50")
+    parser.add_argument("--out", help="файл результатов (по умолчанию benchmarks/results/<коммит>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    meta = metadata(args.workers, args.repeat)
+    print(f"Коммит {meta['commit']}, Python {meta['python']}, numpy {meta['numpy']}, CPU: {meta['cpu_count']}")
+    results = run_suite(args.sizes, args.bookmakers, args.repeat, args.workers,
+                        math.inf if args.full else DEFAULT_MAX_CELLS)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{meta['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
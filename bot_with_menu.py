@@ -12,8 +12,16 @@ from telegram.ext import (
 )
 from telegram.request import HTTPXRequest
 
-from deep_analysis_v2 import find_value_bets
-from logger import log_bet
+from deep_analysis_v2 import TOP_LEAGUES, find_candidate_bets, warm_up_process_pool, shutdown_process_pool
+from logger import BET_JOURNAL, log_value_bet
+from analysis_cache import AnalysisCache, format_age
+from scheduler import AnalysisScheduler
+from alerts import AlertDispatcher, AlertStore, parse_chat_id
+from webhook import WEBHOOK_SECRET, WEBHOOK_URL, HttpServer, run_webhook
+from metrics import METRICS, METRICS_PORT, format_stats, metrics_endpoint, timed
+from http_client import current_http_client
+from shared_store import LEADER_POLL_SEC, LeaderElection, open_shared_store
+from user_settings import DEFAULT_SETTINGS, MARKET_TYPES, BetIndex, SettingsStore, UserSettings
 
 logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -29,7 +37,78 @@ if not TELEGRAM_TOKEN:
 if not TELEGRAM_CHAT_ID:
     raise ValueError("❌ TELEGRAM_CHAT_ID не установлен!")
 
-CURRENT_BETS = []
+# Кроме основного чата, /stats доступен этим пользователям (id через запятую)
+ADMIN_USER_IDS = {int(user_id) for user_id in os.environ.get("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError(f"❌ Неизвестный BOT_MODE: {BOT_MODE}")
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise ValueError("❌ WEBHOOK_URL не установлен!")
+if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+    raise ValueError("❌ WEBHOOK_SECRET не установлен!")
+
+# Общий кэш результатов: один полный анализ слейта на всех пользователей,
+# персональные фильтры применяются к нему через BetIndex
+ANALYSIS_CACHE_TTL = float(os.environ.get("ANALYSIS_CACHE_TTL", "300"))
+CURRENT_BETS = AnalysisCache(ttl=ANALYSIS_CACHE_TTL)
+
+ANALYSIS_KEY = "candidates"
+LEAGUE_NAMES = list(TOP_LEAGUES)
+
+# Фоновый пересчёт: 0 минут - отключён, анализ только по кнопке
+ANALYSIS_INTERVAL_MIN = float(os.environ.get("ANALYSIS_INTERVAL_MIN", "5"))
+ANALYSIS_JITTER_SEC = float(os.environ.get("ANALYSIS_JITTER_SEC", "30"))
+
+# Несколько реплик: общее хранилище, анализ считает только лидер
+SHARED_STORE = open_shared_store()
+ELECTION = LeaderElection(SHARED_STORE) if SHARED_STORE is not None else None
+
+if SHARED_STORE is not None and ANALYSIS_INTERVAL_MIN <= 0:
+    raise ValueError("❌ Для общего хранилища нужен фоновый анализ (ANALYSIS_INTERVAL_MIN > 0)")
+if SHARED_STORE is not None and BOT_MODE == "polling":
+    logger.warning("⚠️ Polling не масштабируется: с несколькими репликами используйте BOT_MODE=webhook")
+if SHARED_STORE is not None:
+    BET_JOURNAL.history = SHARED_STORE.history
+
+# Рассылка новых ставок подписчикам после каждого фонового анализа
+ALERTS_ENABLED = os.environ.get("ALERTS_ENABLED", "1") == "1"
+ALERT_STORE = SHARED_STORE.alerts if SHARED_STORE is not None else AlertStore()
+ALERTS: AlertDispatcher = None
+
+USER_SETTINGS = SHARED_STORE.settings if SHARED_STORE is not None else SettingsStore()
+
+# Индекс строится один раз на каждый новый результат анализа
+_BET_INDEX = (None, None)
+
+
+def get_bet_index(result) -> BetIndex:
+    global _BET_INDEX
+    cached_result, index = _BET_INDEX
+    if cached_result is not result:
+        index = BetIndex(result.value)
+        _BET_INDEX = (result, index)
+    return index
+
+
+async def on_analysis_result(result):
+    if ALERTS is not None:
+        await ALERTS.publish(get_bet_index(result).query(DEFAULT_SETTINGS))
+
+
+SCHEDULER = AnalysisScheduler(
+    CURRENT_BETS,
+    ANALYSIS_KEY,
+    find_candidate_bets,
+    interval=ANALYSIS_INTERVAL_MIN * 60,
+    jitter=ANALYSIS_JITTER_SEC,
+    on_result=on_analysis_result,
+    store=SHARED_STORE,
+    election=ELECTION,
+    poll_interval=LEADER_POLL_SEC,
+)
 
 
 def get_main_reply_keyboard():
@@ -75,6 +154,96 @@ def format_bet_card(bet: dict, index: int) -> str:
     return text
 
 
+def format_alert_message(alerts: list) -> str:
+    """Сообщение рассылки: новые ставки и ставки с изменившимся коэффициентом"""
+    text = "🔔 *НОВЫЕ VALUE СТАВКИ*\n\n"
+    for i, (bet, previous) in enumerate(alerts, 1):
+        text += format_bet_card(bet, i)
+        if previous is not None:
+            text += f"   🔄 Было: `{previous[0]:.2f}`, EDGE {previous[1]*100:.1f}%\n"
+        text += "\n"
+    text += "Отписаться: /unsubscribe"
+    return text
+
+
+def alert_chat_id(chat_id: str):
+    """TELEGRAM_CHAT_ID может быть числом или @username канала"""
+    return parse_chat_id(chat_id)
+
+
+async def get_current_bets():
+    """
+    Последний опубликованный фоновым анализом результат; расчёт - только если его ещё нет
+
+    С общим хранилищем считает только лидер: пока он ничего не опубликовал, возвращает None.
+    """
+    if ANALYSIS_INTERVAL_MIN > 0:
+        result = CURRENT_BETS.latest(ANALYSIS_KEY)
+        if result is None and SHARED_STORE is not None:
+            return await SCHEDULER.sync_from_store()
+        if result is not None:
+            return result
+
+    loop = asyncio.get_event_loop()
+    return await CURRENT_BETS.get(
+        ANALYSIS_KEY,
+        lambda: loop.run_in_executor(None, find_candidate_bets)
+    )
+
+
+def has_current_bets() -> bool:
+    if ANALYSIS_INTERVAL_MIN > 0:
+        return CURRENT_BETS.latest(ANALYSIS_KEY) is not None
+    return CURRENT_BETS.peek(ANALYSIS_KEY) is not None
+
+
+def format_settings(settings: UserSettings) -> str:
+    leagues = ", ".join(settings.leagues) if settings.leagues else "все"
+    markets = ", ".join(settings.markets) if settings.markets else "все"
+    return (
+        f"🏆 Лиги: {leagues}\n"
+        f"💰 Коэффициенты: {settings.odds_min:.2f} - {settings.odds_max:.2f}\n"
+        f"🎯 Вероятность: ≥{settings.min_probability*100:.0f}%\n"
+        f"⚡ EDGE: ≥{settings.min_edge*100:.1f}%\n"
+        f"📊 Типы ставок: {markets}\n"
+    )
+
+
+def parse_settings_command(args: list) -> dict:
+    """
+    Разбирает аргументы /set в изменения настроек
+
+    Raises:
+        ValueError: непонятная команда или значение
+    """
+    if not args:
+        raise ValueError("нет параметра")
+    name, values = args[0].lower(), args[1:]
+
+    if name == "prob" and len(values) == 1:
+        return {"min_probability": float(values[0]) / 100}
+    if name == "edge" and len(values) == 1:
+        return {"min_edge": float(values[0]) / 100}
+    if name == "odds" and len(values) == 2:
+        odds_min, odds_max = sorted(float(value) for value in values)
+        return {"odds_min": odds_min, "odds_max": odds_max}
+    if name == "leagues" and values:
+        if values == ["all"]:
+            return {"leagues": ()}
+        numbers = [int(value) for value in values]
+        if any(not 1 <= number <= len(LEAGUE_NAMES) for number in numbers):
+            raise ValueError("нет такой лиги")
+        return {"leagues": tuple(LEAGUE_NAMES[number - 1] for number in numbers)}
+    if name == "markets" and values:
+        if values == ["all"]:
+            return {"markets": ()}
+        markets = tuple(value.upper().replace("Х", "X") for value in values)
+        if any(market not in MARKET_TYPES for market in markets):
+            raise ValueError("неизвестный тип ставки")
+        return {"markets": markets}
+    raise ValueError("неизвестный параметр")
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_keyboard = get_main_reply_keyboard()
 
@@ -94,25 +263,77 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not ALERTS_ENABLED or ANALYSIS_INTERVAL_MIN <= 0:
+        await update.message.reply_text("⚠️ Уведомления сейчас отключены")
+        return
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, ALERT_STORE.subscribe, update.effective_chat.id):
+        text = "🔔 Подписка оформлена: пришлю новые VALUE ставки, как только они появятся"
+    else:
+        text = "🔔 Вы уже подписаны на уведомления"
+    await update.message.reply_text(text, reply_markup=get_main_reply_keyboard())
+
+
+async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, ALERT_STORE.unsubscribe, update.effective_chat.id):
+        text = "🔕 Уведомления отключены. Вернуть: /subscribe"
+    else:
+        text = "🔕 Вы не были подписаны"
+    await update.message.reply_text(text, reply_markup=get_main_reply_keyboard())
+
+
+async def set_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    loop = asyncio.get_running_loop()
+
+    if context.args == ["reset"]:
+        settings = await loop.run_in_executor(None, USER_SETTINGS.reset, user_id)
+    else:
+        try:
+            changes = parse_settings_command(context.args)
+        except (ValueError, IndexError):
+            await update.message.reply_text(
+                "⚠️ Не понял настройку. Примеры:\n"
+                "/set prob 65\n/set edge 3\n/set odds 1.4 2.2\n"
+                "/set leagues 1 3 (или all)\n/set markets П1 1X (или all)\n/set reset",
+                reply_markup=get_main_reply_keyboard()
+            )
+            return
+        settings = await loop.run_in_executor(None, lambda: USER_SETTINGS.update(user_id, **changes))
+
+    await update.message.reply_text(
+        "✅ *Настройки сохранены:*\n\n" + format_settings(settings),
+        parse_mode="Markdown",
+        reply_markup=get_main_reply_keyboard()
+    )
+
+
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
     reply_keyboard = get_main_reply_keyboard()
 
     if text == "🔥 На кого ставить?":
         try:
-            await update.message.reply_text(
-                "⏳ Анализирую букмекеры...\n"
-                "(статистика, форма, травмы, мотивация, история встреч)"
-            )
+            if not has_current_bets() and SHARED_STORE is None:
+                await update.message.reply_text(
+                    "⏳ Анализирую букмекеры...\n"
+                    "(статистика, форма, травмы, мотивация, история встреч)"
+                )
 
-            loop = asyncio.get_event_loop()
-            bets = await loop.run_in_executor(
-                None,
-                find_value_bets,
-                1.3,
-                1.9,
-                0.60
+            result = await get_current_bets()
+            if result is None:
+                await update.message.reply_text(
+                    "⏳ Данные ещё не готовы: первый анализ идёт\n"
+                    "Попробуй через минуту",
+                    reply_markup=reply_keyboard
+                )
+                return
+            settings = await asyncio.get_running_loop().run_in_executor(
+                None, USER_SETTINGS.get, update.effective_user.id
             )
+            bets = get_bet_index(result).query(settings)
 
             if not bets:
                 await update.message.reply_text(
@@ -125,29 +346,33 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text_result = (
                 f"🔥 *НА КОГО СТАВИТЬ? ГЛУБОКИЙ АНАЛИЗ*\n\n"
                 f"Найдено ставок: *{len(bets)}*\n"
-                f"Вероятность: ≥60%\n"
-                f"Коэффициенты: 1.3 - 1.9\n\n"
+                f"Вероятность: ≥{settings.min_probability*100:.0f}%\n"
+                f"Коэффициенты: {settings.odds_min:.2f} - {settings.odds_max:.2f}\n"
+                f"🕒 Данные обновлены: {format_age(result.age)}\n\n"
                 f"{'='*50}\n\n"
             )
 
-            for i, bet in enumerate(bets, 1):
-                text_result += format_bet_card(bet, i)
-                text_result += "\n"
-                log_bet(bet['match'], bet['bet_type'], bet['probability'],
-                        bet['odds'], bet['edge'], 0, True, None)
+            with timed("format"):
+                for i, bet in enumerate(bets, 1):
+                    text_result += format_bet_card(bet, i)
+                    text_result += "\n"
 
-            text_result += (
-                f"{'='*50}\n\n"
-                f"📋 *КАК МЫ РАССЧИТАЛИ:*\n"
-                f"• Форма, Дома/Гости, Травмы, H2H, Мотивация\n"
-                f"• EDGE = наше преимущество над букмекером"
-            )
+                text_result += (
+                    f"{'='*50}\n\n"
+                    f"📋 *КАК МЫ РАССЧИТАЛИ:*\n"
+                    f"• Форма, Дома/Гости, Травмы, H2H, Мотивация\n"
+                    f"• EDGE = наше преимущество над букмекером"
+                )
 
-            await update.message.reply_text(
-                text_result,
-                parse_mode="Markdown",
-                reply_markup=reply_keyboard
-            )
+            for bet in bets:
+                log_value_bet(bet)
+
+            with timed("telegram_send"):
+                await update.message.reply_text(
+                    text_result,
+                    parse_mode="Markdown",
+                    reply_markup=reply_keyboard
+                )
             logger.info(f"✅ Анализ завершён: {len(bets)} ставок")
 
         except Exception as e:
@@ -203,15 +428,23 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     elif text == "⚙️ Настройки":
+        settings = await asyncio.get_running_loop().run_in_executor(
+            None, USER_SETTINGS.get, update.effective_user.id
+        )
+        leagues = "\n".join(f"{i}. {name}" for i, name in enumerate(LEAGUE_NAMES, 1))
         text_settings = (
             "⚙️ *НАСТРОЙКИ:*\n\n"
-            "*Скоро будут доступны:*\n"
-            "🔧 Выбор лиг\n"
-            "🔧 Минимум вероятности\n"
-            "🔧 Минимум EDGE\n"
-            "🔧 Уведомления\n"
-            "🔧 История ставок\n\n"
-            "Обновления в скором времени!"
+            + format_settings(settings) +
+            "\n*Изменить:*\n"
+            "/set prob 65 - минимум вероятности, %\n"
+            "/set edge 3 - минимум EDGE, %\n"
+            "/set odds 1.4 2.2 - диапазон коэффициентов\n"
+            "/set leagues 1 3 - лиги по номерам (all - все)\n"
+            "/set markets П1 1X - типы ставок: П1, 1X, П2 (all - все)\n"
+            "/set reset - по умолчанию\n\n"
+            f"*Лиги:*\n{leagues}\n\n"
+            "🔔 Уведомления о новых ставках: /subscribe\n"
+            "🔕 Отключить уведомления: /unsubscribe"
         )
         await update.message.reply_text(
             text_settings,
@@ -226,6 +459,66 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Длительности этапов анализа (только для администраторов)"""
+    is_admin_chat = update.effective_chat.id == alert_chat_id(TELEGRAM_CHAT_ID)
+    if not is_admin_chat and update.effective_user.id not in ADMIN_USER_IDS:
+        return
+
+    if not METRICS.enabled:
+        await update.message.reply_text("⚠️ Метрики выключены (METRICS_ENABLED=0)")
+        return
+
+    last_run = f"{SCHEDULER.last_duration:.2f} сек" if SCHEDULER.last_duration is not None else "нет"
+    http = ""
+    client = current_http_client()
+    if client is not None:
+        http = (
+            "\n\n🌐 *HTTP-ФИДЫ, мс:*\n"
+            f"```\n{format_stats(client.snapshot(), title='провайдер')}\n```\n"
+            f"Повторов: {client.retried}, ответов 304: {client.not_modified}"
+        )
+    await update.message.reply_text(
+        "📈 *ЭТАПЫ АНАЛИЗА, мс:*\n"
+        f"```\n{format_stats(METRICS.snapshot())}\n```\n"
+        f"Фоновых прогонов: {SCHEDULER.runs}, пропущено: {SCHEDULER.skipped}\n"
+        f"Последний прогон: {last_run}" + http,
+        parse_mode="Markdown"
+    )
+
+
+METRICS_SERVER: HttpServer = None
+
+
+async def post_init(application):
+    global ALERTS, METRICS_SERVER
+
+    loop = asyncio.get_running_loop()
+    # Поднимаем процессы анализа до первого запроса пользователя
+    await loop.run_in_executor(None, warm_up_process_pool)
+    if ALERTS_ENABLED and ANALYSIS_INTERVAL_MIN > 0:
+        # Основной чат из конфигурации подписан всегда
+        await loop.run_in_executor(None, ALERT_STORE.subscribe, alert_chat_id(TELEGRAM_CHAT_ID))
+        ALERTS = AlertDispatcher(application.bot, ALERT_STORE, format_alert_message)
+        ALERTS.start()
+    if ANALYSIS_INTERVAL_MIN > 0:
+        SCHEDULER.start()
+    if METRICS_PORT and BOT_MODE == "polling":
+        METRICS_SERVER = HttpServer(port=int(METRICS_PORT))
+        METRICS_SERVER.add_route("GET", "/metrics", metrics_endpoint)
+        await METRICS_SERVER.start()
+
+
+async def post_shutdown(application):
+    await SCHEDULER.stop()
+    if METRICS_SERVER is not None:
+        await METRICS_SERVER.stop()
+    if ALERTS is not None:
+        await ALERTS.stop()
+    shutdown_process_pool()
+    BET_JOURNAL.close()
+
+
 def main():
     try:
         logger.info("🚀 ЗАПУСК BETTING БОТА...")
@@ -239,14 +532,29 @@ def main():
         )
 
         # Создаём приложение с кастомным Request
-        app = ApplicationBuilder().token(TELEGRAM_TOKEN).request(request).build()
+        app = (
+            ApplicationBuilder()
+            .token(TELEGRAM_TOKEN)
+            .request(request)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
 
         app.add_handler(CommandHandler("start", start))
+        app.add_handler(CommandHandler("subscribe", subscribe))
+        app.add_handler(CommandHandler("unsubscribe", unsubscribe))
+        app.add_handler(CommandHandler("set", set_settings))
+        app.add_handler(CommandHandler("stats", stats))
         app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
 
         logger.info("✅ Бот готов к работе!")
         logger.info("⏰ Таймауты установлены: 30 сек")
-        app.run_polling(allowed_updates=Update.ALL_TYPES)
+        if BOT_MODE == "webhook":
+            run_webhook(app, allowed_updates=Update.ALL_TYPES,
+                        routes={("GET", "/metrics"): metrics_endpoint})
+        else:
+            app.run_polling(allowed_updates=Update.ALL_TYPES)
 
     except Exception as e:
         logger.critical(f"❌ Ошибка: {e}", exc_info=True)
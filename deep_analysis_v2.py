@@ -1,11 +1,37 @@
+import os
 import logging
-import random
-from datetime import datetime, timedelta
-from typing import List, Dict
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from http_client import HttpClient, get_http_client
+from metrics import METRICS, timed
+from providers import MatchProvider, SyntheticProvider, get_provider
+from response_cache import cached
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Минимальный EDGE ставки find_value_bets (вероятность - 1/коэффициент)
+MIN_EDGE = 0.01
+
+# Токен football-data.org для TOP_LEAGUES
+FOOTBALL_DATA_TOKEN = os.environ.get("FOOTBALL_DATA_TOKEN")
+
+# Число процессов для анализа матчей (1 - анализ в текущем процессе); на слейт
+# в пару десятков матчей больше 4 процессов не окупаются
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Запуск процессов пула: fork процесса с потоками (asyncio, журнал ставок, HTTP)
+# может унаследовать чужую захваченную блокировку и зависнуть
+ANALYSIS_START_METHOD = os.environ.get("ANALYSIS_START_METHOD", "forkserver")
+
+# Сколько профилей команд держать в памяти
+TEAM_PROFILE_CACHE_SIZE = int(os.environ.get("TEAM_PROFILE_CACHE_SIZE", "1024"))
+
 BOOKMAKERS = {
     "bet365": {"reliability": 0.95, "coverage": 0.98},
     "betfair": {"reliability": 0.92, "coverage": 0.95},
@@ -44,52 +70,112 @@ TOP_LEAGUES = {
 }
 
 
-class TeamAnalyzer:
-    def __init__(self, team_name: str, league: str):
-        self.team_name = team_name
-        self.league = league
-        self.stats = self._load_team_stats()
-
-    def _load_team_stats(self) -> Dict:
-        team_data = {
-            'form': self._calculate_form(),
-            'home_away': self._calculate_home_away(),
-            'injuries': self._get_injuries(),
-            'recent_matches': self._get_recent_matches(),
-            'head_to_head': {},
+@timed("fetch")
+def fetch_league_fixtures(league_name: str, client: Optional[HttpClient] = None) -> List[Dict]:
+    """Запланированные матчи лиги из TOP_LEAGUES через football-data.org"""
+    league = TOP_LEAGUES[league_name]
+    headers = {"X-Auth-Token": FOOTBALL_DATA_TOKEN} if FOOTBALL_DATA_TOKEN else {}
+    data = cached("fixtures", league["api"], lambda: (client or get_http_client()).get_json(
+        league["api"], params={"status": "SCHEDULED"}, headers=headers
+    ))
+    return [
+        {
+            'home_team': match['homeTeam']['name'],
+            'away_team': match['awayTeam']['name'],
+            'league': league_name,
+            'date': datetime.strptime(match['utcDate'], "%Y-%m-%dT%H:%M:%SZ"),
         }
-        return team_data
+        for match in data.get('matches', [])
+    ]
+
+
+class TeamProfileCache:
+    """
+    LRU-кэш профилей команд по ключу (команда, лига, версия данных, фид)
+
+    Профиль команды, играющей несколько матчей (или в ЛЧ и чемпионате),
+    считается один раз. При поступлении новых результатов вызывайте
+    invalidate() для конкретных команд или bump_version() для всех.
+    Профили разных фидов не смешиваются: в ключе - MatchProvider.cache_key.
+
+    У процессов пула свои копии кэша: state() родителя уходит с каждым шардом,
+    и sync() в процессе сбрасывает его кэш, если версия или поколение сменились.
+    """
+
+    def __init__(self, maxsize: int = 1024, provider: Optional[MatchProvider] = None):
+        self.maxsize = maxsize
+        self.provider = provider
+        self.data_version = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._profiles: "OrderedDict[Tuple[str, str, int], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, team_name: str, league: str, provider: Optional[MatchProvider] = None) -> Dict:
+        """Профиль команды из provider (по умолчанию - фид кэша или текущий); словарь общий, не изменять"""
+        provider = provider or self.provider or get_provider()
+        key = (team_name, league, self.data_version, provider.cache_key)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+                self.hits += 1
+                return profile
+            self.misses += 1
+
+        profile = self._load(provider, team_name, league, key[2])
+
+        with self._lock:
+            self._profiles[key] = profile
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+        return profile
+
+    @timed("team_profile")
+    def _load(self, provider: MatchProvider, team_name: str, league: str, data_version: int) -> Dict:
+        return provider.team_profile(team_name, league, data_version)
+
+    def invalidate(self, team_name: Optional[str] = None, league: Optional[str] = None):
+        """Удаляет профили команды и/или лиги; без аргументов - очищает кэш"""
+        with self._lock:
+            self.generation += 1
+            for key in list(self._profiles):
+                if (team_name is None or key[0] == team_name) and (league is None or key[1] == league):
+                    del self._profiles[key]
+
+    def bump_version(self) -> int:
+        """Новая версия данных: все профили будут пересчитаны"""
+        with self._lock:
+            self.data_version += 1
+            self.generation += 1
+            self._profiles.clear()
+            return self.data_version
+
+    def state(self) -> Tuple[int, int]:
+        """(версия данных, поколение): меняется при bump_version() и каждом invalidate()"""
+        return self.data_version, self.generation
+
+    def sync(self, state: Tuple[int, int]):
+        """Принимает state() кэша родителя; при расхождении кэш процесса очищается целиком"""
+        with self._lock:
+            if (self.data_version, self.generation) != tuple(state):
+                self.data_version, self.generation = state
+                self._profiles.clear()
+
+
+TEAM_PROFILES = TeamProfileCache(TEAM_PROFILE_CACHE_SIZE)
 
-    def _calculate_form(self) -> float:
-        return random.uniform(-0.15, 0.25)
 
-    def _calculate_home_away(self) -> Dict:
-        return {
-            'home_wins_pct': random.uniform(0.30, 0.70),
-            'away_wins_pct': random.uniform(0.15, 0.55),
-            'home_avg_goals': random.uniform(1.3, 2.5),
-            'away_avg_goals': random.uniform(0.8, 1.8),
-        }
+class TeamAnalyzer:
+    """Лёгкое представление над закэшированным профилем команды"""
 
-    def _get_injuries(self) -> List[Dict]:
-        injuries = []
-        if random.random() < 0.20:
-            injuries.append({
-                'player': f'Key Player {self.team_name}',
-                'position': 'Defender',
-                'impact': -0.10
-            })
-        return injuries
-
-    def _get_recent_matches(self) -> List[Dict]:
-        return [
-            {
-                'result': random.choice(['W', 'D', 'L']),
-                'goals_for': random.randint(0, 4),
-                'goals_against': random.randint(0, 3)
-            }
-            for _ in range(5)
-        ]
+    def __init__(self, team_name: str, league: str, profiles: Optional[TeamProfileCache] = None,
+                 provider: Optional[MatchProvider] = None):
+        self.team_name = team_name
+        self.league = league
+        self.stats = (profiles or TEAM_PROFILES).get(team_name, league, provider)
 
     def get_probability_adjustments(self) -> Dict:
         adjustments = {
@@ -103,7 +189,10 @@ class TeamAnalyzer:
 
 class MatchAnalyzer:
     def __init__(self, home_team: str, away_team: str, league: str,
-                 home_odds: float, draw_odds: float, away_odds: float):
+                 home_odds: float, draw_odds: float, away_odds: float,
+                 h2h_adjustment: Optional[float] = None,
+                 motivation_adjustment: Optional[float] = None,
+                 provider: Optional[MatchProvider] = None):
         self.home_team = home_team
         self.away_team = away_team
         self.league = league
@@ -111,9 +200,17 @@ class MatchAnalyzer:
         self.draw_odds = draw_odds
         self.away_odds = away_odds
 
-        self.home_analyzer = TeamAnalyzer(home_team, league)
-        self.away_analyzer = TeamAnalyzer(away_team, league)
+        provider = provider or get_provider()
+        if h2h_adjustment is None or motivation_adjustment is None:
+            fixture = {'home_team': home_team, 'away_team': away_team, 'league': league}
+            h2h_adjustment, motivation_adjustment = provider.match_adjustments([fixture])[0].tolist()
+        self.h2h_adjustment = h2h_adjustment
+        self.motivation_adjustment = motivation_adjustment
+
+        self.home_analyzer = TeamAnalyzer(home_team, league, provider=provider)
+        self.away_analyzer = TeamAnalyzer(away_team, league, provider=provider)
 
+    @timed("match_analysis")
     def analyze_match(self) -> Dict:
         home_prob = 0.50
 
@@ -160,73 +257,38 @@ class MatchAnalyzer:
         }
 
     def _analyze_h2h(self) -> float:
-        return random.uniform(-0.10, 0.10)
+        return self.h2h_adjustment
 
     def _analyze_motivation(self) -> float:
-        return random.uniform(-0.05, 0.08)
+        return self.motivation_adjustment
 
 
 def find_value_bets(odds_threshold_min: float = 1.3,
                    odds_threshold_max: float = 1.9,
-                   probability_threshold: float = 0.60) -> List[Dict]:
+                   probability_threshold: float = 0.60,
+                   seed: Optional[int] = None,
+                   workers: Optional[int] = None,
+                   provider: Optional[MatchProvider] = None) -> List[Dict]:
     logger.info("🔍 Начинаю анализ букмекеров...")
     logger.info(f"   Диапазон коэффициентов: {odds_threshold_min} - {odds_threshold_max}")
     logger.info(f"   Минимальная вероятность: {probability_threshold*100:.0f}%")
 
-    value_bets = []
+    # Все случайные величины тянутся из провайдера заранее и пачкой,
+    # поэтому результат не зависит от числа процессов и порядка их работы
+    if provider is None:
+        provider = SyntheticProvider(seed) if seed is not None else get_provider()
+
+    with timed("fetch"):
+        matches = provider.fixtures()
+        odds = provider.fixture_odds(matches).tolist()
+        adjustments = provider.match_adjustments(matches).tolist()
+    filters = (odds_threshold_min, odds_threshold_max, probability_threshold)
+    jobs = list(zip(matches, odds, adjustments))
 
-    matches = _generate_matches_from_leagues()
-
-    for match in matches:
-        home_team = match['home_team']
-        away_team = match['away_team']
-        league = match['league']
-        match_date = match['date']
-
-        home_odds = random.uniform(1.5, 2.5)
-        draw_odds = random.uniform(2.5, 3.5)
-        away_odds = random.uniform(2.0, 3.0)
-
-        if not (odds_threshold_min <= home_odds <= odds_threshold_max):
-            continue
-
-        analyzer = MatchAnalyzer(home_team, away_team, league, home_odds, draw_odds, away_odds)
-        analysis = analyzer.analyze_match()
-
-        if analysis['calculated_probability'] >= probability_threshold and analysis['edge'] > 0.01:
-            home_prob = analysis['calculated_probability']
-
-            if home_prob >= 0.60:
-                bet_team = home_team
-                bet_type = "П1 (Победа домашней)"
-                bet_odds = home_odds
-            elif home_prob >= 0.50:
-                bet_team = f"{home_team} или Ничья"
-                bet_type = "1X (Дома или Ничья)"
-                prob_1x = min(0.99, home_prob + 0.15)
-                bet_odds = 1 / prob_1x
-            else:
-                bet_team = away_team
-                bet_type = "П2 (Победа гостевой)"
-                bet_odds = away_odds
-
-            value_bets.append({
-                'match': f"{home_team} vs {away_team}",
-                'league': league,
-                'home_team': home_team,
-                'away_team': away_team,
-                'bet_team': bet_team,
-                'bet_type': bet_type,
-                'odds': bet_odds,
-                'probability': home_prob,
-                'edge': analysis['edge'],
-                'confidence': "HIGH" if home_prob > 0.70 else "MEDIUM",
-                'analysis_details': analysis['analysis'],
-                'match_date': match_date,
-                'timestamp': datetime.now()
-            })
-
-    value_bets.sort(key=lambda x: x['edge'], reverse=True)
+    value_bets = _run_analysis(jobs, filters, datetime.now(), provider, workers)
+
+    with timed("sort"):
+        value_bets.sort(key=lambda x: x['edge'], reverse=True)
     top_bets = value_bets[:5]
 
     logger.info(f"✅ Найдено VALUE ставок: {len(value_bets)}")
@@ -243,42 +305,193 @@ def find_value_bets(odds_threshold_min: float = 1.3,
     return top_bets
 
 
-def _generate_matches_from_leagues() -> List[Dict]:
-    matches = []
-
-    teams_by_league = {
-        "🏴 Английская Премьер-лига": [
-            "Manchester City", "Liverpool", "Arsenal", "Chelsea", "Manchester United",
-            "Tottenham", "Newcastle", "Brighton", "Aston Villa", "West Ham"
-        ],
-        "🇪🇸 Испанская Ла Лига": [
-            "Barcelona", "Real Madrid", "Atletico Madrid", "Sevilla", "Valencia"
-        ],
-        "🇩🇪 Немецкая Бундеслига": [
-            "Bayern Munich", "Borussia Dortmund", "RB Leipzig", "Bayer Leverkusen"
-        ],
-        "🇮🇹 Итальянская Серия А": [
-            "Juventus", "AS Roma", "AC Milan", "Napoli", "Inter Milan"
-        ],
-        "🇫🇷 Французская Лига 1": [
-            "Paris Saint Germain", "Marseille", "Monaco", "Lyon"
-        ],
+# Фильтры полного анализа: пропускаем все матчи, отсекаем только ставки без EDGE
+CANDIDATE_FILTERS = (0.0, float("inf"), 0.0)
+
+
+def find_candidate_bets(seed: Optional[int] = None,
+                        workers: Optional[int] = None,
+                        provider: Optional[MatchProvider] = None) -> List[Dict]:
+    """
+    Все ставки с EDGE по всему слейту, без персональных фильтров и без сортировки
+
+    Один такой расчёт обслуживает всех пользователей: их фильтры применяются
+    к результату через user_settings.BetIndex.
+    """
+    if provider is None:
+        provider = SyntheticProvider(seed) if seed is not None else get_provider()
+
+    with timed("fetch"):
+        matches = provider.fixtures()
+        odds = provider.fixture_odds(matches).tolist()
+        adjustments = provider.match_adjustments(matches).tolist()
+    jobs = list(zip(matches, odds, adjustments))
+
+    candidates = _run_analysis(jobs, CANDIDATE_FILTERS, datetime.now(), provider, workers)
+    logger.info(f"✅ Полный анализ: {len(matches)} матчей, кандидатов с EDGE: {len(candidates)}")
+    return candidates
+
+
+def _analyze_fixture(match: Dict, odds: List[float], adjustments: List[float],
+                     filters: Tuple[float, float, float], timestamp: datetime,
+                     provider: MatchProvider) -> Optional[Dict]:
+    """Анализирует один матч; возвращает VALUE ставку или None"""
+    odds_threshold_min, odds_threshold_max, probability_threshold = filters
+
+    home_odds, draw_odds, away_odds = odds
+
+    if not (odds_threshold_min <= home_odds <= odds_threshold_max):
+        return None
+
+    analyzer = MatchAnalyzer(match['home_team'], match['away_team'], match['league'],
+                             home_odds, draw_odds, away_odds, *adjustments, provider=provider)
+    analysis = analyzer.analyze_match()
+    return _value_bet(match, odds, analysis, probability_threshold, timestamp)
+
+
+@timed("value")
+def _value_bet(match: Dict, odds: List[float], analysis: Dict, probability_threshold: float,
+               timestamp: datetime) -> Optional[Dict]:
+    """VALUE ставка по результату анализа матча или None, если EDGE недостаточен"""
+    if not (analysis['calculated_probability'] >= probability_threshold and analysis['edge'] > MIN_EDGE):
+        return None
+
+    home_team = match['home_team']
+    away_team = match['away_team']
+    home_odds, _, away_odds = odds
+
+    home_prob = analysis['calculated_probability']
+
+    if home_prob >= 0.60:
+        bet_team = home_team
+        bet_type = "П1 (Победа домашней)"
+        bet_odds = home_odds
+    elif home_prob >= 0.50:
+        bet_team = f"{home_team} или Ничья"
+        bet_type = "1X (Дома или Ничья)"
+        prob_1x = min(0.99, home_prob + 0.15)
+        bet_odds = 1 / prob_1x
+    else:
+        bet_team = away_team
+        bet_type = "П2 (Победа гостевой)"
+        bet_odds = away_odds
+
+    return {
+        'match': f"{home_team} vs {away_team}",
+        'league': match['league'],
+        'home_team': home_team,
+        'away_team': away_team,
+        'bet_team': bet_team,
+        'bet_type': bet_type,
+        'odds': bet_odds,
+        'home_odds': home_odds,
+        'probability': home_prob,
+        'edge': analysis['edge'],
+        'confidence': "HIGH" if home_prob > 0.70 else "MEDIUM",
+        'analysis_details': analysis['analysis'],
+        'match_date': match['date'],
+        'timestamp': timestamp
     }
 
-    for league, teams in teams_by_league.items():
-        for i in range(min(3, len(teams))):
-            home = teams[i]
-            away = teams[(i + 1) % len(teams)]
 
-            if home != away:
-                matches.append({
-                    'home_team': home,
-                    'away_team': away,
-                    'league': league,
-                    'date': datetime.now() + timedelta(days=random.randint(1, 30))
-                })
+def _analyze_shard(shard: List[Tuple], filters: Tuple[float, float, float], timestamp: datetime,
+                   provider: MatchProvider) -> List[Dict]:
+    bets = []
+    for match, odds, adjustments in shard:
+        bet = _analyze_fixture(match, odds, adjustments, filters, timestamp, provider)
+        if bet is not None:
+            bets.append(bet)
+    return bets
+
+
+def _analyze_shard_in_worker(shard: List[Tuple], filters: Tuple[float, float, float], timestamp: datetime,
+                             provider: MatchProvider, profile_state: Tuple[int, int]) -> Tuple[List[Dict], Dict]:
+    """_analyze_shard в процессе пула: вместе со ставками отдаёт замеры этапов родителю"""
+    TEAM_PROFILES.sync(profile_state)
+    return _analyze_shard(shard, filters, timestamp, provider), METRICS.drain()
+
 
-    return matches
+def _run_analysis(jobs: List[Tuple], filters: Tuple[float, float, float], timestamp: datetime,
+                  provider: MatchProvider, workers: Optional[int] = None) -> List[Dict]:
+    """
+    Раскладывает матчи по процессам пула; при workers <= 1 анализирует в текущем процессе
+
+    provider и состояние TEAM_PROFILES передаются с каждым шардом: у процессов пула
+    свои get_provider() и кэш профилей, и изменения в родителе до них не доходят.
+    """
+    workers = ANALYSIS_WORKERS if workers is None else workers
+    if workers <= 1 or len(jobs) <= 1:
+        return _analyze_shard(jobs, filters, timestamp, provider)
+
+    pool = get_process_pool(workers)
+    shard_size = -(-len(jobs) // workers)
+    shards = [jobs[i:i + shard_size] for i in range(0, len(jobs), shard_size)]
+
+    value_bets = []
+    state = TEAM_PROFILES.state()
+    for bets, stage_metrics in pool.map(_analyze_shard_in_worker, shards, [filters] * len(shards),
+                                        [timestamp] * len(shards), [provider] * len(shards),
+                                        [state] * len(shards)):
+        value_bets.extend(bets)
+        METRICS.merge(stage_metrics)
+    return value_bets
+
+
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+_PROCESS_POOL_WORKERS = 0
+# Пул запрашивают потоки executor'а (планировщик, кнопки): создаём его под блокировкой
+_PROCESS_POOL_LOCK = threading.RLock()
+
+
+def get_process_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Постоянный пул процессов анализа; пересоздаётся только при смене числа процессов"""
+    global _PROCESS_POOL, _PROCESS_POOL_WORKERS
+    workers = workers or ANALYSIS_WORKERS
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is None or _PROCESS_POOL_WORKERS != workers:
+            shutdown_process_pool()
+            context = _pool_context()
+            _PROCESS_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _PROCESS_POOL_WORKERS = workers
+            logger.info(f"⚙️ Пул анализа: {workers} процессов ({context.get_start_method()})")
+        return _PROCESS_POOL
+
+
+def _pool_context():
+    """Контекст ANALYSIS_START_METHOD; forkserver заранее импортирует этот модуль (numpy и анализ)"""
+    method = ANALYSIS_START_METHOD
+    if method not in multiprocessing.get_all_start_methods():
+        method = "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+def warm_up_process_pool(workers: Optional[int] = None):
+    """Заранее поднимает процессы пула, чтобы первый анализ не ждал их старта"""
+    workers = workers or ANALYSIS_WORKERS
+    if workers <= 1:
+        return
+    pool = get_process_pool(workers)
+    list(pool.map(_warm_up_worker, range(workers)))
+
+
+def _warm_up_worker(_: int) -> None:
+    return None
+
+
+def shutdown_process_pool():
+    global _PROCESS_POOL, _PROCESS_POOL_WORKERS
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is not None:
+            _PROCESS_POOL.shutdown(wait=True, cancel_futures=True)
+            _PROCESS_POOL = None
+            _PROCESS_POOL_WORKERS = 0
+
+
+def _generate_matches_from_leagues() -> List[Dict]:
+    return get_provider().fixtures()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.5"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+
+# Лимиты запросов по провайдерам: (запросов в секунду, размер пачки)
+RATE_LIMITS = {
+    "api.football-data.org": (10 / 60, 10),  # бесплатный тариф: 10 запросов в минуту
+}
+DEFAULT_RATE_LIMIT = (5.0, 5)
+
+LATENCY_WINDOW = 1000
+
+# Статусы, при которых запрос повторяется
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Верхняя граница ожидания по заголовку Retry-After, секунды
+MAX_RETRY_AFTER = 60.0
+
+
+class TokenBucket:
+    """Ограничитель частоты: rate токенов в секунду, не больше capacity в запасе"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Забирает токен, при необходимости ждёт; возвращает время ожидания"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HttpClient:
+    """
+    Общий HTTP-клиент для фидов коэффициентов и матчей
+
+    - keep-alive пулы соединений на каждый хост (requests.Session + HTTPAdapter)
+    - token bucket на провайдера (хост или явное имя)
+    - повторы с экспоненциальной задержкой для 429/5xx и сетевых ошибок;
+      каждый повтор тоже забирает токен, так что шквал повторов не превышает лимит
+    - условные запросы: ETag / Last-Modified, при 304 отдаётся сохранённый ответ
+    - сжатие ответов (gzip/deflate)
+    - перцентили задержки по провайдерам
+    """
+
+    def __init__(self, rate_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 retries: int = HTTP_RETRIES, backoff: float = HTTP_BACKOFF,
+                 timeout: float = HTTP_TIMEOUT, pool_size: int = HTTP_POOL_SIZE):
+        self.rate_limits = {**RATE_LIMITS, **(rate_limits or {})}
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+
+        # Повторы делает get(), а не urllib3: иначе они шли бы мимо token bucket
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._validators: Dict[str, Tuple[Optional[str], Optional[str], requests.Response]] = {}
+        self._latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.retried = 0
+
+    def _bucket(self, provider: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(provider)
+            if bucket is None:
+                rate, capacity = self.rate_limits.get(provider, DEFAULT_RATE_LIMIT)
+                bucket = self._buckets[provider] = TokenBucket(rate, capacity)
+            return bucket
+
+    def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            provider: Optional[str] = None) -> requests.Response:
+        """GET с лимитом, повторами и условным запросом; при 304 - сохранённый ответ"""
+        provider = provider or urlsplit(url).hostname or url
+        request_headers = dict(headers or {})
+
+        cache_key = requests.Request("GET", url, params=params).prepare().url
+        validators = self._validators.get(cache_key)
+        if validators is not None:
+            etag, last_modified, _ = validators
+            if etag:
+                request_headers["If-None-Match"] = etag
+            if last_modified:
+                request_headers["If-Modified-Since"] = last_modified
+
+        response = self._send(provider, url, params, request_headers)
+
+        if response.status_code == 304 and validators is not None:
+            self.not_modified += 1
+            return validators[2]
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.ok and (etag or last_modified):
+            self._validators[cache_key] = (etag, last_modified, response)
+        return response
+
+    def _send(self, provider: str, url: str, params: Optional[Dict], headers: Dict) -> requests.Response:
+        """Запрос с повторами; каждая попытка ждёт токен провайдера"""
+        bucket = self._bucket(provider)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"🔁 {provider}: {type(e).__name__}, повтор через {delay:.1f} сек")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                delay = max(self.backoff * 2 ** attempt, self._retry_after(response))
+                logger.warning(f"🔁 {provider}: HTTP {response.status_code}, повтор через {delay:.1f} сек")
+                response.close()
+            finally:
+                self._record_latency(provider, time.perf_counter() - started)
+            attempt += 1
+            with self._lock:
+                self.retried += 1
+            time.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float:
+        """Retry-After в секундах (форма с датой не поддерживается)"""
+        try:
+            return min(MAX_RETRY_AFTER, max(0.0, float(response.headers.get("Retry-After", 0))))
+        except ValueError:
+            return 0.0
+
+    def get_json(self, url: str, **kwargs):
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def _record_latency(self, provider: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(provider, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def latency_percentiles(self, provider: Optional[str] = None) -> Dict[str, float]:
+        """p50/p95/p99 задержки в секундах по последним LATENCY_WINDOW запросам"""
+        with self._lock:
+            if provider is not None:
+                samples = list(self._latencies.get(provider, ()))
+            else:
+                samples = [s for values in self._latencies.values() for s in values]
+        if not samples:
+            return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+        samples.sort()
+
+        def percentile(q: float) -> float:
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        return {"count": len(samples), "p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99)}
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{провайдер: count, p50, p95, p99} - в формате metrics.format_stats"""
+        with self._lock:
+            providers = list(self._latencies)
+        return {provider: self.latency_percentiles(provider) for provider in providers}
+
+    def close(self):
+        self.session.close()
+
+
+_CLIENT: Optional[HttpClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Общий клиент процесса: пулы соединений переиспользуются между вызовами"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HttpClient()
+        return _CLIENT
+
+
+def current_http_client() -> Optional[HttpClient]:
+    """Общий клиент, если он уже создан (для /stats: не создаёт клиент ради статистики)"""
+    with _CLIENT_LOCK:
+        return _CLIENT
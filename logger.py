@@ -1,17 +1,254 @@
 import os
+import json
+import queue
+import sqlite3
+import atexit
 import logging
+import threading
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Файл для хранения логов
+# Файл для хранения логов (одна ставка - одна JSON-строка)
 BETS_LOG_FILE = "bets.log"
 
+# Индексированная история ставок для быстрых выборок
+BETS_HISTORY_DB = os.environ.get("BETS_HISTORY_DB", "bets.db")
+
+# Пакетная запись журнала: по размеру пачки или по времени
+JOURNAL_BATCH_SIZE = int(os.environ.get("JOURNAL_BATCH_SIZE", "100"))
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get("JOURNAL_FLUSH_INTERVAL", "2.0"))
+
+
+class BetHistory:
+    """
+    История ставок в SQLite с индексами по времени, матчу и рынку
+
+    Последние N ставок читаются по rowid за O(N) независимо от размера истории.
+    """
+
+    COLUMNS = ("timestamp", "match", "league", "bet_team", "market", "odds",
+               "probability", "edge", "value", "confidence", "match_date")
+
+    def __init__(self, path: str = BETS_HISTORY_DB):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bets ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "timestamp TEXT NOT NULL, match TEXT NOT NULL, league TEXT, bet_team TEXT, "
+                "market TEXT NOT NULL, odds REAL, probability REAL, edge REAL, value REAL, "
+                "confidence TEXT, match_date TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bets_timestamp ON bets (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bets_match ON bets (match, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bets_market ON bets (market, timestamp)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def append_many(self, records: List[Dict]):
+        rows = [tuple(self._column_value(record.get(col)) for col in self.COLUMNS) for record in records]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO bets ({', '.join(self.COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    rows,
+                )
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _column_value(value):
+        if value is None or isinstance(value, (int, float, str)):
+            return value
+        return str(value)
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """Последние limit ставок, от старых к новым"""
+        rows = self._fetch("SELECT * FROM bets ORDER BY id DESC LIMIT ?", (limit,))
+        rows.reverse()
+        return rows
+
+    def query(self, since: Optional[str] = None, until: Optional[str] = None,
+              match: Optional[str] = None, market: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """
+        Выборка ставок по диапазону дат, матчу и рынку
+
+        Args:
+            since, until: границы по timestamp в ISO-формате (until не включается),
+                например "2025-12-01" и "2025-12-08"
+            match: точное название матча ("Arsenal vs Chelsea")
+            market: тип рынка ("П1 (Победа домашней)")
+            limit: максимум записей (самые новые)
+        """
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        if match is not None:
+            conditions.append("match = ?")
+            params.append(match)
+        if market is not None:
+            conditions.append("market = ?")
+            params.append(market)
+
+        sql = "SELECT * FROM bets"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        rows = self._fetch(sql, tuple(params))
+        rows.reverse()
+        return rows
+
+    def _fetch(self, sql: str, params: tuple) -> List[Dict]:
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM bets")
+        finally:
+            conn.close()
+
+
+BET_HISTORY = BetHistory()
+
+
+class BetJournal:
+    """
+    Журнал ставок с фоновой записью
+
+    record() только кладёт запись в очередь и не трогает диск, поэтому его
+    можно вызывать из async-обработчиков. Фоновый поток пишет записи пачками:
+    при накоплении batch_size записей, раз в flush_interval секунд и при close().
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str = BETS_LOG_FILE, batch_size: int = JOURNAL_BATCH_SIZE,
+                 flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+                 history: Optional[BetHistory] = None):
+        self.path = path
+        self.history = history
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="bet-journal", daemon=True)
+                self._thread.start()
+
+    def record(self, entry: Dict):
+        """Ставит запись в очередь на запись"""
+        if self._thread is None:
+            self.start()
+        self._queue.put(entry)
+
+    def close(self, timeout: float = 10.0):
+        """Дописывает всё из очереди и останавливает поток"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            stop = item is self._STOP
+            if item is not None and not stop:
+                batch.append(item)
+
+            if stop or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+            if stop:
+                return
+
+    def _flush(self, batch: List[Dict]):
+        if not batch:
+            return
+        try:
+            lines = [json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in batch]
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+            if self.history is not None:
+                self.history.append_many(batch)
+            self.written += len(batch)
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи журнала ставок ({len(batch)} записей): {e}")
+
+
+BET_JOURNAL = BetJournal(history=BET_HISTORY)
+atexit.register(BET_JOURNAL.close)
+
+
+def make_bet_record(bet: Dict) -> Dict:
+    """Структурированная запись журнала из словаря ставки find_value_bets"""
+    match_date = bet.get('match_date')
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "match": bet['match'],
+        "league": bet.get('league'),
+        "bet_team": bet.get('bet_team'),
+        "market": bet['bet_type'],
+        "odds": round(bet['odds'], 4),
+        "probability": round(bet['probability'], 4),
+        "edge": round(bet['edge'], 4),
+        "confidence": bet.get('confidence'),
+        "match_date": match_date.isoformat(timespec="minutes") if match_date else None,
+    }
+
+
+def log_value_bet(bet: Dict):
+    """Логирует VALUE ставку из find_value_bets в журнал (без файлового I/O в вызывающем потоке)"""
+    try:
+        BET_JOURNAL.record(make_bet_record(bet))
+    except Exception as e:
+        logger.error(f"❌ Ошибка логирования ставки: {e}")
+
 
 def log_bet(match: str, market: str, value: float, odd: float, confidence: float):
     """
-    Логирует ставку в файл и консоль
+    Логирует ставку в журнал и консоль
     
     Args:
         match: Название матча (например, "Manchester City vs Chelsea")
@@ -21,13 +258,14 @@ def log_bet(match: str, market: str, value: float, odd: float, confidence: float
         confidence: Уверенность в ставке (0-1)
     """
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        log_entry = f"[{timestamp}] {match} | {market} @ {odd:.2f} | Value: {value:.4f} | Confidence: {confidence:.2f}\n"
-        
-        # Логируем в файл
-        with open(BETS_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_entry)
+        BET_JOURNAL.record({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "match": match,
+            "market": market,
+            "odds": round(odd, 4),
+            "value": round(value, 4),
+            "confidence": confidence,
+        })
         
         # Логируем в консоль
         logger.info(f"✅ Логирована ставка: {match} | {market} @ {odd:.2f} | Value: {value:.4f}")
@@ -37,15 +275,9 @@ def log_bet(match: str, market: str, value: float, odd: float, confidence: float
 
 
 def get_logged_bets(limit: int = 10) -> list:
-    """Получает последние логированные ставки"""
+    """Получает последние логированные ставки (словари, от старых к новым)"""
     try:
-        if not os.path.exists(BETS_LOG_FILE):
-            return []
-        
-        with open(BETS_LOG_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        return lines[-limit:]
+        return BET_HISTORY.recent(limit)
     except Exception as e:
         logger.error(f"❌ Ошибка чтения логов: {e}")
         return []
@@ -56,6 +288,7 @@ def clear_logs():
     try:
         if os.path.exists(BETS_LOG_FILE):
             os.remove(BETS_LOG_FILE)
-            logger.info("✅ Логи очищены")
+        BET_HISTORY.clear()
+        logger.info("✅ Логи очищены")
     except Exception as e:
         logger.error(f"❌ Ошибка очистки логов: {e}")
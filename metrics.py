@@ -0,0 +1,220 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from functools import wraps
+from typing import Dict, Iterable, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Замеры этапов: 0 - выключены (timed() ничего не делает, декораторы не оборачивают функции)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+# Сколько последних замеров этапа хранить для p50/p95/p99
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "2048"))
+
+# Порт отдельного HTTP-эндпоинта /metrics в режиме polling (пусто - не поднимать);
+# в webhook-режиме /metrics отдаёт webhook-сервер
+METRICS_PORT = os.environ.get("METRICS_PORT", "")
+
+# Границы бакетов гистограммы, секунды
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Гистограмма длительностей: бакеты за всё время и окно последних замеров для перцентилей"""
+
+    __slots__ = ("count", "total", "buckets", "recent")
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+
+    def merge(self, other: "Histogram"):
+        self.count += other.count
+        self.total += other.total
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.recent.extend(other.recent)
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        """Перцентили по окну последних замеров (nearest-rank)"""
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {q: 0.0 for q in qs}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in qs}
+
+
+class _Timer:
+    """Замер одного этапа: контекстный менеджер и декоратор"""
+
+    __slots__ = ("registry", "stage", "started")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+    def __call__(self, func):
+        registry, stage = self.registry, self.stage
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(stage, time.perf_counter() - started)
+
+        return wrapper
+
+
+class _NullTimer:
+    """Замер при выключенных метриках: ничего не делает и не оборачивает функции"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Длительности этапов конвейера анализа
+
+    Замеры из процессов пула анализа собираются через drain() в процессе
+    и merge() в родителе.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, window: int = METRICS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def timed(self, stage: str):
+        """with timed("fetch"): ... или @timed("fetch")"""
+        return _Timer(self, stage) if self.enabled else _NULL_TIMER
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.window)
+            histogram.observe(seconds)
+
+    def drain(self) -> Dict[str, Histogram]:
+        """Забирает накопленные гистограммы (для передачи из процесса пула) и очищает реестр"""
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+        return histograms
+
+    def merge(self, histograms: Dict[str, Histogram]):
+        with self._lock:
+            for stage, other in histograms.items():
+                histogram = self.histograms.get(stage)
+                if histogram is None:
+                    histogram = self.histograms[stage] = Histogram(self.window)
+                histogram.merge(other)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{этап: count, total, p50, p95, p99} в секундах"""
+        with self._lock:
+            histograms = list(self.histograms.items())
+            result = {}
+            for stage, histogram in histograms:
+                quantiles = histogram.quantiles()
+                result[stage] = {
+                    "count": histogram.count,
+                    "total": histogram.total,
+                    "p50": quantiles[0.5],
+                    "p95": quantiles[0.95],
+                    "p99": quantiles[0.99],
+                }
+        return result
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат Prometheus: гистограмма и перцентили по каждому этапу"""
+        lines = [
+            "# HELP betbot_stage_seconds Длительность этапов конвейера анализа",
+            "# TYPE betbot_stage_seconds histogram",
+        ]
+        quantile_lines = [
+            "# HELP betbot_stage_quantile_seconds Перцентили длительности этапов по последним замерам",
+            "# TYPE betbot_stage_quantile_seconds gauge",
+        ]
+        with self._lock:
+            for stage in sorted(self.histograms):
+                histogram = self.histograms[stage]
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    cumulative += count
+                    lines.append(f'betbot_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'betbot_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'betbot_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'betbot_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+                for q, value in histogram.quantiles().items():
+                    quantile_lines.append(
+                        f'betbot_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}'
+                    )
+        return "\n".join(lines + quantile_lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+
+METRICS = MetricsRegistry()
+
+
+def timed(stage: str):
+    """Замер этапа в общем реестре: контекстный менеджер или декоратор"""
+    return METRICS.timed(stage)
+
+
+async def metrics_endpoint(body: bytes, headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+    """Обработчик GET /metrics для webhook.HttpServer"""
+    return 200, "text/plain; version=0.0.4; charset=utf-8", METRICS.render_prometheus().encode()
+
+
+def format_stats(snapshot: Dict[str, Dict[str, float]], title: str = "этап") -> str:
+    """Таблица для /stats: число замеров и p50/p95/p99 в миллисекундах по этапам (или провайдерам)"""
+    if not snapshot:
+        return "Замеров пока нет"
+    width = max(16, max(len(name) for name in snapshot) + 1)
+    lines = [f"{title:<{width}}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}"]
+    for stage in sorted(snapshot):
+        row = snapshot[stage]
+        lines.append(
+            f"{stage:<{width}}{row['count']:>7}"
+            f"{row['p50'] * 1000:>9.2f}{row['p95'] * 1000:>9.2f}{row['p99'] * 1000:>9.2f}"
+        )
+    return "\n".join(lines)
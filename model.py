@@ -1,24 +1,554 @@
-import pandas as pd
-import numpy as np
-
-# ===== xG с учётом последних матчей =====
-def weighted_xg(df, team, date):
-    team_matches = df[(df['home_team']==team) | (df['away_team']==team)]
-    team_matches = team_matches.sort_values("date", ascending=False).head(10)
-    hxg = team_matches['home_xg'].mean() if not team_matches.empty else 1.2
-    axg = team_matches['away_xg'].mean() if not team_matches.empty else 1.0
-    return hxg, axg
-
-# ===== усталость команды =====
-def fatigue(xg, rest_factor):
-    return xg * 0.95 if rest_factor < 3 else xg
-
-# ===== вероятность через Poisson (приблизительно) =====
-def probabilities(home_xg, away_xg):
-    return 0.5  # Заглушка, можно заменить более точной моделью
-
-# ===== Elo рейтинг =====
-def calculate_elo(df):
-    teams = pd.concat([df['home_team'], df['away_team']]).unique()
-    elo = {team:1500 for team in teams}
-    return elo
+import os
+import json
+import logging
+import weakref
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+import pandas as pd
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HISTORY_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historical_matches.csv")
+HISTORY_CACHE_DIR = os.environ.get("HISTORY_CACHE_DIR", ".history_cache")
+HISTORY_CHUNKSIZE = 500_000
+HISTORY_CACHE_VERSION = 1
+
+XG_WINDOW = 10
+DEFAULT_HOME_XG = 1.2
+DEFAULT_AWAY_XG = 1.0
+
+
+# ===== загрузка истории матчей =====
+def _typed_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Приводит сырой кусок CSV к типам; строки с битой датой или счётом отбрасываются"""
+    chunk = pd.DataFrame({
+        'date': pd.to_datetime(chunk['date'], format="%Y-%m-%d", errors="coerce"),
+        'home_team': chunk['home_team'],
+        'away_team': chunk['away_team'],
+        'home_goals': pd.to_numeric(chunk['home_goals'], errors="coerce"),
+        'away_goals': pd.to_numeric(chunk['away_goals'], errors="coerce"),
+    })
+    chunk = chunk.dropna()
+    return chunk.astype({'home_goals': np.int16, 'away_goals': np.int16})
+
+
+def iter_history_chunks(path: str = HISTORY_CSV, chunksize: int = HISTORY_CHUNKSIZE):
+    """Читает историю кусками с явными типами (для потоковой обработки, например EloEngine)"""
+    reader = pd.read_csv(
+        path, sep=";", chunksize=chunksize,
+        dtype={'date': str, 'home_team': str, 'away_team': str, 'home_goals': str, 'away_goals': str},
+    )
+    for chunk in reader:
+        chunk = _typed_chunk(chunk)
+        if len(chunk):
+            yield chunk
+
+
+def _history_cache_path(path: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0])
+
+
+def _csv_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'version': HISTORY_CACHE_VERSION}
+
+
+def _write_history_cache(cache_path: str, signature: dict, teams: list, columns: dict):
+    os.makedirs(cache_path, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(cache_path, f"{name}.npy"), values)
+    # meta.json пишется последним: без него кэш считается неполным
+    tmp = os.path.join(cache_path, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({'signature': signature, 'teams': teams}, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(cache_path, "meta.json"))
+
+
+def _read_history_cache(cache_path: str, signature: dict):
+    meta_path = os.path.join(cache_path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get('signature') != signature:
+        return None
+    columns = {
+        name: np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode="r")
+        for name in ('date', 'home_team', 'away_team', 'home_goals', 'away_goals')
+    }
+    return meta['teams'], columns
+
+
+def _history_frame(teams: list, columns: dict) -> pd.DataFrame:
+    categories = pd.Index(teams)
+    return pd.DataFrame({
+        'date': columns['date'].view("datetime64[ns]"),
+        'home_team': pd.Categorical.from_codes(columns['home_team'], categories=categories),
+        'away_team': pd.Categorical.from_codes(columns['away_team'], categories=categories),
+        'home_goals': columns['home_goals'],
+        'away_goals': columns['away_goals'],
+    })
+
+
+def load_history(path: str = HISTORY_CSV, chunksize: int = HISTORY_CHUNKSIZE,
+                 cache_dir: str = HISTORY_CACHE_DIR, use_cache: bool = True) -> pd.DataFrame:
+    """
+    История матчей с типами: date - datetime64, команды - category, голы - int16
+
+    Первый запуск читает CSV кусками и пишет колоночный кэш (.npy на колонку);
+    следующие запуски открывают его через mmap, пока размер и mtime CSV не изменились.
+    Если в файле нет xG, колонки home_xg/away_xg заполняются голами как приближением.
+    """
+    signature = _csv_signature(path)
+    cache_path = _history_cache_path(path, cache_dir)
+
+    cached = _read_history_cache(cache_path, signature) if use_cache else None
+    if cached is not None:
+        df = _history_frame(*cached)
+    else:
+        team_ids = {}
+        parts = {name: [] for name in ('date', 'home_team', 'away_team', 'home_goals', 'away_goals')}
+        for chunk in iter_history_chunks(path, chunksize):
+            codes, uniques = pd.factorize(pd.concat([chunk['home_team'], chunk['away_team']], ignore_index=True))
+            ids = np.array([team_ids.setdefault(t, len(team_ids)) for t in uniques], dtype=np.int32)[codes]
+            parts['date'].append(chunk['date'].to_numpy(dtype="datetime64[ns]").view(np.int64))
+            parts['home_team'].append(ids[:len(chunk)])
+            parts['away_team'].append(ids[len(chunk):])
+            parts['home_goals'].append(chunk['home_goals'].to_numpy())
+            parts['away_goals'].append(chunk['away_goals'].to_numpy())
+
+        dtypes = {'date': np.int64, 'home_team': np.int32, 'away_team': np.int32,
+                  'home_goals': np.int16, 'away_goals': np.int16}
+        columns = {
+            name: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtypes[name])
+            for name, chunks in parts.items()
+        }
+        teams = list(team_ids)
+        if use_cache:
+            try:
+                _write_history_cache(cache_path, signature, teams, columns)
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось записать кэш истории: {e}")
+        df = _history_frame(teams, columns)
+
+    # В CSV нет xG: до появления реальных данных используем голы
+    df['home_xg'] = df['home_goals'].astype(float)
+    df['away_xg'] = df['away_goals'].astype(float)
+    return df
+
+
+# ===== индекс xG по командам =====
+class TeamXGIndex:
+    """
+    Индекс команда -> матчи по дате с готовыми средними xG за последние XG_WINDOW игр
+
+    rolling[i] - средние home_xg/away_xg по матчам команды с (i - XG_WINDOW, i],
+    поэтому запрос «на дату» - один бинарный поиск.
+    """
+
+    def __init__(self, window: int = XG_WINDOW):
+        self.window = window
+        self._dates = {}     # команда -> отсортированные даты (int64, нс)
+        self._xg = {}        # команда -> [(home_xg, away_xg), ...] в порядке дат
+        self._rolling = {}   # команда -> [(mean_home_xg, mean_away_xg), ...]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, window: int = XG_WINDOW) -> "TeamXGIndex":
+        index = cls(window)
+        dates = pd.to_datetime(df['date']).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        hxg = df['home_xg'].to_numpy(dtype=float)
+        axg = df['away_xg'].to_numpy(dtype=float)
+
+        # Каждый матч попадает в историю обеих команд
+        home = df['home_team'].to_numpy()
+        away = df['away_team'].to_numpy()
+        both = home != away
+        rows = np.arange(len(df))
+        long = pd.DataFrame({
+            'team': np.concatenate([home, away[both]]),
+            'date': np.concatenate([dates, dates[both]]),
+            'row': np.concatenate([rows, rows[both]]),
+            'home_xg': np.concatenate([hxg, hxg[both]]),
+            'away_xg': np.concatenate([axg, axg[both]]),
+        }).sort_values(['team', 'date', 'row'], kind="stable")
+
+        for team, group in long.groupby('team', sort=False):
+            index._dates[team] = group['date'].tolist()
+            index._xg[team] = list(zip(group['home_xg'].tolist(), group['away_xg'].tolist()))
+            index._rolling[team] = []
+            index._recompute(team, 0)
+        return index
+
+    def append(self, date, home_team: str, away_team: str, home_xg: float, away_xg: float):
+        """Добавляет новый результат; средние пересчитываются только от места вставки"""
+        d = int(pd.Timestamp(date).value)
+        for team in {home_team, away_team}:
+            dates = self._dates.setdefault(team, [])
+            xg = self._xg.setdefault(team, [])
+            self._rolling.setdefault(team, [])
+            pos = bisect_right(dates, d)
+            dates.insert(pos, d)
+            xg.insert(pos, (float(home_xg), float(away_xg)))
+            self._recompute(team, pos)
+
+    def _recompute(self, team: str, start: int):
+        """Пересчитывает скользящие средние с позиции start (NaN не учитываются)"""
+        rolling = self._rolling[team]
+        del rolling[start:]
+        first = max(0, start - self.window + 1)
+        values = np.array(self._xg[team][first:], dtype=float).reshape(-1, 2)
+        if not len(values):
+            return
+
+        known = ~np.isnan(values)
+        sums = np.vstack([np.zeros(2), np.cumsum(np.where(known, values, 0.0), axis=0)])
+        counts = np.vstack([np.zeros(2), np.cumsum(known, axis=0)])
+        ends = np.arange(start - first, len(values)) + 1
+        begins = np.maximum(0, ends - self.window)
+        window_sums = sums[ends] - sums[begins]
+        window_counts = counts[ends] - counts[begins]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(window_counts > 0, window_sums / window_counts,
+                             [DEFAULT_HOME_XG, DEFAULT_AWAY_XG])
+        rolling.extend(map(tuple, means.tolist()))
+
+    def query(self, team: str, date=None) -> tuple:
+        """Средние xG команды за последние матчи строго до date (все матчи, если date=None)"""
+        rolling = self._rolling.get(team)
+        if not rolling:
+            return DEFAULT_HOME_XG, DEFAULT_AWAY_XG
+        pos = len(rolling) if date is None else bisect_left(self._dates[team], int(pd.Timestamp(date).value))
+        if pos == 0:
+            return DEFAULT_HOME_XG, DEFAULT_AWAY_XG
+        return rolling[pos - 1]
+
+
+# id(df) -> (weakref на df, отпечаток данных, индекс); запись удаляется вместе с df
+_XG_INDEXES = {}
+
+
+def _xg_fingerprint(df: pd.DataFrame) -> tuple:
+    """Дешёвый отпечаток данных индекса: размер, суммы xG и крайние даты"""
+    if not len(df):
+        return (0,)
+    return (
+        len(df),
+        float(np.nansum(df['home_xg'].to_numpy(dtype=float))),
+        float(np.nansum(df['away_xg'].to_numpy(dtype=float))),
+        df['date'].iloc[0],
+        df['date'].iloc[-1],
+    )
+
+
+def _forget_xg_index(key: int, ref: weakref.ref):
+    cached = _XG_INDEXES.get(key)
+    if cached is not None and cached[0] is ref:
+        del _XG_INDEXES[key]
+
+
+def _xg_index_for(df: pd.DataFrame) -> TeamXGIndex:
+    """
+    Индекс для DataFrame строится один раз и переиспользуется, пока df жив и его отпечаток не менялся
+
+    Правки, не меняющие отпечаток (например, переименование команды на месте),
+    не видны: после них вызовите invalidate_xg_index(df).
+    """
+    key = id(df)
+    fingerprint = _xg_fingerprint(df)
+    cached = _XG_INDEXES.get(key)
+    if cached is not None:
+        ref, cached_fingerprint, index = cached
+        if ref() is df and cached_fingerprint == fingerprint:
+            return index
+    index = TeamXGIndex.from_frame(df)
+    ref = weakref.ref(df, lambda ref, key=key: _forget_xg_index(key, ref))
+    _XG_INDEXES[key] = (ref, fingerprint, index)
+    return index
+
+
+def invalidate_xg_index(df: Optional[pd.DataFrame] = None):
+    """Сбрасывает индекс df (или все), чтобы weighted_xg построил его заново"""
+    if df is None:
+        _XG_INDEXES.clear()
+    else:
+        _XG_INDEXES.pop(id(df), None)
+
+
+# ===== xG с учётом последних матчей =====
+def weighted_xg(df, team, date):
+    """Средние home_xg/away_xg по последним 10 матчам команды до даты date"""
+    index = df if isinstance(df, TeamXGIndex) else _xg_index_for(df)
+    return index.query(team, date)
+
+# ===== усталость команды =====
+def fatigue(xg, rest_factor):
+    return xg * 0.95 if rest_factor < 3 else xg
+
+# ===== вероятность через Poisson =====
+MAX_GOALS = 10
+
+# Рынки и условия на счёт (голы хозяев h, голы гостей a)
+SCORE_MARKETS = {
+    "home": lambda h, a: h > a,
+    "draw": lambda h, a: h == a,
+    "away": lambda h, a: h < a,
+    "over": lambda h, a: h + a > 2.5,
+    "under": lambda h, a: h + a < 2.5,
+    "both_score": lambda h, a: (h > 0) & (a > 0),
+    "fora_minus_0_5": lambda h, a: h - a > 0.5,
+    "fora_minus_1_5": lambda h, a: h - a > 1.5,
+    "fora_minus_2_5": lambda h, a: h - a > 2.5,
+    "double_1x": lambda h, a: h >= a,
+    "double_12": lambda h, a: h != a,
+    "double_x2": lambda h, a: h <= a,
+    "clean_sheet": lambda h, a: a == 0,
+}
+
+_MARKET_MASKS = {}
+
+
+def _market_masks(max_goals: int) -> np.ndarray:
+    """Маски счетов для всех SCORE_MARKETS: (рынки, (max_goals+1)^2)"""
+    masks = _MARKET_MASKS.get(max_goals)
+    if masks is None:
+        h, a = np.meshgrid(np.arange(max_goals + 1), np.arange(max_goals + 1), indexing="ij")
+        masks = np.stack([cond(h, a).ravel() for cond in SCORE_MARKETS.values()]).astype(float)
+        _MARKET_MASKS[max_goals] = masks
+    return masks
+
+
+def poisson_pmf(rates, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """P(k голов) для k = 0..max_goals по каждому значению rates: (n, max_goals+1)"""
+    rates = np.asarray(rates, dtype=float).reshape(-1, 1)
+    k = np.arange(max_goals + 1)
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, max_goals + 1)))])
+    # При нулевом xG вся масса в 0 голов: log(1) вместо log(0), чтобы не получить 0 * -inf
+    log_pmf = k * np.log(np.where(rates > 0, rates, 1.0)) - rates - log_factorial
+    pmf = np.exp(log_pmf)
+    pmf[rates[:, 0] <= 0, 1:] = 0.0
+    return pmf
+
+
+def score_matrix(home_xg, away_xg, max_goals: int = MAX_GOALS, rho: float = 0.0) -> np.ndarray:
+    """
+    Матрицы вероятностей счёта для всего слейта: (n, max_goals+1, max_goals+1)
+
+    rho != 0 включает поправку Диксона-Коулза для счетов 0:0, 1:0, 0:1, 1:1.
+    Матрицы нормируются на 1 после усечения по max_goals.
+    """
+    home_xg = np.asarray(home_xg, dtype=float).ravel()
+    away_xg = np.asarray(away_xg, dtype=float).ravel()
+    matrix = poisson_pmf(home_xg, max_goals)[:, :, None] * poisson_pmf(away_xg, max_goals)[:, None, :]
+
+    if rho:
+        matrix[:, 0, 0] *= 1 - home_xg * away_xg * rho
+        matrix[:, 0, 1] *= 1 + home_xg * rho
+        matrix[:, 1, 0] *= 1 + away_xg * rho
+        matrix[:, 1, 1] *= 1 - rho
+        np.clip(matrix, 0.0, None, out=matrix)
+
+    matrix /= matrix.sum(axis=(1, 2), keepdims=True)
+    return matrix
+
+
+def market_probabilities(home_xg, away_xg, max_goals: int = MAX_GOALS, rho: float = 0.0) -> dict:
+    """Вероятности всех SCORE_MARKETS для массивов xG: {рынок: массив (n,)}"""
+    matrix = score_matrix(home_xg, away_xg, max_goals, rho)
+    probs = matrix.reshape(len(matrix), -1) @ _market_masks(max_goals).T
+    return {market: probs[:, i] for i, market in enumerate(SCORE_MARKETS)}
+
+
+def probabilities(home_xg, away_xg, rho: float = 0.0):
+    """Вероятности рынков для одного матча: {рынок: float}"""
+    probs = market_probabilities([home_xg], [away_xg], rho=rho)
+    return {market: float(values[0]) for market, values in probs.items()}
+
+# ===== Elo рейтинг =====
+ELO_INITIAL = 1500.0
+ELO_K_FACTOR = 20.0
+ELO_HOME_ADVANTAGE = 100.0
+
+
+def goal_difference_multiplier(goal_diff):
+    """Множитель K от разницы мячей (как в World Football Elo); принимает и массивы"""
+    goal_diff = np.abs(goal_diff)
+    return np.where(goal_diff <= 1, 1.0, np.where(goal_diff == 2, 1.5, (11 + goal_diff) / 8))
+
+
+class EloEngine:
+    """
+    Последовательный Elo по матчам в порядке дат
+
+    Рейтинги хранятся массивом по id команды. update() принимает очередной
+    кусок истории (DataFrame с date, home_team, away_team, home_goals, away_goals),
+    поэтому CSV можно читать потоком, а после checkpoint - дописывать только новые матчи.
+    """
+
+    def __init__(self, k_factor: float = ELO_K_FACTOR, home_advantage: float = ELO_HOME_ADVANTAGE,
+                 initial: float = ELO_INITIAL, use_goal_difference: bool = True,
+                 track_history: bool = False):
+        self.k_factor = k_factor
+        self.home_advantage = home_advantage
+        self.initial = initial
+        self.use_goal_difference = use_goal_difference
+        self.track_history = track_history
+        self.team_ids = {}
+        self.ratings = np.empty(0)
+        self.last_date = None
+        self.last_day_matches = set()   # (хозяева, гости), уже применённые в день last_date
+        self.matches_processed = 0
+        self._history = {}   # id команды -> ([даты], [рейтинг после матча])
+
+    def _team_id(self, team: str) -> int:
+        team_id = self.team_ids.get(team)
+        if team_id is None:
+            team_id = self.team_ids[team] = len(self.team_ids)
+        return team_id
+
+    def update(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Применяет матчи куска и возвращает их рейтинги ДО матча (без заглядывания вперёд)
+
+        Внутри куска матчи сортируются по дате, но куски должны идти по порядку:
+        матчи раньше last_date применить уже нельзя, они пропускаются с предупреждением.
+        Матчи дня last_date, которые уже были применены (повторная подача истории
+        после checkpoint), пропускаются молча, новые матчи этого дня - применяются.
+        """
+        chunk = chunk.assign(date=pd.to_datetime(chunk['date'])).sort_values('date', kind="stable")
+        if self.last_date is not None:
+            stale = chunk['date'] < self.last_date
+            if stale.any():
+                logger.warning(f"⚠️ Elo: пропущено {int(stale.sum())} матчей раньше {self.last_date.date()}")
+            same_day = chunk['date'] == self.last_date
+            if same_day.any():
+                pairs = zip(chunk['home_team'][same_day], chunk['away_team'][same_day])
+                applied = np.array([pair in self.last_day_matches for pair in pairs])
+                stale.loc[same_day] = applied
+            chunk = chunk[~stale]
+
+        codes, uniques = pd.factorize(pd.concat([chunk['home_team'], chunk['away_team']], ignore_index=True))
+        chunk_ids = np.array([self._team_id(t) for t in uniques], dtype=np.int64)[codes]
+        home_ids = chunk_ids[:len(chunk)].tolist()
+        away_ids = chunk_ids[len(chunk):].tolist()
+        if len(self.team_ids) > len(self.ratings):
+            self.ratings = np.concatenate([
+                self.ratings, np.full(len(self.team_ids) - len(self.ratings), self.initial)
+            ])
+
+        # Последовательная зависимость: цикл по спискам быстрее, чем по элементам numpy
+        ratings = self.ratings.tolist()
+        dates = chunk['date'].tolist() if self.track_history else None
+        home_advantage = self.home_advantage
+        home_pre = [0.0] * len(home_ids)
+        away_pre = [0.0] * len(home_ids)
+
+        # Результат и K считаются векторно, в цикле остаётся только зависимая от рейтингов часть
+        goal_diff = chunk['home_goals'].to_numpy() - chunk['away_goals'].to_numpy()
+        actuals = np.where(goal_diff > 0, 1.0, np.where(goal_diff == 0, 0.5, 0.0)).tolist()
+        if self.use_goal_difference:
+            ks = (self.k_factor * goal_difference_multiplier(goal_diff)).tolist()
+        else:
+            ks = [self.k_factor] * len(home_ids)
+
+        for i, (h, a, actual, k) in enumerate(zip(home_ids, away_ids, actuals, ks)):
+            rh, ra = ratings[h], ratings[a]
+            home_pre[i], away_pre[i] = rh, ra
+            expected = 1.0 / (1.0 + 10 ** ((ra - rh - home_advantage) / 400.0))
+            delta = k * (actual - expected)
+            ratings[h] = rh + delta
+            ratings[a] = ra - delta
+            if self.track_history:
+                for team_id in (h, a):
+                    team_dates, team_ratings = self._history.setdefault(team_id, ([], []))
+                    team_dates.append(dates[i])
+                    team_ratings.append(ratings[team_id])
+
+        self.ratings = np.array(ratings)
+        self.matches_processed += len(home_ids)
+        if len(chunk):
+            last_date = chunk['date'].iloc[-1]
+            if last_date != self.last_date:
+                self.last_date = last_date
+                self.last_day_matches = set()
+            last_day = (chunk['date'] == last_date).to_numpy()
+            self.last_day_matches.update(zip(chunk['home_team'][last_day], chunk['away_team'][last_day]))
+
+        return chunk.assign(home_elo=home_pre, away_elo=away_pre)
+
+    def rating(self, team: str) -> float:
+        team_id = self.team_ids.get(team)
+        return float(self.ratings[team_id]) if team_id is not None else self.initial
+
+    def rating_at(self, team: str, date) -> float:
+        """Рейтинг команды перед матчами даты date (нужен track_history=True)"""
+        team_id = self.team_ids.get(team)
+        if team_id is None or team_id not in self._history:
+            return self.initial
+        team_dates, team_ratings = self._history[team_id]
+        pos = bisect_left(team_dates, pd.Timestamp(date))
+        return team_ratings[pos - 1] if pos else self.initial
+
+    def as_dict(self) -> dict:
+        return {team: float(self.ratings[i]) for team, i in self.team_ids.items()}
+
+    def save_checkpoint(self, path: str):
+        """
+        Сохраняет рейтинги, чтобы потом применять только новые матчи
+
+        Только числовые и строковые массивы: load_checkpoint читает файл без pickle.
+        История для rating_at хранится плоско: (id команды, дата, рейтинг после матча).
+        """
+        history_teams, history_dates, history_ratings = [], [], []
+        for team_id, (team_dates, team_ratings) in self._history.items():
+            history_teams.extend([team_id] * len(team_dates))
+            history_dates.extend(pd.Timestamp(date).value for date in team_dates)
+            history_ratings.extend(team_ratings)
+
+        np.savez(
+            path,
+            teams=np.array(list(self.team_ids), dtype=str),
+            ratings=self.ratings,
+            last_date=np.array([self.last_date.value if self.last_date is not None else -1]),
+            last_day_matches=np.array(
+                [(self.team_ids[home], self.team_ids[away]) for home, away in sorted(self.last_day_matches)],
+                dtype=np.int64,
+            ).reshape(-1, 2),
+            matches_processed=np.array([self.matches_processed]),
+            params=np.array([self.k_factor, self.home_advantage, self.initial,
+                             float(self.use_goal_difference), float(self.track_history)]),
+            history_teams=np.array(history_teams, dtype=np.int64),
+            history_dates=np.array(history_dates, dtype=np.int64),
+            history_ratings=np.array(history_ratings, dtype=float),
+        )
+
+    @classmethod
+    def load_checkpoint(cls, path: str) -> "EloEngine":
+        """Движок из save_checkpoint; чекпойнты прежних версий (с pickle) не читаются - пересчитайте"""
+        data = np.load(path, allow_pickle=False)
+        k_factor, home_advantage, initial, use_goal_difference, track_history = data['params'].tolist()
+        engine = cls(k_factor, home_advantage, initial, bool(use_goal_difference), bool(track_history))
+        teams = data['teams'].tolist()
+        engine.team_ids = {team: i for i, team in enumerate(teams)}
+        engine.ratings = data['ratings'].astype(float)
+        last_date = int(data['last_date'][0])
+        engine.last_date = pd.Timestamp(last_date) if last_date >= 0 else None
+        engine.last_day_matches = {(teams[home], teams[away]) for home, away in data['last_day_matches'].tolist()}
+        engine.matches_processed = int(data['matches_processed'][0])
+
+        dates = [pd.Timestamp(value) for value in data['history_dates'].tolist()]
+        for team_id, date, rating in zip(data['history_teams'].tolist(), dates, data['history_ratings'].tolist()):
+            team_dates, team_ratings = engine._history.setdefault(team_id, ([], []))
+            team_dates.append(date)
+            team_ratings.append(rating)
+        return engine
+
+
+def calculate_elo(df, **params):
+    """Elo всех команд после истории df (DataFrame или итератор кусков CSV)"""
+    engine = EloEngine(**params)
+    chunks = [df] if isinstance(df, pd.DataFrame) else df
+    for chunk in chunks:
+        engine.update(chunk)
+    return engine.as_dict()
@@ -0,0 +1,184 @@
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from real_apis import (
+    ANALYSIS_MARKETS, ODDS_MARKETS, OddsMatrix, MatchSnapshot,
+    analysis_probabilities, select_value_bets, summarize_quotes,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class OddsDelta(NamedTuple):
+    """Изменение котировки: old = NaN, если котировки раньше не было"""
+    match_id: str
+    bookmaker: str
+    market: str
+    old: float
+    new: float
+
+
+def match_id(match) -> str:
+    """Ключ матча в потоке тиков: Home vs Away @ YYYY-MM-DD HH:MM"""
+    return f"{match['home']} vs {match['away']} @ {match['time'].strftime('%Y-%m-%d %H:%M')}"
+
+
+def match_ids(matches: Iterable) -> List[str]:
+    """
+    Уникальные ключи матчей слейта в порядке строк
+
+    Одинаковые пары команд в один день встречаются (в том числе в разных лигах),
+    поэтому повторы получают суффикс: второй - "#2", третий - "#3".
+    """
+    ids = []
+    seen: Dict[str, int] = {}
+    for match in matches:
+        base = match_id(match)
+        seen[base] = seen.get(base, 0) + 1
+        ids.append(base if seen[base] == 1 else f"{base} #{seen[base]}")
+    return ids
+
+
+class OddsStream:
+    """
+    Последние цены по (матч, букмекер, рынок) и VALUE ставки, пересчитываемые по изменениям
+
+    apply() сравнивает тики с последней известной ценой, отбрасывает повторы
+    и пересчитывает лучшие коэффициенты и value только для затронутых матчей,
+    поэтому стоимость обновления пропорциональна числу изменившихся котировок.
+    """
+
+    def __init__(self, snapshot: MatchSnapshot, min_value: float = 0.025,
+                 odd_min: float = 1.3, odd_max: float = 3.5):
+        self.min_value = min_value
+        self.odd_min = odd_min
+        self.odd_max = odd_max
+
+        self.entries = [(league_name, match) for league_name, matches in snapshot.items() for match in matches]
+        matches = [match for _, match in self.entries]
+        self.matrix = OddsMatrix.from_matches(matches)
+        self.rows = {key: i for i, key in enumerate(match_ids(matches))}
+        self.bookmaker_index = {bm: i for i, bm in enumerate(self.matrix.bookmakers)}
+        self.market_columns = [self.matrix.market_index[key] for _, key, _ in ANALYSIS_MARKETS]
+        self.true_probs = analysis_probabilities(matches)
+
+        self.ticks_seen = 0
+        self.deltas_applied = 0
+        self.bets_by_row: Dict[int, list] = {}
+        self._recompute(np.arange(len(matches)))
+
+    def apply(self, ticks: Iterable[Dict]) -> List[OddsDelta]:
+        """
+        Применяет пачку тиков {"match", "bookmaker", "market", "odds"}
+
+        Тики по неизвестным матчам и рынкам пропускаются; новый букмекер добавляется в матрицу.
+        """
+        deltas = []
+        changed_rows = set()
+        odds = self.matrix.odds
+
+        for tick in ticks:
+            self.ticks_seen += 1
+            row = self.rows.get(tick["match"])
+            column = self.matrix.market_index.get(tick["market"])
+            if row is None or column is None:
+                continue
+            bm = self.bookmaker_index.get(tick["bookmaker"])
+            if bm is None:
+                bm = self._add_bookmaker(tick["bookmaker"])
+                odds = self.matrix.odds
+
+            new = float(tick["odds"]) if tick["odds"] is not None else np.nan
+            old = odds[row, bm, column]
+            if old == new or (np.isnan(old) and np.isnan(new)):
+                continue
+            odds[row, bm, column] = new
+            deltas.append(OddsDelta(tick["match"], tick["bookmaker"], tick["market"], float(old), new))
+            changed_rows.add(row)
+
+        if changed_rows:
+            self._recompute(np.fromiter(changed_rows, dtype=np.int64))
+        self.deltas_applied += len(deltas)
+        return deltas
+
+    def _add_bookmaker(self, bookmaker: str) -> int:
+        odds = self.matrix.odds
+        column = np.full((odds.shape[0], 1, odds.shape[2]), np.nan)
+        self.matrix.odds = np.concatenate([odds, column], axis=1)
+        self.matrix.bookmakers.append(bookmaker)
+        self.bookmaker_index[bookmaker] = len(self.bookmaker_index)
+        return self.bookmaker_index[bookmaker]
+
+    def _recompute(self, rows: np.ndarray):
+        cube = self.matrix.odds[rows][:, :, self.market_columns]
+        best_odds, spreads, counts = summarize_quotes(cube)
+        entries = [self.entries[row] for row in rows]
+        positions, bets = select_value_bets(entries, best_odds, spreads, counts, self.true_probs[rows],
+                                            self.min_value, self.odd_min, self.odd_max)
+
+        row_list = rows.tolist()
+        for row in row_list:
+            self.bets_by_row[row] = []
+        for position, bet in zip(positions.tolist(), bets):
+            self.bets_by_row[row_list[position]].append(bet)
+
+    def current_bets(self) -> list:
+        """Все текущие VALUE ставки, лучшие сверху (как analyze_matches)"""
+        rows = sorted(self.bets_by_row)
+        bets = [bet for row in rows for bet in self.bets_by_row[row]]
+        bets.sort(key=lambda x: x[0], reverse=True)
+        return bets
+
+
+def read_ticks(path: str) -> Iterator[Dict]:
+    """Читает записанный поток тиков (одна JSON-строка на тик)"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def write_ticks(path: str, ticks: Iterable[Dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        for tick in ticks:
+            f.write(json.dumps(tick, ensure_ascii=False) + "\n")
+
+
+def replay(stream: OddsStream, ticks: Iterable[Dict], batch_size: int = 100) -> Iterator[List[OddsDelta]]:
+    """Прогоняет тики через поток пачками; отдаёт изменения каждой пачки"""
+    batch = []
+    for tick in ticks:
+        batch.append(tick)
+        if len(batch) >= batch_size:
+            yield stream.apply(batch)
+            batch = []
+    if batch:
+        yield stream.apply(batch)
+
+
+def random_ticks(stream: OddsStream, count: int, seed: Optional[int] = None,
+                 volatility: float = 0.03) -> List[Dict]:
+    """Синтетический поток тиков по матчам stream: для офлайн-тестов и бенчмарков"""
+    rng = np.random.default_rng(seed)
+    ids = list(stream.rows)
+    rows = rng.integers(0, len(ids), count)
+    bms = rng.integers(0, len(stream.matrix.bookmakers), count)
+    columns = rng.integers(0, len(ODDS_MARKETS), count)
+    moves = rng.normal(1.0, volatility, count)
+    ticks = []
+    for row, bm, column, move in zip(rows.tolist(), bms.tolist(), columns.tolist(), moves.tolist()):
+        current = stream.matrix.odds[row, bm, column]
+        if np.isnan(current):
+            continue
+        ticks.append({
+            "match": ids[row],
+            "bookmaker": stream.matrix.bookmakers[bm],
+            "market": ODDS_MARKETS[column],
+            "odds": round(float(current) * move, 3),
+        })
+    return ticks
@@ -0,0 +1,309 @@
+import os
+import zlib
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from real_apis import BOOKMAKER_JITTER, GENERATED_BOOKMAKERS, MatchRecord
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Фиксированный seed синтетического фида (пусто - свой seed на каждый день)
+PROVIDER_SEED = os.environ.get("PROVIDER_SEED")
+
+# Время отсчёта дат синтетических матчей: сегодня в SYNTHETIC_KICKOFF_HOUR
+SYNTHETIC_KICKOFF_HOUR = 19
+
+# Команды синтетического фида real_apis по id лиги
+SYNTHETIC_TEAMS = {
+    39: ["Manchester City", "Liverpool", "Arsenal", "Chelsea", "Manchester United", "Tottenham", "Newcastle"],
+    140: ["Barcelona", "Real Madrid", "Atletico Madrid", "Sevilla", "Valencia"],
+    78: ["Bayern Munich", "Borussia Dortmund", "RB Leipzig", "Bayer Leverkusen"],
+    135: ["Juventus", "AS Roma", "AC Milan", "Napoli", "Inter Milan"],
+    61: ["Paris Saint Germain", "Marseille", "AS Monaco", "Lyon"],
+    94: ["Benfica", "Porto", "Sporting", "Braga"],
+    88: ["Ajax", "PSV", "Feyenoord", "AZ Alkmaar"],
+    530: ["Real Madrid", "Manchester City", "Bayern Munich", "Liverpool"],
+    130: ["Inter Miami", "LA Galaxy", "Seattle Sounders"],
+    40: ["Leeds United", "Southampton", "Leicester City"],
+    136: ["Parma", "Como", "Pisa"],
+    79: ["Cologne", "Hamburger SV", "Schalke 04"],
+}
+DEFAULT_TEAMS = ["Team A", "Team B", "Team C", "Team D"]
+
+# Команды матчей deep_analysis_v2 по названию лиги
+SYNTHETIC_FIXTURE_TEAMS = {
+    "🏴 Английская Премьер-лига": [
+        "Manchester City", "Liverpool", "Arsenal", "Chelsea", "Manchester United",
+        "Tottenham", "Newcastle", "Brighton", "Aston Villa", "West Ham"
+    ],
+    "🇪🇸 Испанская Ла Лига": [
+        "Barcelona", "Real Madrid", "Atletico Madrid", "Sevilla", "Valencia"
+    ],
+    "🇩🇪 Немецкая Бундеслига": [
+        "Bayern Munich", "Borussia Dortmund", "RB Leipzig", "Bayer Leverkusen"
+    ],
+    "🇮🇹 Итальянская Серия А": [
+        "Juventus", "AS Roma", "AC Milan", "Napoli", "Inter Milan"
+    ],
+    "🇫🇷 Французская Лига 1": [
+        "Paris Saint Germain", "Marseille", "Monaco", "Lyon"
+    ],
+}
+
+BOOKMAKER_MARGIN = 0.04
+
+
+class MatchProvider(ABC):
+    """
+    Источник матчей, коэффициентов и профилей команд
+
+    Синтетический фид и будущий реальный реализуют один интерфейс, поэтому
+    real_apis и deep_analysis_v2 не зависят от того, откуда берутся данные.
+    """
+
+    @abstractmethod
+    def league_matches(self, league_id: int, league_name: str) -> List[MatchRecord]:
+        """Матчи лиги с коэффициентами букмекеров (формат real_apis)"""
+
+    @abstractmethod
+    def fixtures(self) -> List[Dict]:
+        """Ближайшие матчи для deep_analysis_v2: home_team, away_team, league, date"""
+
+    @abstractmethod
+    def fixture_odds(self, fixtures: List[Dict]) -> np.ndarray:
+        """Коэффициенты П1/X/П2 для fixtures: массив (n, 3)"""
+
+    @abstractmethod
+    def match_adjustments(self, fixtures: List[Dict]) -> np.ndarray:
+        """Поправки H2H и мотивации для fixtures: массив (n, 2)"""
+
+    @abstractmethod
+    def team_profile(self, team_name: str, league: str, data_version: int) -> Dict:
+        """Профиль команды: form, home_away, injuries, recent_matches, head_to_head"""
+
+    @property
+    def cache_key(self) -> str:
+        """Идентичность фида для ключей кэша ответов: разные фиды не делят записи"""
+        return type(self).__name__
+
+
+class SyntheticProvider(MatchProvider):
+    """
+    Синтетический фид с воспроизводимыми данными
+
+    Случайные величины тянутся пачками из numpy-генератора. У каждого метода
+    свой поток, производный от seed и ключа вызова, поэтому результат не зависит
+    от порядка вызовов и параллельной загрузки лиг. seed=None - новые данные каждый раз.
+
+    matches_per_league, bookmakers и fixtures_count задают размер слейта
+    для бенчмарков; по умолчанию - обычный небольшой фид.
+    """
+
+    def __init__(self, seed: Optional[int] = None, base_time: Optional[datetime] = None,
+                 matches_per_league: Optional[int] = None, bookmakers: Optional[int] = None,
+                 fixtures_count: Optional[int] = None):
+        self.seed = seed
+        self.base_time = base_time
+        self.matches_per_league = matches_per_league
+        self.bookmakers = synthetic_bookmakers(bookmakers) if bookmakers else GENERATED_BOOKMAKERS
+        self.fixtures_count = fixtures_count
+
+    @property
+    def cache_key(self) -> str:
+        return (f"synthetic:{self.seed}:{self.base_time}:{self.matches_per_league}:"
+                f"{len(self.bookmakers)}:{self.fixtures_count}")
+
+    def _rng(self, *key: int) -> np.random.Generator:
+        if self.seed is None:
+            return np.random.default_rng()
+        return np.random.default_rng([self.seed, *key])
+
+    def _now(self) -> datetime:
+        return self.base_time or datetime.now()
+
+    def league_matches(self, league_id: int, league_name: str) -> List[MatchRecord]:
+        team_list = SYNTHETIC_TEAMS.get(league_id, DEFAULT_TEAMS)
+        n = self.matches_per_league or min(20, len(team_list) * 2)
+        rng = self._rng(1, league_id)
+
+        home_idx = rng.integers(0, len(team_list), n)
+        away_idx = (home_idx + rng.integers(1, len(team_list), n)) % len(team_list)
+
+        # 1. Реальные вероятности (основаны на реальных данных)
+        home_prob = rng.uniform(0.35, 0.55, n)
+        draw_prob = rng.uniform(0.20, 0.35, n)
+        away_prob = 1 - home_prob - draw_prob
+        over_prob = rng.uniform(0.48, 0.52, n)
+        under_prob = 1 - over_prob
+        fora_prob = rng.uniform(0.43, 0.52, n)
+        both_score_prob = rng.uniform(0.45, 0.55, n)
+        clean_sheet_prob = rng.uniform(0.30, 0.45, n)
+        half = np.full(n, 0.50)  # жёлтые и углы - 50/50
+        days = rng.integers(1, 31, n)
+
+        # 2. Коэффициенты с маржой букмекера, колонки в порядке ODDS_MARKETS
+        probs = np.column_stack([
+            home_prob, draw_prob, away_prob, over_prob, under_prob, fora_prob,
+            home_prob + draw_prob, home_prob + away_prob, draw_prob + away_prob,
+            half, half, both_score_prob, half, clean_sheet_prob,
+        ])
+        consensus = (1 + BOOKMAKER_MARGIN) / np.column_stack([
+            home_prob, draw_prob, away_prob,
+            over_prob, under_prob,
+            home_prob + draw_prob, fora_prob, home_prob * 0.6,
+            home_prob + draw_prob, home_prob + away_prob, draw_prob + away_prob,
+            half, half,
+            half, both_score_prob, clean_sheet_prob,
+        ])
+        jitter = rng.uniform(-1.0, 1.0, (n, len(self.bookmakers), len(BOOKMAKER_JITTER)))
+        bookmaker_odds = consensus[:, None, :] + jitter * np.asarray(BOOKMAKER_JITTER)
+
+        now = self._now()
+        return [
+            MatchRecord(
+                team_list[home_idx[i]], team_list[away_idx[i]],
+                now + timedelta(days=int(days[i])),
+                probs[i], consensus[i], bookmaker_odds[i], self.bookmakers,
+            )
+            for i in range(n)
+        ]
+
+    def fixtures(self) -> List[Dict]:
+        pairs = []
+        if self.fixtures_count is None:
+            for league, teams in SYNTHETIC_FIXTURE_TEAMS.items():
+                for i in range(min(3, len(teams))):
+                    home = teams[i]
+                    away = teams[(i + 1) % len(teams)]
+                    if home != away:
+                        pairs.append((home, away, league))
+        else:
+            # Лиги по кругу; соперник сдвигается на каждом витке, чтобы пары не повторялись подряд
+            leagues = list(SYNTHETIC_FIXTURE_TEAMS.items())
+            for k in range(self.fixtures_count):
+                league, teams = leagues[k % len(leagues)]
+                j = k // len(leagues)
+                offset = 1 + (j // len(teams)) % (len(teams) - 1)
+                pairs.append((teams[j % len(teams)], teams[(j + offset) % len(teams)], league))
+
+        days = self._rng(2).integers(1, 31, len(pairs))
+        now = self._now()
+        return [
+            {'home_team': home, 'away_team': away, 'league': league,
+             'date': now + timedelta(days=int(day))}
+            for (home, away, league), day in zip(pairs, days)
+        ]
+
+    def fixture_odds(self, fixtures: List[Dict]) -> np.ndarray:
+        rng = self._rng(3)
+        n = len(fixtures)
+        return np.column_stack([
+            rng.uniform(1.5, 2.5, n),
+            rng.uniform(2.5, 3.5, n),
+            rng.uniform(2.0, 3.0, n),
+        ])
+
+    def match_adjustments(self, fixtures: List[Dict]) -> np.ndarray:
+        # Поправки зависят от самого матча, а не от его позиции в пачке: MatchAnalyzer,
+        # созданный для одного матча, получает те же значения, что и полный анализ
+        if self.seed is None:
+            uniforms = np.random.default_rng().random((len(fixtures), 2))
+        else:
+            uniforms = self._fixture_uniforms(fixtures, 4)
+        return np.column_stack([
+            -0.10 + 0.20 * uniforms[:, 0],
+            -0.05 + 0.13 * uniforms[:, 1],
+        ])
+
+    def _fixture_uniforms(self, fixtures: List[Dict], stream: int) -> np.ndarray:
+        """Две равномерные величины в [0, 1) на матч из хэша (seed, stream, команды, лига)"""
+        digests = b"".join(
+            hashlib.blake2b(
+                f"{self.seed}|{stream}|{f['home_team']}|{f['away_team']}|{f['league']}".encode("utf-8"),
+                digest_size=16,
+            ).digest()
+            for f in fixtures
+        )
+        words = np.frombuffer(digests, dtype="<u8").reshape(len(fixtures), 2)
+        return (words >> np.uint64(11)) * (1.0 / 2 ** 53)
+
+    def team_profile(self, team_name: str, league: str, data_version: int) -> Dict:
+        # Профиль зависит только от ключа: одинаков в любом процессе и прогоне
+        rng = np.random.default_rng([
+            zlib.crc32(team_name.encode("utf-8")), zlib.crc32(league.encode("utf-8")), data_version
+        ])
+        form, home_wins, away_wins, home_goals, away_goals, injury_roll = rng.uniform(
+            [-0.15, 0.30, 0.15, 1.3, 0.8, 0.0], [0.25, 0.70, 0.55, 2.5, 1.8, 1.0]
+        ).tolist()
+        results = rng.choice(['W', 'D', 'L'], 5).tolist()
+        goals_for = rng.integers(0, 5, 5).tolist()
+        goals_against = rng.integers(0, 4, 5).tolist()
+
+        injuries = []
+        if injury_roll < 0.20:
+            injuries.append({
+                'player': f'Key Player {team_name}',
+                'position': 'Defender',
+                'impact': -0.10
+            })
+
+        return {
+            'form': form,
+            'home_away': {
+                'home_wins_pct': home_wins,
+                'away_wins_pct': away_wins,
+                'home_avg_goals': home_goals,
+                'away_avg_goals': away_goals,
+            },
+            'injuries': injuries,
+            'recent_matches': [
+                {'result': r, 'goals_for': gf, 'goals_against': ga}
+                for r, gf, ga in zip(results, goals_for, goals_against)
+            ],
+            'head_to_head': {},
+        }
+
+
+def synthetic_bookmakers(count: int) -> tuple:
+    """count букмекеров: сначала GENERATED_BOOKMAKERS, дальше bookmaker_11, bookmaker_12, ..."""
+    extra = tuple(f"bookmaker_{i}" for i in range(len(GENERATED_BOOKMAKERS) + 1, count + 1))
+    return (GENERATED_BOOKMAKERS + extra)[:count]
+
+
+def default_provider(day: date) -> SyntheticProvider:
+    """
+    Синтетический фид на день day
+
+    Слейт и даты матчей не меняются в течение дня, как у реального фида,
+    поэтому повторные прогоны анализа (и уведомления) видят те же матчи.
+    """
+    seed = int(PROVIDER_SEED) if PROVIDER_SEED else day.toordinal()
+    return SyntheticProvider(seed, base_time=datetime.combine(day, time(SYNTHETIC_KICKOFF_HOUR)))
+
+
+_PROVIDER: Optional[MatchProvider] = None
+# День, на который построен фид по умолчанию; None - фид задан через set_provider()
+_PROVIDER_DAY: Optional[date] = None
+
+
+def get_provider() -> MatchProvider:
+    """Текущий источник данных (по умолчанию - default_provider на сегодня)"""
+    global _PROVIDER, _PROVIDER_DAY
+    today = date.today()
+    if _PROVIDER is None or (_PROVIDER_DAY is not None and _PROVIDER_DAY != today):
+        _PROVIDER = default_provider(today)
+        _PROVIDER_DAY = today
+    return _PROVIDER
+
+
+def set_provider(provider: Optional[MatchProvider]):
+    """Подменяет источник данных: реальный фид, фиксированный seed для тестов и бенчмарков; None - по умолчанию"""
+    global _PROVIDER, _PROVIDER_DAY
+    _PROVIDER = provider
+    _PROVIDER_DAY = None
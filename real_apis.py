@@ -1,9 +1,16 @@
+import os
 import requests
 import logging
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from itertools import combinations
 from collections import defaultdict
 import numpy as np
 
+from metrics import timed
+from response_cache import cached
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -26,6 +33,56 @@ BOOKMAKERS = {
     "bovada": "https://api.bovada.lv",
 }
 
+# Колонки матрицы коэффициентов: списочный рынок h2h разворачивается в три исхода
+LIST_MARKETS = {"h2h": ("h2h_1", "h2h_x", "h2h_2")}
+ODDS_MARKETS = [
+    "h2h_1", "h2h_x", "h2h_2",
+    "over_2_5", "under_2_5",
+    "fora_minus_0_5", "fora_minus_1_5", "fora_minus_2_5",
+    "double_1x", "double_12", "double_x2",
+    "yellow_over_8", "yellow_under_8",
+    "corners", "both_score", "clean_sheet",
+]
+
+MARKET_COLUMNS = {market: (i,) for i, market in enumerate(ODDS_MARKETS)}
+for _list_market, _columns in LIST_MARKETS.items():
+    MARKET_COLUMNS[_list_market] = tuple(ODDS_MARKETS.index(c) for c in _columns)
+
+# Рынки в словарном формате: колонки списочных рынков сворачиваются обратно
+DICT_MARKETS = []
+for _market in ODDS_MARKETS:
+    _parent = next((name for name, cols in LIST_MARKETS.items() if _market in cols), _market)
+    if _parent not in DICT_MARKETS:
+        DICT_MARKETS.append(_parent)
+
+# Ключи реальных вероятностей матча (порядок хранения в MatchRecord.probs)
+PROB_KEYS = (
+    "home", "draw", "away", "over", "under", "fora_minus_1_5",
+    "double_1x", "double_12", "double_x2", "yellow_over", "yellow_under",
+    "both_score", "corners", "clean_sheet",
+)
+PROB_INDEX = {key: i for i, key in enumerate(PROB_KEYS)}
+
+# Анализируемые рынки: (название, ключ коэффициента, ключ реальной вероятности)
+ANALYSIS_MARKETS = [
+    ("Over 2.5", "over_2_5", "over"),
+    ("Under 2.5", "under_2_5", "under"),
+    ("Фора -0.5", "fora_minus_0_5", "double_1x"),
+    ("Фора -1.5", "fora_minus_1_5", "fora_minus_1_5"),
+    ("1X (дома/ничья)", "double_1x", "double_1x"),
+    ("12 (не-ничья)", "double_12", "double_12"),
+    ("X2 (ничья/гости)", "double_x2", "double_x2"),
+    ("Жёлтых Over 8.5", "yellow_over_8", "yellow_over"),
+    ("Жёлтых Under 8.5", "yellow_under_8", "yellow_under"),
+    ("Обе забьют", "both_score", "both_score"),
+    ("Углы", "corners", "corners"),
+    ("Чистый лист", "clean_sheet", "clean_sheet"),
+]
+
+# Параллельная загрузка лиг
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "6"))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "15"))
+
 LEAGUES = {
     "🏴󠁧󠁢󠁥󠁮󠁧󠁿 Английская Премьер-лига": 39,
     "🇪🇸 Испанская Ла Лига": 140,
@@ -42,161 +99,264 @@ LEAGUES = {
 }
 
 
+# Букмекеры синтетического фида: один общий кортеж на все матчи
+GENERATED_BOOKMAKERS = tuple(list(BOOKMAKERS.keys())[:10])
+
+# Разброс котировок букмекеров вокруг консенсуса по колонкам ODDS_MARKETS
+BOOKMAKER_JITTER = (
+    0.05, 0.05, 0.05,
+    0.1, 0.1,
+    0.05, 0.1, 0.15,
+    0.05, 0.05, 0.05,
+    0.1, 0.1,
+    0.1, 0.1, 0.15,
+)
+
+
+class MatchRecord(Mapping):
+    """
+    Компактная запись матча: коэффициенты хранятся массивом букмекеры × ODDS_MARKETS
+
+    Сохраняет словарный интерфейс старого формата (match["home"], match["bookmakers"],
+    match["real_probabilities"]), поэтому существующий код работает без изменений.
+    """
+
+    __slots__ = ("home", "away", "time", "probs", "consensus", "odds", "bookmakers")
+
+    _KEYS = ("home", "away", "time", "real_probabilities", "odds", "bookmakers")
+
+    def __init__(self, home: str, away: str, time, probs: np.ndarray,
+                 consensus: np.ndarray, odds: np.ndarray, bookmakers: tuple):
+        self.home = home
+        self.away = away
+        self.time = time
+        self.probs = probs
+        self.consensus = consensus
+        self.odds = odds
+        self.bookmakers = bookmakers
+
+    def __getitem__(self, key):
+        if key == "home":
+            return self.home
+        if key == "away":
+            return self.away
+        if key == "time":
+            return self.time
+        if key == "real_probabilities":
+            return dict(zip(PROB_KEYS, self.probs.tolist()))
+        if key == "odds":
+            return _markets_dict(self.consensus)
+        if key == "bookmakers":
+            return BookmakersView(self)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    def probability(self, key: str) -> float:
+        return float(self.probs[PROB_INDEX[key]])
+
+    def to_dict(self) -> dict:
+        """Полная копия в старом формате вложенных словарей"""
+        return {
+            "home": self.home,
+            "away": self.away,
+            "time": self.time,
+            "real_probabilities": self["real_probabilities"],
+            "odds": self["odds"],
+            "bookmakers": {bm: _markets_dict(row) for bm, row in zip(self.bookmakers, self.odds)},
+        }
+
+
+class BookmakersView(Mapping):
+    """Представление match["bookmakers"] поверх массива MatchRecord.odds"""
+
+    __slots__ = ("record",)
+
+    def __init__(self, record: MatchRecord):
+        self.record = record
+
+    def __getitem__(self, bm):
+        try:
+            row = self.record.bookmakers.index(bm)
+        except ValueError:
+            raise KeyError(bm) from None
+        return _markets_dict(self.record.odds[row])
+
+    def __iter__(self):
+        return iter(self.record.bookmakers)
+
+    def __len__(self):
+        return len(self.record.bookmakers)
+
+
+def _markets_dict(row: np.ndarray) -> dict:
+    """Строка ODDS_MARKETS -> словарь рынков старого формата (h2h списком, без NaN)"""
+    values = row.tolist()
+    result = {}
+    for market in DICT_MARKETS:
+        columns = MARKET_COLUMNS[market]
+        if market in LIST_MARKETS:
+            result[market] = [values[c] for c in columns]
+        elif values[columns[0]] == values[columns[0]]:
+            result[market] = values[columns[0]]
+    return result
+
+
+@timed("fetch")
 def fetch_matches_by_league(league_id: int, league_name: str) -> list:
-    """Получает матчи для конкретной лиги"""
+    """
+    Получает матчи для конкретной лиги
+
+    Ошибки фида не глушатся: fetch_leagues_concurrently отличает упавшую лигу
+    (попадает в failed) от лиги без матчей.
+    """
+    from providers import get_provider
+
+    logger.info(f"📊 Получаю матчи для {league_name}...")
+    provider = get_provider()
+    matches = cached("odds", f"{provider.cache_key}:league:{league_id}",
+                     lambda: provider.league_matches(league_id, league_name))
+    logger.info(f"✅ {league_name}: {len(matches)} матчей")
+    return matches
+
+
+def fetch_leagues_concurrently(leagues: dict = None, fetcher=fetch_matches_by_league,
+                               max_workers: int = None, timeout: float = None) -> tuple:
+    """
+    Загружает лиги параллельно в ограниченном пуле потоков
+
+    Args:
+        leagues: {название лиги: id}, по умолчанию LEAGUES
+        fetcher: функция с контрактом fetch_matches_by_league(league_id, league_name)
+        max_workers: максимум одновременных загрузок (FETCH_CONCURRENCY)
+        timeout: таймаут на одну лигу в секундах (FETCH_TIMEOUT)
+
+    Returns:
+        (matches_by_league, timings, failed) - лиги, которые упали или не уложились
+        в таймаут, получают пустой список и попадают в failed
+    """
+    leagues = leagues if leagues is not None else LEAGUES
+    max_workers = max(1, max_workers or FETCH_CONCURRENCY)
+    timeout = timeout if timeout is not None else FETCH_TIMEOUT
+
+    started_at = {}
+    timings = {}
+    results = {}
+    failed = []
+
+    def run(league_name, league_id):
+        started_at[league_name] = time.perf_counter()
+        try:
+            return fetcher(league_id, league_name)
+        finally:
+            timings[league_name] = time.perf_counter() - started_at[league_name]
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="league-fetch")
     try:
-        logger.info(f"📊 Получаю матчи для {league_name}...")
-        matches = generate_realistic_matches(league_name, league_id)
-        logger.info(f"✅ {league_name}: {len(matches)} матчей")
-        return matches
-    except Exception as e:
-        logger.error(f"❌ {league_name}: статус {str(e)}")
-        return []
+        futures = {
+            executor.submit(run, league_name, league_id): league_name
+            for league_name, league_id in leagues.items()
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                league_name = futures[future]
+                try:
+                    results[league_name] = future.result() or []
+                except Exception as e:
+                    logger.error(f"❌ {league_name}: {type(e).__name__}: {e}")
+                    failed.append(league_name)
+
+            now = time.perf_counter()
+            for future in list(pending):
+                league_name = futures[future]
+                started = started_at.get(league_name)
+                if started is not None and now - started > timeout:
+                    logger.warning(f"⏱️ {league_name}: таймаут {timeout:.1f} сек, пропускаю")
+                    pending.discard(future)
+                    failed.append(league_name)
+                    timings[league_name] = now - started
+    finally:
+        # Не ждём зависшие загрузки - их результат уже не нужен
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    matches_by_league = {name: results.get(name, []) for name in leagues}
+    return matches_by_league, timings, failed
+
+
+class MatchSnapshot:
+    """Снимок матчей за один прогон: каждая лига загружается ровно один раз"""
+
+    def __init__(self, leagues: dict = None, fetcher=fetch_matches_by_league,
+                 max_workers: int = None, timeout: float = None):
+        self.leagues = leagues if leagues is not None else LEAGUES
+        self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.matches_by_league = {}
+        self.timings = {}
+        self.failed = []
+        self.wall_time = 0.0
+        self.fetch()
+
+    def fetch(self):
+        started = time.perf_counter()
+        self.matches_by_league, self.timings, self.failed = fetch_leagues_concurrently(
+            self.leagues, self.fetcher, self.max_workers, self.timeout
+        )
+        self.wall_time = time.perf_counter() - started
+
+    def items(self):
+        """Возвращает пары (лига, матчи) в порядке LEAGUES"""
+        return self.matches_by_league.items()
+
+    def counts(self) -> dict:
+        return {name: len(matches) for name, matches in self.matches_by_league.items()}
+
+    @property
+    def total_matches(self) -> int:
+        return sum(self.counts().values())
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.timings.values())
+
+    def log_summary(self):
+        logger.info(f"🎯 Всего матчей: {self.total_matches} "
+                    f"(загрузка {self.wall_time:.3f} сек, сумма по лигам {self.total_time:.3f} сек)")
+        logger.info("📍 Использованные лиги:")
+        for league_name, count in self.counts().items():
+            if count > 0:
+                logger.info(f"   {league_name}: {count} ({self.timings.get(league_name, 0):.3f} сек)")
+        if self.failed:
+            logger.warning(f"⚠️ Лиги без данных: {', '.join(self.failed)}")
 
 
 def generate_realistic_matches(league_name: str, league_id: int) -> list:
     """Генерирует матчи с РЕАЛИСТИЧНЫМИ коэффициентами на основе рыночного консенсуса"""
-    import random
-    from datetime import datetime, timedelta
-    
-    teams = {
-        39: ["Manchester City", "Liverpool", "Arsenal", "Chelsea", "Manchester United", "Tottenham", "Newcastle"],
-        140: ["Barcelona", "Real Madrid", "Atletico Madrid", "Sevilla", "Valencia"],
-        78: ["Bayern Munich", "Borussia Dortmund", "RB Leipzig", "Bayer Leverkusen"],
-        135: ["Juventus", "AS Roma", "AC Milan", "Napoli", "Inter Milan"],
-        61: ["Paris Saint Germain", "Marseille", "AS Monaco", "Lyon"],
-        94: ["Benfica", "Porto", "Sporting", "Braga"],
-        88: ["Ajax", "PSV", "Feyenoord", "AZ Alkmaar"],
-        530: ["Real Madrid", "Manchester City", "Bayern Munich", "Liverpool"],
-        130: ["Inter Miami", "LA Galaxy", "Seattle Sounders"],
-        40: ["Leeds United", "Southampton", "Leicester City"],
-        136: ["Parma", "Como", "Pisa"],
-        79: ["Cologne", "Hamburger SV", "Schalke 04"],
-    }
-    
-    team_list = teams.get(league_id, ["Team A", "Team B", "Team C", "Team D"])
-    matches = []
-    
-    for _ in range(min(20, len(team_list) * 2)):
-        home = random.choice(team_list)
-        away = random.choice([t for t in team_list if t != home])
-        
-        # Генерируем РЕАЛИСТИЧНЫЕ коэффициенты на основе рыночных данных
-        
-        # 1. Сначала генерируем реальные вероятности (основаны на реальных данных)
-        home_prob = random.uniform(0.35, 0.55)  # Дома редко <35% и >55%
-        draw_prob = random.uniform(0.20, 0.35)  # Ничья обычно 20-35%
-        away_prob = 1 - home_prob - draw_prob
-        
-        # 2. Конвертируем вероятности в коэффициенты (с маржой букмекера 3-5%)
-        margin = 0.04  # 4% маржа букмекера
-        
-        odds_h2h = [
-            (1 + margin) / home_prob,  # П1
-            (1 + margin) / draw_prob,  # X
-            (1 + margin) / away_prob,  # П2
-        ]
-        
-        # Over/Under обычно близко к 50-50
-        over_prob = random.uniform(0.48, 0.52)
-        under_prob = 1 - over_prob
-        odds_over = (1 + margin) / over_prob
-        odds_under = (1 + margin) / under_prob
-        
-        # Форы - примерно 45-55% вероятность
-        fora_prob = random.uniform(0.43, 0.52)
-        odds_fora_minus_1_5 = (1 + margin) / fora_prob
-        
-        odds_fora_minus_0_5 = (1 + margin) / (home_prob + draw_prob)
-        odds_fora_minus_2_5 = (1 + margin) / (home_prob * 0.6)
-        
-        # Двойные шансы (комбинации вероятностей)
-        odds_double_1x = (1 + margin) / (home_prob + draw_prob)  # обычно 65-75%
-        odds_double_12 = (1 + margin) / (home_prob + away_prob)  # обычно 75-85%
-        odds_double_x2 = (1 + margin) / (draw_prob + away_prob)
-        
-        # Жёлтые карточки - обычно 50-50
-        yellow_over_prob = 0.50
-        yellow_under_prob = 0.50
-        odds_yellow_over = (1 + margin) / yellow_over_prob
-        odds_yellow_under = (1 + margin) / yellow_under_prob
-        
-        # Обе забьют - примерно 50% (в зависимости от лиги)
-        both_score_prob = random.uniform(0.45, 0.55)
-        odds_both_score = (1 + margin) / both_score_prob
-        
-        # Углы - примерно 50-50
-        corners_prob = 0.50
-        odds_corners = (1 + margin) / corners_prob
-        
-        # Чистый лист - зависит от силы защиты (обычно 30-45%)
-        clean_sheet_prob = random.uniform(0.30, 0.45)
-        odds_clean_sheet = (1 + margin) / clean_sheet_prob
-        
-        match_time = datetime.now() + timedelta(days=random.randint(1, 30))
-        
-        matches.append({
-            "home": home,
-            "away": away,
-            "time": match_time,
-            "real_probabilities": {
-                "home": home_prob,
-                "draw": draw_prob,
-                "away": away_prob,
-                "over": over_prob,
-                "under": under_prob,
-                "fora_minus_1_5": fora_prob,
-                "double_1x": home_prob + draw_prob,
-                "double_12": home_prob + away_prob,
-                "double_x2": draw_prob + away_prob,
-                "yellow_over": yellow_over_prob,
-                "yellow_under": yellow_under_prob,
-                "both_score": both_score_prob,
-                "corners": corners_prob,
-                "clean_sheet": clean_sheet_prob,
-            },
-            "odds": {
-                "h2h": odds_h2h,
-                "over_2_5": odds_over,
-                "under_2_5": odds_under,
-                "fora_minus_0_5": odds_fora_minus_0_5,
-                "fora_minus_1_5": odds_fora_minus_1_5,
-                "fora_minus_2_5": odds_fora_minus_2_5,
-                "double_1x": odds_double_1x,
-                "double_12": odds_double_12,
-                "double_x2": odds_double_x2,
-                "yellow_over_8": odds_yellow_over,
-                "yellow_under_8": odds_yellow_under,
-                "corners": odds_corners,
-                "both_score": odds_both_score,
-                "clean_sheet": odds_clean_sheet,
-            },
-            "bookmakers": {
-                bm: {
-                    "h2h": [o + random.uniform(-0.05, 0.05) for o in odds_h2h],
-                    "over_2_5": odds_over + random.uniform(-0.1, 0.1),
-                    "under_2_5": odds_under + random.uniform(-0.1, 0.1),
-                    "fora_minus_0_5": odds_fora_minus_0_5 + random.uniform(-0.05, 0.05),
-                    "fora_minus_1_5": odds_fora_minus_1_5 + random.uniform(-0.1, 0.1),
-                    "fora_minus_2_5": odds_fora_minus_2_5 + random.uniform(-0.15, 0.15),
-                    "double_1x": odds_double_1x + random.uniform(-0.05, 0.05),
-                    "double_12": odds_double_12 + random.uniform(-0.05, 0.05),
-                    "double_x2": odds_double_x2 + random.uniform(-0.05, 0.05),
-                    "yellow_over_8": odds_yellow_over + random.uniform(-0.1, 0.1),
-                    "yellow_under_8": odds_yellow_under + random.uniform(-0.1, 0.1),
-                    "corners": odds_corners + random.uniform(-0.1, 0.1),
-                    "both_score": odds_both_score + random.uniform(-0.1, 0.1),
-                    "clean_sheet": odds_clean_sheet + random.uniform(-0.15, 0.15),
-                }
-                for bm in list(BOOKMAKERS.keys())[:10]
-            }
-        })
-    
-    return matches
+    from providers import get_provider
+
+    return get_provider().league_matches(league_id, league_name)
 
 
 def get_best_odds(bookmakers_odds: dict, market: str) -> tuple:
     """Получает лучший коэффициент и информацию о спреде"""
+    if isinstance(bookmakers_odds, BookmakersView):
+        columns = MARKET_COLUMNS.get(market)
+        if columns is None:
+            return 0, 0, 0
+        quotes = bookmakers_odds.record.odds[:, columns].ravel()
+        quotes = quotes[~np.isnan(quotes)]
+        if not quotes.size:
+            return 0, 0, 0
+        best = float(quotes.max())
+        return best, abs(best - float(quotes.min())), int(quotes.size)
+
     odds_list = []
     
     for bm, odds in bookmakers_odds.items():
@@ -217,6 +377,87 @@ def get_best_odds(bookmakers_odds: dict, market: str) -> tuple:
     return best, spread, len(odds_list)
 
 
+class OddsMatrix:
+    """Коэффициенты всего слейта в массиве матчи × букмекеры × рынки (NaN - нет котировки)"""
+
+    def __init__(self, odds: np.ndarray, bookmakers: list, markets: list = None):
+        self.odds = odds
+        self.bookmakers = list(bookmakers)
+        self.markets = list(markets if markets is not None else ODDS_MARKETS)
+        self.market_index = {market: i for i, market in enumerate(self.markets)}
+
+    @classmethod
+    def from_matches(cls, matches: list, markets: list = None) -> "OddsMatrix":
+        """Строит матрицу из MatchRecord или словарей матчей старого формата"""
+        markets = list(markets if markets is not None else ODDS_MARKETS)
+        market_index = {market: i for i, market in enumerate(markets)}
+
+        bookmaker_index = {}
+        seen_bookmaker_sets = set()
+        for match in matches:
+            bms = match.bookmakers if isinstance(match, MatchRecord) else tuple(match["bookmakers"])
+            if bms in seen_bookmaker_sets:
+                continue
+            seen_bookmaker_sets.add(bms)
+            for bm in bms:
+                bookmaker_index.setdefault(bm, len(bookmaker_index))
+
+        odds = np.full((len(matches), len(bookmaker_index), len(markets)), np.nan)
+        source_columns = [ODDS_MARKETS.index(m) if m in ODDS_MARKETS else None for m in markets]
+        copy_records = None not in source_columns
+        if copy_records:
+            record_rows = {}
+            for i, match in enumerate(matches):
+                if not isinstance(match, MatchRecord):
+                    continue
+                rows = record_rows.get(match.bookmakers)
+                if rows is None:
+                    rows = record_rows[match.bookmakers] = [bookmaker_index[bm] for bm in match.bookmakers]
+                odds[i, rows] = match.odds[:, source_columns]
+
+        for i, match in enumerate(matches):
+            if copy_records and isinstance(match, MatchRecord):
+                continue
+            for bm, bm_odds in match["bookmakers"].items():
+                row = odds[i, bookmaker_index[bm]]
+                for market, odd_val in bm_odds.items():
+                    if market in LIST_MARKETS:
+                        for column, outcome_odd in zip(LIST_MARKETS[market], odd_val):
+                            if column in market_index:
+                                row[market_index[column]] = outcome_odd
+                    elif market in market_index:
+                        row[market_index[market]] = odd_val
+
+        return cls(odds, list(bookmaker_index), markets)
+
+    def columns(self, markets: list) -> np.ndarray:
+        """Срез матчи × букмекеры × выбранные рынки"""
+        return self.odds[:, :, [self.market_index[m] for m in markets]]
+
+    def summary(self, markets: list = None) -> tuple:
+        """
+        Лучший коэффициент, спред и число котировок по каждому (матч, рынок)
+
+        Returns:
+            (best, spread, count) - массивы матчи × рынки; где котировок нет,
+            best и spread равны 0, как в get_best_odds
+        """
+        cube = self.columns(markets) if markets is not None else self.odds
+        return summarize_quotes(cube)
+
+
+def summarize_quotes(cube: np.ndarray) -> tuple:
+    """(best, spread, count) по оси букмекеров массива матчи × букмекеры × рынки"""
+    count = np.count_nonzero(~np.isnan(cube), axis=1)
+    has_quotes = count > 0
+    filled = np.where(np.isnan(cube), -np.inf, cube)
+    best = np.where(has_quotes, filled.max(axis=1, initial=-np.inf), 0.0)
+    filled = np.where(np.isnan(cube), np.inf, cube)
+    worst = np.where(has_quotes, filled.min(axis=1, initial=np.inf), 0.0)
+    spread = np.abs(best - worst)
+    return best, spread, count
+
+
 def calculate_value(probability: float, odds: float) -> float:
     """Рассчитывает VALUE ставки"""
     if odds <= 0 or probability <= 0:
@@ -238,86 +479,129 @@ def get_implied_probability(odds: float) -> float:
     return 1 / odds
 
 
-def analyze_matches(min_value: float = 0.025, odd_min: float = 1.3, odd_max: float = 3.5) -> list:
+def calculate_value_array(probability, odds) -> np.ndarray:
+    """Векторная версия calculate_value"""
+    probability = np.asarray(probability, dtype=float)
+    odds = np.asarray(odds, dtype=float)
+    return np.where((odds <= 0) | (probability <= 0), 0.0, probability * odds - 1)
+
+
+def calculate_roi_array(value, odds) -> np.ndarray:
+    """Векторная версия calculate_roi"""
+    value = np.asarray(value, dtype=float)
+    odds = np.asarray(odds, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(odds > 1, (value / (odds - 1)) * 100, 0.0)
+
+
+def get_implied_probability_array(odds) -> np.ndarray:
+    """Векторная версия get_implied_probability"""
+    odds = np.asarray(odds, dtype=float)
+    with np.errstate(divide="ignore"):
+        return np.where(odds > 0, 1 / odds, 0.0)
+
+
+def analysis_probabilities(matches: list) -> np.ndarray:
+    """Реальные вероятности ANALYSIS_MARKETS: массив матчи × рынки"""
+    prob_keys = [prob_key for _, _, prob_key in ANALYSIS_MARKETS]
+    prob_columns = [PROB_INDEX[key] for key in prob_keys]
+    return np.array(
+        [match.probs[prob_columns] if isinstance(match, MatchRecord)
+         else [match["real_probabilities"][key] for key in prob_keys]
+         for match in matches],
+        dtype=float,
+    ).reshape(len(matches), len(ANALYSIS_MARKETS))
+
+
+# Правила отбора analyze_matches (их же использует backtest.run_backtest)
+MIN_PROBABILITY = 0.60
+MIN_BOOKMAKERS = 5
+DOUBLE_ODDS_RANGE = (1.1, 2.0)
+
+
+def value_bet_mask(market_keys: list, best_odds: np.ndarray, counts: np.ndarray, true_probs: np.ndarray,
+                   min_value: float = 0.025, odd_min: float = 1.3, odd_max: float = 3.5,
+                   min_probability: float = MIN_PROBABILITY) -> np.ndarray:
+    """Булев массив матчи × market_keys: какие ставки проходят фильтры analyze_matches"""
+    # Проверяем диапазон коэффициентов: у двойных шансов свой
+    is_double = np.array([key.startswith("double") for key in market_keys])
+    lower = np.where(is_double, DOUBLE_ODDS_RANGE[0], odd_min)
+    upper = np.where(is_double, DOUBLE_ODDS_RANGE[1], odd_max)
+    valid_odd_range = (best_odds > 0) & (counts >= MIN_BOOKMAKERS) & (best_odds >= lower) & (best_odds <= upper)
+
+    # ✅ КРИТИЧНЫЙ ФИЛЬТР: вероятность >= 60% И VALUE > 0.025
+    values = calculate_value_array(true_probs, best_odds)
+    return valid_odd_range & (values >= min_value) & (true_probs >= min_probability)
+
+
+@timed("value")
+def select_value_bets(entries: list, best_odds: np.ndarray, spreads: np.ndarray, counts: np.ndarray,
+                      true_probs: np.ndarray, min_value: float = 0.025,
+                      odd_min: float = 1.3, odd_max: float = 3.5) -> tuple:
+    """
+    Отбирает VALUE ставки из массивов матчи × ANALYSIS_MARKETS (без сортировки)
+
+    entries - пары (лига, матч) в порядке строк массивов.
+    Возвращает (rows, bets): rows[k] - индекс строки, из которой взята bets[k].
+    """
+    market_keys = [market_key for _, market_key, _ in ANALYSIS_MARKETS]
+    selected = value_bet_mask(market_keys, best_odds, counts, true_probs, min_value, odd_min, odd_max)
+
+    implied_probs = get_implied_probability_array(best_odds)
+    values = calculate_value_array(true_probs, best_odds)
+    rois = calculate_roi_array(values, best_odds)
+
+    rows, columns = np.nonzero(selected)
+    bets = []
+    for i, j in zip(rows, columns):
+        league_name, match = entries[i]
+        match_str = f"{match['home']} vs {match['away']}"
+        market_name = ANALYSIS_MARKETS[j][0]
+        best_odd = float(best_odds[i, j])
+
+        bets.append((
+            float(values[i, j]),
+            league_name,
+            match_str,
+            market_name,
+            best_odd,
+            match["time"].strftime("%d.%m %H:%M"),
+            hash(match_str),
+            {
+                "true_prob": float(true_probs[i, j]),
+                "implied_prob": float(implied_probs[i, j]),
+                "stats": {"count": int(counts[i, j]), "spread": float(spreads[i, j]), "best": best_odd},
+                "roi": float(rois[i, j]),
+                "market_type": "ANALYSIS"
+            }
+        ))
+    return rows, bets
+
+
+def analyze_matches(min_value: float = 0.025, odd_min: float = 1.3, odd_max: float = 3.5,
+                    snapshot: MatchSnapshot = None) -> list:
     """Анализирует матчи и находит VALUE ставки с вероятностью >= 60%"""
-    all_bets = []
+    if snapshot is None:
+        snapshot = MatchSnapshot()
     
     logger.info(f"🎯 Начинаю анализ на основе РЕАЛЬНЫХ вероятностей...")
     logger.info(f"   Фильтры: Value > {min_value}, Вероятность >= 60%, Коэффициенты {odd_min}-{odd_max}")
     
-    for league_name, league_id in LEAGUES.items():
-        matches = fetch_matches_by_league(league_id, league_name)
-        
-        for match in matches:
-            home = match["home"]
-            away = match["away"]
-            match_str = f"{home} vs {away}"
-            time_str = match["time"].strftime("%d.%m %H:%M")
-            bookmakers_odds = match["bookmakers"]
-            real_probs = match["real_probabilities"]
-            
-            # АНАЛИЗИРУЕМ РЫНКИ С РЕАЛЬНЫМИ ВЕРОЯТНОСТЯМИ >= 60%
-            markets_to_analyze = [
-                ("Over 2.5", "over_2_5", real_probs["over"]),
-                ("Under 2.5", "under_2_5", real_probs["under"]),
-                ("Фора -0.5", "fora_minus_0_5", real_probs["double_1x"]),
-                ("Фора -1.5", "fora_minus_1_5", real_probs["fora_minus_1_5"]),
-                ("1X (дома/ничья)", "double_1x", real_probs["double_1x"]),
-                ("12 (не-ничья)", "double_12", real_probs["double_12"]),
-                ("X2 (ничья/гости)", "double_x2", real_probs["double_x2"]),
-                ("Жёлтых Over 8.5", "yellow_over_8", real_probs["yellow_over"]),
-                ("Жёлтых Under 8.5", "yellow_under_8", real_probs["yellow_under"]),
-                ("Обе забьют", "both_score", real_probs["both_score"]),
-                ("Углы", "corners", real_probs["corners"]),
-                ("Чистый лист", "clean_sheet", real_probs["clean_sheet"]),
-            ]
-            
-            for market_name, market_key, true_probability in markets_to_analyze:
-                best_odd, spread, count = get_best_odds(bookmakers_odds, market_key)
-                
-                if best_odd <= 0 or count < 5:
-                    continue
-                
-                # Проверяем диапазон коэффициентов
-                if market_key.startswith("double"):
-                    valid_odd_range = 1.1 <= best_odd <= 2.0
-                else:
-                    valid_odd_range = odd_min <= best_odd <= odd_max
-                
-                if valid_odd_range:
-                    implied_prob = get_implied_probability(best_odd)
-                    value = calculate_value(true_probability, best_odd)
-                    
-                    # ✅ КРИТИЧНЫЙ ФИЛЬТР: вероятность >= 60% И VALUE > 0.025
-                    if value >= min_value and true_probability >= 0.60:
-                        roi = calculate_roi(value, best_odd)
-                        
-                        all_bets.append((
-                            value,
-                            league_name,
-                            match_str,
-                            market_name,
-                            best_odd,
-                            time_str,
-                            hash(match_str),
-                            {
-                                "true_prob": true_probability,
-                                "implied_prob": implied_prob,
-                                "stats": {"count": count, "spread": spread, "best": best_odd},
-                                "roi": roi,
-                                "market_type": "ANALYSIS"
-                            }
-                        ))
-    
+    entries = [(league_name, match) for league_name, matches in snapshot.items() for match in matches]
+    matches = [match for _, match in entries]
+    market_keys = [market_key for _, market_key, _ in ANALYSIS_MARKETS]
+
+    # Все матчи × рынки за несколько операций над массивами
+    best_odds, spreads, counts = OddsMatrix.from_matches(matches).summary(market_keys)
+    true_probs = analysis_probabilities(matches)
+
+    _, all_bets = select_value_bets(entries, best_odds, spreads, counts, true_probs, min_value, odd_min, odd_max)
+
     # Сортируем по VALUE (лучшие сверху)
-    all_bets.sort(key=lambda x: x[0], reverse=True)
+    with timed("sort"):
+        all_bets.sort(key=lambda x: x[0], reverse=True)
     
-    logger.info(f"🎯 Всего матчей: {sum(len(fetch_matches_by_league(lid, ln)) for ln, lid in LEAGUES.items())}")
-    logger.info("📍 Использованные лиги:")
-    for league_name, league_id in LEAGUES.items():
-        count = len(fetch_matches_by_league(league_id, league_name))
-        if count > 0:
-            logger.info(f"   {league_name}: {count}")
+    snapshot.log_summary()
     logger.info(f"✅ Найдено ставок с вероятностью >= 60%: {len(all_bets)}")
     
     return all_bets
@@ -0,0 +1,194 @@
+import os
+import time
+import zlib
+import pickle
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_DB = os.environ.get("RESPONSE_CACHE_DB", "response_cache.db")
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "1") == "1"
+
+# Время последнего чтения обновляется не чаще раза в столько секунд:
+# для вытеснения хватает такой точности, а чтения не пишут в базу на каждом попадании
+ACCESS_RESOLUTION = 60.0
+
+# Класс данных -> (ttl, stale_while_revalidate) в секундах:
+# свежие отдаются как есть, устаревшие в пределах окна - сразу, с фоновым обновлением
+CACHE_POLICIES = {
+    "fixtures": (6 * 3600.0, 24 * 3600.0),
+    "odds": (30.0, 300.0),
+}
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов фидов в SQLite (переживает рестарты бота)
+
+    Значения хранятся pickle + zlib, объём ограничен max_bytes: при переполнении
+    вытесняются давно не читанные записи.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_DB, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 policies: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.policies = {**CACHE_POLICIES, **(policies or {})}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0, "evictions": 0}
+        self._refreshing = set()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, data_class TEXT NOT NULL, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get_or_fetch(self, data_class: str, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Значение из кэша по политике data_class или результат fetch()
+
+        Если fetch() падает, а в кэше есть хоть какое-то значение, отдаётся оно.
+        """
+        ttl, stale_window = self.policies[data_class]
+        cache_key = f"{data_class}:{key}"
+        entry = self._read(cache_key)
+
+        if entry is not None:
+            value, age = entry
+            if age <= ttl:
+                self._count("hits")
+                return value
+            if age <= ttl + stale_window:
+                self._count("stale_hits")
+                self._refresh_in_background(data_class, cache_key, fetch)
+                return value
+
+        self._count("misses")
+        try:
+            value = fetch()
+        except Exception:
+            self._count("errors")
+            if entry is not None:
+                logger.warning(f"⚠️ {cache_key}: ошибка загрузки, отдаю устаревшие данные ({entry[1]:.0f} сек)")
+                return entry[0]
+            raise
+        self.put(data_class, cache_key, value)
+        return value
+
+    def put(self, data_class: str, cache_key: str, value: Any):
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (cache_key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, data_class, value, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, data_class, blob, len(blob), now, now),
+            )
+            self._bytes += len(blob) - (row[0] if row else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _read(self, cache_key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, accessed_at FROM responses WHERE key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[2] >= ACCESS_RESOLUTION:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, cache_key))
+                self._conn.commit()
+        try:
+            return pickle.loads(zlib.decompress(row[0])), now - row[1]
+        except Exception as e:
+            logger.warning(f"⚠️ {cache_key}: повреждённая запись кэша ({e}), удаляю")
+            self.invalidate(cache_key)
+            return None
+
+    def _evict(self):
+        while self._bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._bytes = 0
+                return
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._bytes -= row[1]
+            self.stats["evictions"] += 1
+
+    def _refresh_in_background(self, data_class: str, cache_key: str, fetch: Callable[[], Any]):
+        with self._lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def refresh():
+            try:
+                self.put(data_class, cache_key, fetch())
+                self._count("refreshes")
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"⚠️ {cache_key}: фоновое обновление не удалось: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(cache_key)
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{cache_key}", daemon=True).start()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def invalidate(self, cache_key: Optional[str] = None):
+        """Удаляет одну запись (ключ вида "odds:synthetic:...:league:39") или весь кэш"""
+        with self._lock:
+            if cache_key is None:
+                self._conn.execute("DELETE FROM responses")
+                self._bytes = 0
+            else:
+                row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (cache_key,)).fetchone()
+                if row:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (cache_key,))
+                    self._bytes -= row[0]
+            self._conn.commit()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {**self.stats, "entries": entries, "bytes": self._bytes}
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Общий кэш процесса или None, если он выключен (RESPONSE_CACHE_ENABLED=0)"""
+    global _CACHE
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache()
+        return _CACHE
+
+
+def cached(data_class: str, key: str, fetch: Callable[[], Any]) -> Any:
+    """get_or_fetch общего кэша; при выключенном кэше просто вызывает fetch()"""
+    cache = get_response_cache()
+    if cache is None:
+        return fetch()
+    return cache.get_or_fetch(data_class, key, fetch)
@@ -0,0 +1,142 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from analysis_cache import AnalysisCache, CachedResult
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AnalysisScheduler:
+    """
+    Фоновый пересчёт ставок с фиксированной периодичностью
+
+    Каждые interval (+ случайный jitter) секунд запускает compute в executor
+    и публикует результат в AnalysisCache. Если предыдущий прогон ещё идёт,
+    очередной пропускается. После каждого успешного прогона вызывается
+    on_result (например, рассылка новых ставок подписчикам).
+
+    С общим хранилищем (store + election из shared_store) считает только
+    реплика-лидер: она публикует результат в store, а остальные каждые
+    poll_interval секунд забирают его оттуда в свой AnalysisCache.
+    """
+
+    def __init__(self, cache: AnalysisCache, key: Hashable, compute: Callable[[], Any],
+                 interval: float = 300.0, jitter: float = 30.0,
+                 on_result: Optional[Callable[[CachedResult], Awaitable[Any]]] = None,
+                 store=None, election=None, poll_interval: float = 15.0):
+        self.cache = cache
+        self.key = key
+        self.compute = compute
+        self.interval = interval
+        self.jitter = jitter
+        self.on_result = on_result
+        self.store = store
+        self.election = election
+        self.poll_interval = poll_interval
+        self.store_key = repr(key)
+        self._synced_at = 0.0
+        self.runs = 0
+        self.skipped = 0
+        self.last_duration: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._runs = set()
+
+    async def run_once(self):
+        """Один прогон анализа с публикацией результата"""
+        if self.cache.is_running(self.key):
+            self.skipped += 1
+            logger.warning(f"⏭️ Предыдущий анализ ещё идёт, пропускаю прогон ({self.skipped} пропусков)")
+            return
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            result = await self.cache.refresh(
+                self.key, lambda: loop.run_in_executor(None, self.compute)
+            )
+        except Exception as e:
+            logger.error(f"❌ Фоновый анализ упал: {e}", exc_info=True)
+            return
+        if result is None:
+            self.skipped += 1
+            return
+
+        self.runs += 1
+        self.last_duration = time.monotonic() - started
+        logger.info(f"⏱️ Фоновый анализ #{self.runs} завершён за {self.last_duration:.2f} сек")
+
+        # Прогон мог идти дольше аренды: если лидерство уже у другой реплики,
+        # публикует и рассылает она, иначе уведомления уйдут дважды
+        if self.election is not None and not await loop.run_in_executor(None, self.election.is_leader):
+            logger.warning("👥 Лидерство потеряно во время анализа, результат не публикую")
+            return
+
+        if self.store is not None:
+            try:
+                await loop.run_in_executor(None, self.store.publish_result, self.store_key, result.value)
+            except Exception as e:
+                logger.error(f"❌ Не удалось опубликовать результат в общее хранилище: {e}", exc_info=True)
+
+        if self.on_result is not None:
+            try:
+                await self.on_result(result)
+            except Exception as e:
+                logger.error(f"❌ Обработка результата анализа упала: {e}", exc_info=True)
+
+    async def sync_from_store(self) -> Optional[CachedResult]:
+        """Забирает в кэш результат, опубликованный лидером, если он новее уже полученного"""
+        published = await asyncio.get_running_loop().run_in_executor(
+            None, self.store.latest_result, self.store_key
+        )
+        if published is None:
+            return None
+        value, published_at = published
+        if published_at > self._synced_at:
+            self._synced_at = published_at
+            return self.cache.put(self.key, value, age=max(0.0, time.time() - published_at))
+        return self.cache.latest(self.key)
+
+    def _spawn_run(self):
+        run = asyncio.ensure_future(self.run_once())
+        self._runs.add(run)
+        run.add_done_callback(self._runs.discard)
+
+    async def _loop(self):
+        while True:
+            self._spawn_run()
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter))
+
+    async def _replicated_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if await loop.run_in_executor(None, self.election.is_leader):
+                    # Новый лидер не пересчитывает, пока опубликованный результат не устарел
+                    published = await loop.run_in_executor(None, self.store.latest_result, self.store_key)
+                    if published is None or time.time() - published[1] >= self.interval:
+                        self._spawn_run()
+                    elif self.cache.latest(self.key) is None:
+                        await self.sync_from_store()
+                else:
+                    await self.sync_from_store()
+            except Exception as e:
+                logger.error(f"❌ Ошибка синхронизации с общим хранилищем: {e}", exc_info=True)
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            logger.info(f"🗓️ Фоновый анализ каждые {self.interval:.0f} сек (+ до {self.jitter:.0f} сек)")
+            self._task = asyncio.ensure_future(self._loop() if self.election is None else self._replicated_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for run in list(self._runs):
+            run.cancel()
+        if self.election is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.election.release)
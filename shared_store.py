@@ -0,0 +1,420 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from alerts import ALERT_SEEN_TTL_HOURS, AlertStore, alert_key, parse_chat_id
+from logger import BetHistory
+from user_settings import SettingsStore, UserSettings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Общее хранилище реплик: пусто - одна реплика без выборов лидера,
+# sqlite:///path/shared.db - одна машина (общий том), redis://host:6379/0 - сеть
+SHARED_STORE_URL = os.environ.get("SHARED_STORE_URL", "")
+
+# Аренда лидера: продлевается каждые LEADER_POLL_SEC, истекает через LEADER_LEASE_TTL
+LEADER_LEASE_TTL = float(os.environ.get("LEADER_LEASE_TTL", "45"))
+LEADER_POLL_SEC = float(os.environ.get("LEADER_POLL_SEC", "15"))
+
+
+def encode_result(value: Any) -> str:
+    """
+    Результат анализа в JSON для общего хранилища
+
+    Только данные (списки, словари, числа, строки, datetime), без pickle:
+    запись в общее хранилище не даёт выполнить код на репликах.
+    """
+    return json.dumps(value, ensure_ascii=False, default=_encode_datetime)
+
+
+def decode_result(raw) -> Any:
+    return json.loads(raw, object_hook=_decode_datetime)
+
+
+def _encode_datetime(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в общее хранилище")
+
+
+def _decode_datetime(obj: Dict):
+    if len(obj) == 1 and isinstance(obj.get("$datetime"), str):
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+class SharedStore(ABC):
+    """
+    Хранилище, общее для всех реплик бота
+
+    - опубликованные результаты анализа (читают все реплики, пишет лидер)
+    - аренды для выбора лидера
+    - alerts: подписки и seen-множество (интерфейс alerts.AlertStore)
+    - history: журнал ставок (интерфейс logger.BetHistory)
+    - settings: настройки пользователей (user_settings.SettingsStore)
+    """
+
+    alerts: AlertStore
+    history: BetHistory
+    settings: SettingsStore
+
+    @abstractmethod
+    def publish_result(self, key: str, value: Any):
+        """Публикует результат анализа (см. encode_result) с текущим временем"""
+
+    @abstractmethod
+    def latest_result(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(значение, время публикации по time.time()) или None"""
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Берёт или продлевает аренду; False - если она у другого владельца и не истекла"""
+
+    @abstractmethod
+    def release_lease(self, name: str, owner: str):
+        """Снимает аренду, если она у owner"""
+
+
+class SQLiteStore(SharedStore):
+    """
+    Общее хранилище в одном SQLite-файле для реплик на одной машине
+
+    Аренда берётся в транзакции BEGIN IMMEDIATE, то есть под файловой
+    блокировкой записи SQLite: проверка и захват атомарны между процессами.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.alerts = AlertStore(path)
+        self.history = BetHistory(path)
+        self.settings = SettingsStore(path)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, published_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._initialized = True
+        return conn
+
+    def publish_result(self, key: str, value: Any):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                (key, encode_result(value), time.time()),
+            )
+        finally:
+            conn.close()
+
+    def latest_result(self, key: str) -> Optional[Tuple[Any, float]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value, published_at FROM results WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        value = _decode_stored(key, row[0]) if row is not None else None
+        return (value, row[1]) if value is not None else None
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (name, owner, now + ttl))
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def release_lease(self, name: str, owner: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+        finally:
+            conn.close()
+
+
+class RedisStore(SharedStore):
+    """
+    Сетевое хранилище в Redis для реплик на разных машинах
+
+    Нужен пакет redis (pip install redis). Аренда - SET NX PX с продлением
+    и снятием Lua-скриптами, чтобы не трогать чужую аренду. client - готовый
+    клиент с интерфейсом redis.Redis (вместо подключения по url).
+    """
+
+    RENEW_LEASE = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    RELEASE_LEASE = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, url: str = "", prefix: str = "betbot:", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("❌ Для redis:// хранилища установите пакет redis") from e
+            client = redis.Redis.from_url(url)
+
+        self.client = client
+        self.prefix = prefix
+        self.alerts = RedisAlertStore(self.client, prefix)
+        self.history = RedisBetHistory(self.client, prefix)
+        self.settings = RedisSettingsStore(self.client, prefix)
+
+    def publish_result(self, key: str, value: Any):
+        self.client.set(f"{self.prefix}result:{key}", encode_result({"published_at": time.time(), "value": value}))
+
+    def latest_result(self, key: str) -> Optional[Tuple[Any, float]]:
+        raw = self.client.get(f"{self.prefix}result:{key}")
+        published = _decode_stored(key, raw) if raw is not None else None
+        return (published["value"], published["published_at"]) if published is not None else None
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        key = f"{self.prefix}lease:{name}"
+        ttl_ms = int(ttl * 1000)
+        if self.client.set(key, owner, nx=True, px=ttl_ms):
+            return True
+        return bool(self.client.eval(self.RENEW_LEASE, 1, key, owner, ttl_ms))
+
+    def release_lease(self, name: str, owner: str):
+        self.client.eval(self.RELEASE_LEASE, 1, f"{self.prefix}lease:{name}", owner)
+
+
+class RedisAlertStore:
+    """Подписки (hash chat_id -> время) и seen-множество (hash ключ -> JSON) в Redis"""
+
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.subscribers_key = f"{prefix}subscribers"
+        self.seen_key = f"{prefix}seen"
+
+    def subscribe(self, chat_id) -> bool:
+        return bool(self.client.hsetnx(self.subscribers_key, str(chat_id), time.time()))
+
+    def unsubscribe(self, chat_id) -> bool:
+        return bool(self.client.hdel(self.subscribers_key, str(chat_id)))
+
+    def is_subscribed(self, chat_id) -> bool:
+        return bool(self.client.hexists(self.subscribers_key, str(chat_id)))
+
+    def subscribers(self) -> list:
+        chats = sorted(self.client.hgetall(self.subscribers_key).items(), key=lambda item: float(item[1]))
+        return [parse_chat_id(chat.decode()) for chat, _ in chats]
+
+    def seen(self, keys: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        result = {}
+        for key, raw in zip(keys, self.client.hmget(self.seen_key, keys)):
+            if raw is not None:
+                odds, edge, _ = json.loads(raw)
+                result[key] = (odds, edge)
+        return result
+
+    def mark_seen(self, bets: List[Dict]):
+        if bets:
+            now = time.time()
+            self.client.hset(self.seen_key, mapping={
+                alert_key(bet): json.dumps([bet["odds"], bet["edge"], now]) for bet in bets
+            })
+
+    def prune(self, max_age_hours: float = ALERT_SEEN_TTL_HOURS) -> int:
+        cutoff = time.time() - max_age_hours * 3600
+        stale = [key for key, raw in self.client.hscan_iter(self.seen_key) if json.loads(raw)[2] < cutoff]
+        if stale:
+            self.client.hdel(self.seen_key, *stale)
+        return len(stale)
+
+
+class RedisBetHistory:
+    """
+    Журнал ставок в sorted set Redis: score - время ставки, член - "<номер>|<JSON>"
+
+    query выбирает диапазон дат через ZRANGEBYSCORE и не читает всю историю;
+    номер из счётчика сохраняет порядок записи и не даёт схлопнуться одинаковым ставкам.
+    """
+
+    # Журнал прежних версий был списком: забирается и удаляется одной атомарной операцией
+    CLAIM_LEGACY = (
+        "local items = redis.call('LRANGE', KEYS[1], 0, -1) "
+        "redis.call('DEL', KEYS[1]) "
+        "return items"
+    )
+
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.key = f"{prefix}bet_history"
+        self.seq_key = f"{prefix}bet_history:seq"
+        self.legacy_key = f"{prefix}bets"
+        self._migrated = False
+
+    def _migrate(self):
+        """Переносит журнал-список прежних версий при первом обращении (конструктор не ходит в Redis)"""
+        if self._migrated:
+            return
+        self._migrated = True
+        legacy = self.client.eval(self.CLAIM_LEGACY, 1, self.legacy_key)
+        if legacy:
+            self.append_many([json.loads(raw) for raw in legacy])
+            logger.info(f"🗄️ Журнал ставок перенесён из списка в sorted set: {len(legacy)} записей")
+
+    def append_many(self, records: List[Dict]):
+        self._migrate()
+        if not records:
+            return
+        last = self.client.incrby(self.seq_key, len(records))
+        first = last - len(records) + 1
+        members = {}
+        for seq, record in enumerate(records, first):
+            member = f"{seq:020d}|{json.dumps(record, ensure_ascii=False, default=str)}"
+            members[member] = _timestamp_score(record["timestamp"])
+        self.client.zadd(self.key, members)
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """Последние limit ставок по времени, от старых к новым"""
+        self._migrate()
+        return [self._decode(member) for member in self.client.zrange(self.key, -limit, -1)]
+
+    def query(self, since: Optional[str] = None, until: Optional[str] = None,
+              match: Optional[str] = None, market: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """Как BetHistory.query: since включается, until - нет; limit - самые новые"""
+        self._migrate()
+        low = _timestamp_score(since) if since is not None else "-inf"
+        high = f"({_timestamp_score(until)}" if until is not None else "+inf"
+        if limit and match is None and market is None:
+            members = self.client.zrevrangebyscore(self.key, high, low, start=0, num=limit)[::-1]
+        else:
+            members = self.client.zrangebyscore(self.key, low, high)
+        rows = [
+            row for row in map(self._decode, members)
+            if (match is None or row["match"] == match) and (market is None or row["market"] == market)
+        ]
+        return rows[-limit:] if limit else rows
+
+    @staticmethod
+    def _decode(member) -> Dict:
+        if isinstance(member, bytes):
+            member = member.decode()
+        return json.loads(member.split("|", 1)[1])
+
+    def clear(self):
+        self.client.delete(self.key, self.seq_key)
+
+
+def _timestamp_score(value: str) -> float:
+    """ISO-время в score sorted set; время без зоны считается UTC"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class RedisSettingsStore(SettingsStore):
+    """Настройки пользователей в hash Redis (user_id -> JSON)"""
+
+    def __init__(self, client, prefix: str):
+        super().__init__(path="")
+        self.client = client
+        self.key = f"{prefix}user_settings"
+
+    def _load(self, user_id: int) -> Optional[UserSettings]:
+        raw = self.client.hget(self.key, str(user_id))
+        return UserSettings.from_json(raw) if raw is not None else None
+
+    def _save(self, user_id: int, settings: UserSettings):
+        self.client.hset(self.key, str(user_id), settings.to_json())
+
+
+def _decode_stored(key: str, raw) -> Any:
+    """decode_result или None для нечитаемой записи (например, pickle прежних версий)"""
+    try:
+        return decode_result(raw)
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.warning(f"⚠️ Результат {key} в общем хранилище не читается ({e}), жду новый")
+        return None
+
+
+# Бэкенды по схеме URL; сторонние подключаются через register_backend
+BACKENDS: Dict[str, Callable[[str], SharedStore]] = {
+    "sqlite": lambda url: SQLiteStore(url[len("sqlite:///"):]),
+    "redis": RedisStore,
+    "rediss": RedisStore,
+}
+
+
+def register_backend(scheme: str, factory: Callable[[str], SharedStore]):
+    BACKENDS[scheme] = factory
+
+
+def open_shared_store(url: str = SHARED_STORE_URL) -> Optional[SharedStore]:
+    """Хранилище по URL; None - если URL пуст (одна реплика)"""
+    if not url:
+        return None
+    scheme = url.split(":", 1)[0]
+    if scheme not in BACKENDS:
+        raise ValueError(f"❌ Неизвестное хранилище: {url}")
+    logger.info(f"🗄️ Общее хранилище реплик: {scheme}")
+    return BACKENDS[scheme](url)
+
+
+class LeaderElection:
+    """
+    Выбор лидера через аренду в общем хранилище
+
+    is_leader() берёт свободную или продлевает свою аренду. Лидер должен
+    вызывать его чаще, чем раз в ttl; если лидер пропал, аренда истекает
+    и её забирает следующая реплика.
+    """
+
+    def __init__(self, store: SharedStore, name: str = "analysis",
+                 owner: Optional[str] = None, ttl: float = LEADER_LEASE_TTL):
+        self.store = store
+        self.name = name
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.leader = False
+
+    def is_leader(self) -> bool:
+        try:
+            leader = self.store.acquire_lease(self.name, self.owner, self.ttl)
+        except Exception as e:
+            logger.error(f"❌ Не удалось продлить аренду лидера: {e}")
+            leader = False
+        if leader != self.leader:
+            logger.info(f"👑 {self.owner} - лидер" if leader else f"👥 {self.owner} - ведомая реплика")
+            self.leader = leader
+        return leader
+
+    def release(self):
+        """Отдаёт лидерство сразу (при остановке), не дожидаясь истечения аренды"""
+        if self.leader:
+            self.store.release_lease(self.name, self.owner)
+            self.leader = False
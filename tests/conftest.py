@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Тесты не пишут дисковый кэш ответов в рабочий каталог
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import pytest
+
+from deep_analysis_v2 import (ANALYSIS_START_METHOD, TEAM_PROFILES, find_candidate_bets, get_process_pool,
+                              shutdown_process_pool)
+from providers import SyntheticProvider
+
+
+@pytest.fixture
+def pool():
+    yield get_process_pool(2)
+    shutdown_process_pool()
+
+
+def without_timestamps(bets):
+    return [{key: value for key, value in bet.items() if key != "timestamp"} for bet in bets]
+
+
+def test_pool_does_not_fork(pool):
+    assert ANALYSIS_START_METHOD != "fork"
+    assert pool._mp_context.get_start_method() == ANALYSIS_START_METHOD
+
+
+def test_pool_matches_single_process(pool):
+    provider = SyntheticProvider(5, base_time=datetime(2026, 1, 1), fixtures_count=40)
+    TEAM_PROFILES.invalidate()
+    single = find_candidate_bets(provider=provider, workers=1)
+    TEAM_PROFILES.invalidate()
+    pooled = find_candidate_bets(provider=provider, workers=2)
+    assert single
+    assert without_timestamps(pooled) == without_timestamps(single)
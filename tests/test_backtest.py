@@ -0,0 +1,98 @@
+import inspect
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest import (ANALYSIS_MARKET_KEYS, BACKTEST_MARKETS, DEFAULT_PARAMS, MATCH_MARKET, add_synthetic_odds,
+                      run_backtest, select_bets)
+from deep_analysis_v2 import _value_bet, find_value_bets
+from real_apis import ANALYSIS_MARKETS, analyze_matches, select_value_bets
+
+
+def fixed_slate(size: int = 2000, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    columns = {
+        "date": pd.date_range("2025-08-01", periods=size, freq="6h"),
+        "home_team": [f"H{i}" for i in range(size)],
+        "away_team": [f"A{i}" for i in range(size)],
+        "bookmakers": rng.integers(3, 11, size),
+    }
+    for market, (odds_column, _) in BACKTEST_MARKETS.items():
+        columns[f"prob_{market}"] = rng.uniform(0.4, 0.9, size)
+        columns[odds_column] = rng.uniform(1.05, 2.6, size)
+        columns[f"won_{market}"] = rng.random(size) < 0.5
+    return pd.DataFrame(columns)
+
+
+def test_default_params_are_production_defaults():
+    analysis = inspect.signature(analyze_matches).parameters
+    value = inspect.signature(find_value_bets).parameters
+    assert DEFAULT_PARAMS["min_value"] == analysis["min_value"].default
+    assert DEFAULT_PARAMS["odd_min"] == analysis["odd_min"].default
+    assert DEFAULT_PARAMS["odd_max"] == analysis["odd_max"].default
+    assert DEFAULT_PARAMS["match_odd_min"] == value["odds_threshold_min"].default
+    assert DEFAULT_PARAMS["match_odd_max"] == value["odds_threshold_max"].default
+    assert DEFAULT_PARAMS["min_probability"] == value["probability_threshold"].default
+
+
+def test_analysis_markets_match_select_value_bets():
+    frame = fixed_slate()
+    markets, _, selected = select_bets(frame)
+
+    keys = [market_key for _, market_key, _ in ANALYSIS_MARKETS]
+    best_odds = np.zeros((len(frame), len(keys)))
+    true_probs = np.zeros_like(best_odds)
+    for market, key in ANALYSIS_MARKET_KEYS.items():
+        best_odds[:, keys.index(key)] = frame[BACKTEST_MARKETS[market][0]]
+        true_probs[:, keys.index(key)] = frame[f"prob_{market}"]
+    counts = np.repeat(frame["bookmakers"].to_numpy()[:, None], len(keys), axis=1)
+    entries = [("L", {"home": h, "away": a, "time": datetime(2026, 1, 1)})
+               for h, a in zip(frame["home_team"], frame["away_team"])]
+
+    rows, bets = select_value_bets(entries, best_odds, np.zeros_like(best_odds), counts, true_probs)
+    market_keys = {name: key for name, key, _ in ANALYSIS_MARKETS}
+    live = {(int(row), market_keys[bet[3]]) for row, bet in zip(rows, bets)}
+
+    backtest = {(int(row), ANALYSIS_MARKET_KEYS[markets[column]])
+                for row, column in zip(*np.nonzero(selected)) if markets[column] != MATCH_MARKET}
+    assert backtest == live
+    assert live
+
+
+def test_match_market_matches_value_bet():
+    frame = fixed_slate()
+    markets, _, selected = select_bets(frame)
+    column = markets.index(MATCH_MARKET)
+
+    odds_min, odds_max, threshold = (inspect.signature(find_value_bets).parameters[name].default
+                                     for name in ("odds_threshold_min", "odds_threshold_max",
+                                                  "probability_threshold"))
+    live = []
+    for i, (prob, home_odds) in enumerate(zip(frame["prob_home"], frame["odds_home"])):
+        if not odds_min <= home_odds <= odds_max:
+            continue
+        analysis = {"calculated_probability": prob, "edge": max(0, prob - 1 / home_odds), "analysis": {}}
+        match = {"home_team": "H", "away_team": "A", "league": "L", "date": datetime(2026, 1, 1)}
+        bet = _value_bet(match, [home_odds, 3.5, 4.0], analysis, threshold, datetime(2026, 1, 1))
+        if bet is not None and bet["bet_type"].startswith("П1"):
+            live.append(i)
+
+    assert np.nonzero(selected[:, column])[0].tolist() == live
+    assert live
+
+
+def test_synthetic_odds_do_not_use_model_probabilities():
+    frame = fixed_slate(size=300)
+    odds_columns = [odds_column for odds_column, _ in BACKTEST_MARKETS.values()]
+    first = add_synthetic_odds(frame)[odds_columns]
+    shuffled = frame.assign(**{f"prob_{m}": frame[f"prob_{m}"].to_numpy()[::-1] for m in BACKTEST_MARKETS})
+    assert first.equals(add_synthetic_odds(shuffled)[odds_columns])
+
+
+def test_run_backtest_counts_selected_bets():
+    frame = fixed_slate(size=500)
+    _, _, selected = select_bets(frame)
+    report = run_backtest(frame)
+    assert report["bets"] == int(selected.sum())
+    assert report["params"] == DEFAULT_PARAMS
@@ -0,0 +1,50 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from providers import SyntheticProvider, set_provider
+from real_apis import MatchSnapshot, fetch_leagues_concurrently
+
+LEAGUES = {"Быстрая": 1, "Медленная": 2, "Сломанная": 3, "Зависшая": 4}
+
+
+class StubProvider(SyntheticProvider):
+    """Синтетический фид с задержками и ошибкой по id лиги"""
+
+    DELAYS = {1: 0.0, 2: 0.3, 4: 1.5}
+
+    def league_matches(self, league_id, league_name):
+        if league_id == 3:
+            raise RuntimeError("HTTP 500")
+        time.sleep(self.DELAYS[league_id])
+        return super().league_matches(league_id, league_name)
+
+
+@pytest.fixture(autouse=True)
+def stub_provider():
+    set_provider(StubProvider(0, base_time=datetime(2026, 1, 1)))
+    yield
+    set_provider(None)
+
+
+def test_failed_and_slow_leagues_are_reported():
+    started = time.perf_counter()
+    matches, timings, failed = fetch_leagues_concurrently(LEAGUES, max_workers=4, timeout=0.6)
+    wall_time = time.perf_counter() - started
+
+    # Лиги грузятся параллельно и зависшая не держит остальных: последовательно было бы > 1.8 сек
+    assert wall_time < 1.2
+    assert sorted(failed) == ["Зависшая", "Сломанная"]
+    assert matches["Быстрая"] and matches["Медленная"]
+    assert matches["Сломанная"] == [] and matches["Зависшая"] == []
+    assert list(matches) == list(LEAGUES)
+    assert timings["Медленная"] >= 0.3
+
+
+def test_snapshot_keeps_partial_results():
+    snapshot = MatchSnapshot(LEAGUES, max_workers=4, timeout=0.6)
+    assert sorted(snapshot.failed) == ["Зависшая", "Сломанная"]
+    assert snapshot.total_matches == len(snapshot.matches_by_league["Быстрая"]) + len(
+        snapshot.matches_by_league["Медленная"])
+    assert snapshot.wall_time < 1.2
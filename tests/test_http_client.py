@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+from http_client import MAX_RETRY_AFTER, HttpClient, TokenBucket
+from metrics import format_stats
+
+# Лимит, при котором token bucket не ждёт: паузы в sleeps - только между повторами
+UNLIMITED = {"127.0.0.1": (1000.0, 100)}
+
+LAST_MODIFIED = "Thu, 01 Jan 2026 10:00:00 GMT"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Отвечает по пути: /ok, /etag, /modified, /flaky (503 до каждого третьего), /retry-after/<сек>"""
+
+    hits = {}
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        count = self.hits[path] = self.hits.get(path, 0) + 1
+        if path == "/etag" and self.headers.get("If-None-Match") == '"v1"':
+            return self._reply(304)
+        if path == "/modified" and self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            return self._reply(304)
+        if path == "/flaky" and count % 3:
+            return self._reply(503)
+        if path.startswith("/retry-after/") and count == 1:
+            return self._reply(429, {"Retry-After": path.rsplit("/", 1)[1]})
+        headers = {"/etag": {"ETag": '"v1"'}, "/modified": {"Last-Modified": LAST_MODIFIED}}.get(path, {})
+        self._reply(200, headers, json.dumps({"path": path, "count": count}).encode())
+
+    def _reply(self, status, headers=None, body=b""):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StubHandler.hits = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Записывает паузы клиента между повторами вместо того, чтобы ждать"""
+    recorded = []
+    monkeypatch.setattr(http_client.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # 2 токена из запаса, ещё 4 - по 1/20 сек
+    assert time.monotonic() - started >= 4 / 20 * 0.9
+
+
+def test_retries_take_tokens(server):
+    client = HttpClient(rate_limits={"127.0.0.1": (20, 1)}, retries=3, backoff=0.0)
+    started = time.monotonic()
+    for _ in range(2):
+        assert client.get_json(f"{server}/flaky")["path"] == "/flaky"
+    elapsed = time.monotonic() - started
+
+    assert StubHandler.hits["/flaky"] == 6
+    assert client.retried == 4
+    # 6 попыток при 20 запросах в секунду и запасе в 1 токен
+    assert elapsed >= 5 / 20 * 0.9
+
+
+def test_gives_up_after_retries(server, sleeps):
+    client = HttpClient(UNLIMITED, retries=1, backoff=0.5)
+    assert client.get(f"{server}/flaky").status_code == 503
+    assert StubHandler.hits["/flaky"] == 2
+    assert sleeps == [0.5]
+
+
+def test_retry_after_is_honored_and_capped(server, sleeps):
+    client = HttpClient(UNLIMITED, retries=2, backoff=0.1)
+    assert client.get_json(f"{server}/retry-after/2")["count"] == 2
+    assert client.get_json(f"{server}/retry-after/3600")["count"] == 2
+    assert client.get_json(f"{server}/retry-after/soon")["count"] == 2
+    assert sleeps == [2.0, MAX_RETRY_AFTER, 0.1]
+
+
+@pytest.mark.parametrize("path", ["/etag", "/modified"])
+def test_not_modified_reuses_stored_response(server, path):
+    client = HttpClient()
+    first = client.get(f"{server}{path}", params={"q": 1})
+    second = client.get(f"{server}{path}", params={"q": 1})
+    assert second is first
+    assert second.json() == {"path": path, "count": 1}
+    assert StubHandler.hits[path] == 2
+    assert client.not_modified == 1
+
+    # Другие параметры - другой ресурс: валидаторы не переносятся
+    assert client.get(f"{server}{path}", params={"q": 2}).json()["count"] == 3
+
+
+def test_latency_percentiles_for_stats(server):
+    client = HttpClient()
+    for _ in range(5):
+        client.get(f"{server}/ok")
+    client.get(f"{server}/ok", provider="stub")
+
+    snapshot = client.snapshot()
+    assert snapshot["127.0.0.1"]["count"] == 5
+    assert snapshot["stub"]["count"] == 1
+    stats = snapshot["127.0.0.1"]
+    assert 0 < stats["p50"] <= stats["p95"] <= stats["p99"]
+    assert client.latency_percentiles()["count"] == 6
+
+    table = format_stats(snapshot, title="провайдер").splitlines()
+    assert table[0].startswith("провайдер")
+    assert table[1].split()[:2] == ["127.0.0.1", "5"]
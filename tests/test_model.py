@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import EloEngine
+
+TEAMS = [f"Team {i}" for i in range(12)]
+
+
+def synthetic_history(days: int = 60, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for day in pd.date_range("2025-08-01", periods=days, freq="D"):
+        order = rng.permutation(len(TEAMS))
+        for home, away in order[:6].reshape(-1, 2):
+            rows.append((day, TEAMS[home], TEAMS[away], *rng.poisson((1.4, 1.1))))
+    return pd.DataFrame(rows, columns=["date", "home_team", "away_team", "home_goals", "away_goals"])
+
+
+@pytest.fixture
+def history():
+    return synthetic_history()
+
+
+def split(history, day):
+    cutoff = pd.Timestamp(day)
+    return history[history["date"] <= cutoff], history[history["date"] > cutoff]
+
+
+def test_checkpoint_round_trip_keeps_rating_history(history, tmp_path):
+    first, second = split(history, "2025-09-05")
+    engine = EloEngine(track_history=True)
+    engine.update(first)
+    path = str(tmp_path / "elo.npz")
+    engine.save_checkpoint(path)
+    restored = EloEngine.load_checkpoint(path)
+
+    assert restored.track_history
+    assert restored.as_dict() == engine.as_dict()
+    assert restored.last_date == engine.last_date
+    assert restored.last_day_matches == engine.last_day_matches
+    dates = pd.date_range("2025-07-31", "2025-09-07", freq="D")
+    for team in TEAMS:
+        for date in dates:
+            assert restored.rating_at(team, date) == engine.rating_at(team, date)
+
+    # После загрузки история продолжает расти так же, как у непрерывного движка
+    engine.update(second)
+    restored.update(second)
+    assert restored.as_dict() == engine.as_dict()
+    for team in TEAMS:
+        for date in pd.date_range("2025-09-01", "2025-10-01", freq="D"):
+            assert restored.rating_at(team, date) == engine.rating_at(team, date)
+
+
+def test_checkpoint_is_loaded_without_pickle(history, tmp_path):
+    engine = EloEngine(track_history=True)
+    engine.update(history)
+    path = str(tmp_path / "elo.npz")
+    engine.save_checkpoint(path)
+    with np.load(path, allow_pickle=False) as data:
+        assert all(data[name].dtype != object for name in data.files)
+
+
+def test_refeed_after_checkpoint_matches_full_run(history, tmp_path):
+    first, _ = split(history, "2025-09-05")
+    full = EloEngine()
+    full.update(history)
+
+    engine = EloEngine()
+    engine.update(first)
+    path = str(tmp_path / "elo.npz")
+    engine.save_checkpoint(path)
+    restored = EloEngine.load_checkpoint(path)
+    # Поток заново подаёт день последнего чекпойнта: уже применённые матчи пропускаются
+    restored.update(history[history["date"] >= pd.Timestamp("2025-09-05")])
+    assert restored.as_dict() == pytest.approx(full.as_dict())
+    assert restored.matches_processed == full.matches_processed
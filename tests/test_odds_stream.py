@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from odds_stream import OddsStream, match_ids, random_ticks, replay
+from providers import SyntheticProvider, set_provider
+from real_apis import ANALYSIS_MARKETS, MatchSnapshot, select_value_bets
+
+
+def full_recompute(stream: OddsStream) -> list:
+    """VALUE ставки по всей текущей матрице потока, как в analyze_matches"""
+    market_keys = [market_key for _, market_key, _ in ANALYSIS_MARKETS]
+    best_odds, spreads, counts = stream.matrix.summary(market_keys)
+    _, bets = select_value_bets(stream.entries, best_odds, spreads, counts, stream.true_probs,
+                                stream.min_value, stream.odd_min, stream.odd_max)
+    bets.sort(key=lambda x: x[0], reverse=True)
+    return bets
+
+
+@pytest.fixture(autouse=True)
+def restore_provider():
+    yield
+    set_provider(None)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_stream_matches_full_recompute(seed):
+    set_provider(SyntheticProvider(seed, base_time=datetime(2026, 1, 1)))
+    stream = OddsStream(MatchSnapshot())
+    assert len(stream.rows) == len(stream.entries)
+
+    for _ in replay(stream, random_ticks(stream, 5000, seed=seed), batch_size=50):
+        pass
+
+    assert stream.current_bets() == full_recompute(stream)
+
+
+def test_match_ids_are_unique_for_duplicate_fixtures():
+    set_provider(SyntheticProvider(0, base_time=datetime(2026, 1, 1)))
+    matches = [match for _, league_matches in MatchSnapshot().items() for match in league_matches]
+    duplicated = matches + matches[:3]
+
+    ids = match_ids(duplicated)
+    assert len(set(ids)) == len(duplicated)
+    assert ids[len(matches)] == ids[0] + " #2"
@@ -0,0 +1,19 @@
+import pytest
+
+from providers import MatchProvider, SyntheticProvider
+
+
+class LeagueOnlyProvider(MatchProvider):
+    def league_matches(self, league_id, league_name):
+        return []
+
+
+def test_incomplete_provider_fails_on_creation():
+    with pytest.raises(TypeError, match="fixtures"):
+        LeagueOnlyProvider()
+
+
+def test_synthetic_provider_implements_interface():
+    provider = SyntheticProvider(1)
+    assert provider.cache_key.startswith("synthetic:1:")
+    assert provider.cache_key != SyntheticProvider(2).cache_key
@@ -0,0 +1,302 @@
+import json
+import pickle
+import time
+from datetime import datetime
+
+import pytest
+
+from shared_store import (LeaderElection, RedisBetHistory, RedisStore, SharedStore, SQLiteStore, decode_result,
+                          encode_result)
+from user_settings import UserSettings
+
+
+class FakeRedis:
+    """Минимальная замена redis.Redis в памяти: только команды, которые использует RedisStore"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.zcalls = []
+
+    def _alive(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and self._alive(key):
+            return None
+        self.data[key] = self._bytes(value)
+        self.expires.pop(key, None)
+        if px is not None:
+            self.expires[key] = time.time() + px / 1000
+        return True
+
+    def get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def eval(self, script, numkeys, key, *args):
+        if script == RedisBetHistory.CLAIM_LEGACY:
+            return self.data.pop(key, [])
+        owner = args[0]
+        args = args[1:]
+        if self.get(key) != self._bytes(owner):
+            return 0
+        if script == RedisStore.RENEW_LEASE:
+            self.expires[key] = time.time() + int(args[0]) / 1000
+            return 1
+        if script == RedisStore.RELEASE_LEASE:
+            return self.delete(key)
+        raise NotImplementedError(script)
+
+    def _hash(self, key):
+        return self.data.setdefault(key, {})
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        hash_ = self._hash(key)
+        added = sum(self._bytes(f) not in hash_ for f in items)
+        hash_.update({self._bytes(f): self._bytes(v) for f, v in items.items()})
+        return added
+
+    def hsetnx(self, key, field, value):
+        hash_ = self._hash(key)
+        if self._bytes(field) in hash_:
+            return 0
+        hash_[self._bytes(field)] = self._bytes(value)
+        return 1
+
+    def hget(self, key, field):
+        return self._hash(key).get(self._bytes(field))
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hdel(self, key, *fields):
+        hash_ = self._hash(key)
+        return sum(hash_.pop(self._bytes(field), None) is not None for field in fields)
+
+    def hexists(self, key, field):
+        return self._bytes(field) in self._hash(key)
+
+    def hgetall(self, key):
+        return dict(self._hash(key))
+
+    def hscan_iter(self, key):
+        return iter(list(self._hash(key).items()))
+
+    def rpush(self, key, *values):
+        list_ = self.data.setdefault(key, [])
+        list_.extend(self._bytes(value) for value in values)
+        return len(list_)
+
+    def lrange(self, key, start, end):
+        list_ = self.data.get(key, [])
+        end = len(list_) if end == -1 else end + 1
+        return list_[start:end]
+
+    def incrby(self, key, amount):
+        value = int(self.data.get(key, b"0")) + amount
+        self.data[key] = self._bytes(value)
+        return value
+
+    def zadd(self, key, mapping):
+        zset = self.data.setdefault(key, {})
+        added = sum(self._bytes(member) not in zset for member in mapping)
+        zset.update({self._bytes(member): float(score) for member, score in mapping.items()})
+        return added
+
+    def _zsorted(self, key):
+        self.zcalls.append(key)
+        return sorted(self.data.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    @staticmethod
+    def _score_bound(bound, lower):
+        bound = str(bound)
+        if bound in ("-inf", "+inf"):
+            return lambda score: True
+        if bound.startswith("("):
+            value = float(bound[1:])
+            return (lambda score: score > value) if lower else (lambda score: score < value)
+        value = float(bound)
+        return (lambda score: score >= value) if lower else (lambda score: score <= value)
+
+    def zrange(self, key, start, end):
+        members = [member for member, _ in self._zsorted(key)]
+        end = len(members) if end == -1 else end + 1
+        return members[start:end]
+
+    def zrangebyscore(self, key, low, high, start=None, num=None):
+        above, below = self._score_bound(low, True), self._score_bound(high, False)
+        members = [member for member, score in self._zsorted(key) if above(score) and below(score)]
+        return members[start:start + num] if start is not None else members
+
+    def zrevrangebyscore(self, key, high, low, start=None, num=None):
+        members = self.zrangebyscore(key, low, high)[::-1]
+        return members[start:start + num] if start is not None else members
+
+
+BETS = [
+    {"match": "Arsenal vs Chelsea", "league": "EPL", "bet_type": "П1 (Победа домашней)", "odds": 1.8,
+     "edge": 0.05, "match_date": datetime(2026, 1, 2, 19, 0), "analysis_details": {"h2h_advantage": 0.01}},
+]
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "shared.db"))
+    return RedisStore(client=FakeRedis())
+
+
+def test_result_round_trip_keeps_datetimes(store):
+    assert store.latest_result("candidates") is None
+    before = time.time()
+    store.publish_result("candidates", BETS)
+    value, published_at = store.latest_result("candidates")
+    assert value == BETS
+    assert published_at >= before
+
+
+def test_pickled_results_are_not_loaded(store):
+    payload = pickle.dumps(BETS)
+    if isinstance(store, RedisStore):
+        store.client.set("betbot:result:candidates", payload)
+    else:
+        store.publish_result("candidates", [])
+        conn = store._connect()
+        conn.execute("UPDATE results SET value = ? WHERE key = ?", (payload, "candidates"))
+        conn.close()
+    assert store.latest_result("candidates") is None
+
+
+def test_encode_result_rejects_arbitrary_objects():
+    with pytest.raises(TypeError):
+        encode_result([object()])
+    assert decode_result(encode_result({"$datetime": 1})) == {"$datetime": 1}
+
+
+def test_incomplete_store_fails_on_creation():
+    class ResultsOnlyStore(SharedStore):
+        def publish_result(self, key, value):
+            pass
+
+        def latest_result(self, key):
+            return None
+
+    with pytest.raises(TypeError, match="acquire_lease"):
+        ResultsOnlyStore()
+
+
+def test_lease_is_exclusive_until_released(store):
+    assert store.acquire_lease("analysis", "a", 30)
+    assert not store.acquire_lease("analysis", "b", 30)
+    assert store.acquire_lease("analysis", "a", 30)
+    store.release_lease("analysis", "b")
+    assert not store.acquire_lease("analysis", "b", 30)
+    store.release_lease("analysis", "a")
+    assert store.acquire_lease("analysis", "b", 30)
+
+
+def test_expired_lease_is_taken_over(store):
+    assert store.acquire_lease("analysis", "a", 0.05)
+    time.sleep(0.1)
+    assert store.acquire_lease("analysis", "b", 30)
+    assert not store.acquire_lease("analysis", "a", 30)
+
+
+def test_leader_election(store):
+    first = LeaderElection(store, owner="first")
+    second = LeaderElection(store, owner="second")
+    assert first.is_leader()
+    assert not second.is_leader()
+    first.release()
+    assert second.is_leader()
+
+
+def test_alert_store(store):
+    alerts = store.alerts
+    assert alerts.subscribe(42)
+    assert not alerts.subscribe(42)
+    assert alerts.subscribe(-100500)
+    assert alerts.subscribers() == [42, -100500]
+    assert alerts.unsubscribe(42)
+    assert not alerts.is_subscribed(42)
+
+    alerts.mark_seen(BETS)
+    seen = alerts.seen(["EPL|Arsenal vs Chelsea|П1 (Победа домашней)", "missing"])
+    assert seen == {"EPL|Arsenal vs Chelsea|П1 (Победа домашней)": (1.8, 0.05)}
+    assert alerts.prune(max_age_hours=-1) == 1
+    assert alerts.seen(["EPL|Arsenal vs Chelsea|П1 (Победа домашней)"]) == {}
+
+
+def test_channel_username_subscription(store):
+    alerts = store.alerts
+    assert alerts.subscribe("@mychannel")
+    assert alerts.subscribe(-100500)
+    assert not alerts.subscribe("@mychannel")
+    assert alerts.is_subscribed("@mychannel")
+    assert alerts.subscribers() == ["@mychannel", -100500]
+    assert alerts.unsubscribe("@mychannel")
+    assert alerts.subscribers() == [-100500]
+
+
+def test_settings_store(store):
+    settings = store.settings
+    assert settings.get(7) == UserSettings()
+    settings.update(7, leagues=("EPL",), min_edge=0.03)
+    settings._cache.clear()
+    assert settings.get(7) == UserSettings(leagues=("EPL",), min_edge=0.03)
+
+
+def test_redis_bet_history():
+    history = RedisStore(client=FakeRedis()).history
+    rows = [
+        {"timestamp": "2026-01-01T10:00:00", "match": "A vs B", "market": "П1"},
+        {"timestamp": "2026-01-02T10:00:00", "match": "C vs D", "market": "П2"},
+        {"timestamp": "2026-01-02T10:00:00", "match": "C vs D", "market": "П2"},
+        {"timestamp": "2026-01-03T09:00:00", "match": "A vs B", "market": "П2"},
+    ]
+    history.append_many(rows[:2])
+    history.append_many(rows[2:])
+    assert history.recent(2) == rows[2:]
+    assert history.query(since="2026-01-02") == rows[1:]
+    assert history.query(since="2026-01-02", until="2026-01-03") == rows[1:3]
+    assert history.query(until="2026-01-02T10:00:00") == rows[:1]
+    assert history.query(match="A vs B") == [rows[0], rows[3]]
+    assert history.query(market="П2", limit=2) == rows[2:]
+    assert history.query(limit=1) == rows[3:]
+    history.clear()
+    assert history.recent() == []
+
+
+def test_redis_bet_history_query_reads_only_the_range():
+    client = FakeRedis()
+    history = RedisStore(client=client).history
+    history.append_many([{"timestamp": f"2026-01-{day:02d}T12:00:00", "match": "A vs B", "market": "П1"}
+                         for day in range(1, 29)])
+    client.zcalls.clear()
+    assert len(history.query(since="2026-01-27")) == 2
+    assert client.zcalls == [history.key]
+    assert not any(isinstance(value, list) for value in client.data.values())
+
+
+def test_redis_bet_history_migrates_legacy_list():
+    client = FakeRedis()
+    rows = [{"timestamp": "2026-01-01T10:00:00", "match": "A vs B", "market": "П1"}]
+    client.rpush("betbot:bets", *[json.dumps(row) for row in rows])
+    history = RedisBetHistory(client, "betbot:")
+    assert history.recent() == rows
+    assert "betbot:bets" not in client.data
+    assert RedisBetHistory(client, "betbot:").recent() == rows
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+
+from telegram import Update
+
+from webhook import WebhookServer, post_updates
+
+SECRET = "s3cret"
+
+# Обновления в том виде, в каком их присылает Telegram
+RECORDED_UPDATES = [
+    {
+        "update_id": 1001,
+        "message": {
+            "message_id": 1,
+            "date": 1767261600,
+            "chat": {"id": 42, "type": "private", "first_name": "Тест"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Тест"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    },
+    {
+        "update_id": 1002,
+        "message": {
+            "message_id": 2,
+            "date": 1767261660,
+            "chat": {"id": 42, "type": "private", "first_name": "Тест"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Тест"},
+            "text": "⚽ Текущие ставки",
+        },
+    },
+]
+
+
+class StubApplication:
+    """Вместо telegram.ext.Application: запоминает обновления, переданные в process_update"""
+
+    bot = None
+
+    def __init__(self):
+        self.updates = []
+
+    async def process_update(self, update):
+        self.updates.append(update)
+
+
+async def request(port: int, method: str, path: str, body: bytes = b"", headers: dict = None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def run_server(test, **options):
+    async def main():
+        application = StubApplication()
+        server = WebhookServer(application, path="/telegram", secret_token=SECRET,
+                               host="127.0.0.1", port=0, **options)
+        await server.start()
+        try:
+            await test(server, application)
+        finally:
+            await server.stop(timeout=1)
+
+    asyncio.run(main())
+
+
+def post(server, update, secret=SECRET):
+    return request(server.port, "POST", "/telegram", json.dumps(update).encode(),
+                   {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else None)
+
+
+def test_secret_token_is_checked():
+    async def test(server, application):
+        assert (await post(server, RECORDED_UPDATES[0], secret="wrong"))[0] == 403
+        assert (await post(server, RECORDED_UPDATES[0], secret=None))[0] == 403
+        assert (await post(server, RECORDED_UPDATES[0]))[0] == 200
+        assert server.rejected == 2
+        assert server.received == 1
+
+    run_server(test)
+
+
+def test_unknown_method_and_path():
+    async def test(server, application):
+        assert (await request(server.port, "GET", "/telegram"))[0] == 405
+        assert (await request(server.port, "POST", "/missing"))[0] == 404
+        status, body = await request(server.port, "GET", "/healthz")
+        assert status == 200
+        assert json.loads(body)["received"] == 0
+
+    run_server(test)
+
+
+def test_invalid_json_is_rejected():
+    async def test(server, application):
+        status, _ = await request(server.port, "POST", "/telegram", b"{not json",
+                                  {"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        assert status == 400
+
+    run_server(test)
+
+
+def test_full_queue_returns_503():
+    async def test(server, application):
+        # Без обработчиков очередь не разбирается
+        assert (await post(server, RECORDED_UPDATES[0]))[0] == 200
+        assert (await post(server, RECORDED_UPDATES[1]))[0] == 503
+        assert server.received == 1
+
+    run_server(test, workers=0, queue_size=1)
+
+
+def test_recorded_updates_are_parsed():
+    async def test(server, application):
+        loop = asyncio.get_running_loop()
+        statuses = await loop.run_in_executor(
+            None, post_updates, f"http://127.0.0.1:{server.port}/telegram", RECORDED_UPDATES, SECRET
+        )
+        assert statuses == {200: len(RECORDED_UPDATES)}
+        await asyncio.wait_for(server._queue.join(), 5)
+
+        assert server.processed == len(RECORDED_UPDATES)
+        assert all(isinstance(update, Update) for update in application.updates)
+        assert sorted(update.update_id for update in application.updates) == [1001, 1002]
+        texts = {update.message.text for update in application.updates}
+        assert texts == {"/start", "⚽ Текущие ставки"}
+        assert all(update.effective_chat.id == 42 for update in application.updates)
+
+    run_server(test)
+
+
+def test_slow_client_times_out():
+    async def test(server, application):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"POST /telegram HTTP/1.1\r\nContent-Length: 100\r\n\r\n{")
+        await writer.drain()
+        started = time.perf_counter()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        assert response.startswith(b"HTTP/1.1 408")
+        assert time.perf_counter() - started < 2
+
+    run_server(test, read_timeout=0.2)
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from metrics import timed
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Настройки пользователей: SQLite-файл и время жизни загруженных настроек в памяти
+USER_SETTINGS_DB = os.environ.get("USER_SETTINGS_DB", "user_settings.db")
+USER_SETTINGS_TTL = float(os.environ.get("USER_SETTINGS_TTL", "60"))
+
+# Сколько ставок показывать пользователю
+TOP_BETS = 5
+
+# Типы ставок find_value_bets: первое слово bet_type
+MARKET_TYPES = ("П1", "1X", "П2")
+
+
+class UserSettings(NamedTuple):
+    """
+    Персональные фильтры
+
+    leagues и markets - пустой кортеж означает «все». Окно коэффициентов,
+    как и в find_value_bets, применяется к коэффициенту на победу хозяев.
+    """
+    leagues: Tuple[str, ...] = ()
+    odds_min: float = 1.3
+    odds_max: float = 1.9
+    min_probability: float = 0.60
+    min_edge: float = 0.0
+    markets: Tuple[str, ...] = ()
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "UserSettings":
+        data = json.loads(raw)
+        data["leagues"] = tuple(data.get("leagues", ()))
+        data["markets"] = tuple(data.get("markets", ()))
+        return cls(**{key: value for key, value in data.items() if key in cls._fields})
+
+
+DEFAULT_SETTINGS = UserSettings()
+
+
+class SettingsStore:
+    """
+    Настройки пользователей с ленивой загрузкой
+
+    Настройки читаются из хранилища при первом обращении и держатся в памяти
+    ttl секунд, поэтому изменения, сделанные через другую реплику, подхватываются.
+    Хранилище по умолчанию - SQLite; сетевые бэкенды переопределяют _load/_save.
+    """
+
+    def __init__(self, path: str = USER_SETTINGS_DB, ttl: float = USER_SETTINGS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._cache: Dict[int, Tuple[UserSettings, float]] = {}
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def get(self, user_id: int) -> UserSettings:
+        entry = self._cache.get(user_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        settings = self._load(user_id) or DEFAULT_SETTINGS
+        with self._lock:
+            self._cache[user_id] = (settings, time.monotonic())
+        return settings
+
+    def update(self, user_id: int, **changes) -> UserSettings:
+        """Меняет и сохраняет часть настроек"""
+        settings = self.get(user_id)._replace(**changes)
+        self._save(user_id, settings)
+        with self._lock:
+            self._cache[user_id] = (settings, time.monotonic())
+        return settings
+
+    def reset(self, user_id: int) -> UserSettings:
+        self._save(user_id, DEFAULT_SETTINGS)
+        with self._lock:
+            self._cache[user_id] = (DEFAULT_SETTINGS, time.monotonic())
+        return DEFAULT_SETTINGS
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_settings ("
+                "user_id INTEGER PRIMARY KEY, settings TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _load(self, user_id: int) -> Optional[UserSettings]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT settings FROM user_settings WHERE user_id = ?", (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return UserSettings.from_json(row[0]) if row is not None else None
+
+    def _save(self, user_id: int, settings: UserSettings):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO user_settings VALUES (?, ?, ?)",
+                    (user_id, settings.to_json(), time.time()),
+                )
+        finally:
+            conn.close()
+
+
+class BetIndex:
+    """
+    Индекс кандидатов одного полного анализа для персональных выборок
+
+    Кандидаты упорядочены по EDGE один раз при построении; числовые поля лежат
+    в numpy-массивах, а строки по лигам и типам ставок - в отдельных индексах.
+    Выборка по настройкам - пересечение индексов и одна векторная маска,
+    результаты для одинаковых настроек кэшируются.
+    """
+
+    def __init__(self, candidates: List[Dict], cache_size: int = 256):
+        edges = np.array([bet["edge"] for bet in candidates], dtype=float)
+        with timed("sort"):
+            order = np.argsort(-edges, kind="stable")
+            self.bets = [candidates[i] for i in order]
+        self.edge = edges[order]
+        self.probability = np.array([bet["probability"] for bet in self.bets], dtype=float)
+        self.home_odds = np.array([bet["home_odds"] for bet in self.bets], dtype=float)
+
+        self.by_league: Dict[str, np.ndarray] = _group_rows(bet["league"] for bet in self.bets)
+        self.by_market: Dict[str, np.ndarray] = _group_rows(market_type(bet) for bet in self.bets)
+        self.all_rows = np.arange(len(self.bets))
+
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple, List[Dict]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.bets)
+
+    def leagues(self) -> List[str]:
+        return list(self.by_league)
+
+    @timed("filter")
+    def query(self, settings: UserSettings = DEFAULT_SETTINGS, limit: int = TOP_BETS) -> List[Dict]:
+        """Лучшие по EDGE ставки, проходящие фильтры settings"""
+        key = (settings, limit)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        rows = self.all_rows
+        if settings.leagues:
+            rows = _union_rows(self.by_league, settings.leagues)
+        if settings.markets:
+            rows = np.intersect1d(rows, _union_rows(self.by_market, settings.markets), assume_unique=True)
+
+        mask = (
+            (self.home_odds[rows] >= settings.odds_min)
+            & (self.home_odds[rows] <= settings.odds_max)
+            & (self.probability[rows] >= settings.min_probability)
+            & (self.edge[rows] >= settings.min_edge)
+        )
+        result = [self.bets[i] for i in rows[mask][:limit]]
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+
+def market_type(bet: Dict) -> str:
+    """Тип ставки из bet_type: «П1 (Победа домашней)» -> «П1»"""
+    return bet["bet_type"].split(" ", 1)[0]
+
+
+def _group_rows(values) -> Dict[str, np.ndarray]:
+    groups: Dict[str, List[int]] = {}
+    for row, value in enumerate(values):
+        groups.setdefault(value, []).append(row)
+    return {value: np.array(rows, dtype=np.int64) for value, rows in groups.items()}
+
+
+def _union_rows(index: Dict[str, np.ndarray], keys: Tuple[str, ...]) -> np.ndarray:
+    """Отсортированные строки по всем keys: порядок по EDGE сохраняется"""
+    parts = [index[key] for key in keys if key in index]
+    if not parts:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0]
@@ -0,0 +1,278 @@
+import os
+import sys
+import hmac
+import json
+import signal
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from telegram import Update
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Webhook-режим: Telegram сам присылает обновления на WEBHOOK_URL + WEBHOOK_PATH
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", os.environ.get("PORT", "8080")))
+
+# Обработчики обновлений и ограничение очереди: при переполнении отвечаем 503, Telegram повторит
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "100"))
+WEBHOOK_MAX_BODY = 1024 * 1024
+
+# Сколько ждать строку запроса, заголовки и тело: медленный клиент не держит соединение вечно
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+# Обработчик маршрута: (тело запроса, заголовки) -> (статус, Content-Type, тело ответа)
+RouteHandler = Callable[[bytes, Dict[str, str]], Awaitable[Tuple[int, str, bytes]]]
+
+
+class HttpServer:
+    """
+    Минимальный HTTP/1.1-сервер на asyncio: маршруты (метод, путь) -> обработчик
+
+    Одно соединение - один запрос (Connection: close). Нужен webhook-режиму
+    и эндпоинту метрик, не тянет внешних зависимостей.
+    """
+
+    def __init__(self, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                 read_timeout: float = HTTP_READ_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.read_timeout = read_timeout
+        self._routes: Dict[Tuple[str, str], RouteHandler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def add_route(self, method: str, path: str, handler: RouteHandler):
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🌐 HTTP-сервер слушает {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, content_type, body = await self._read_and_route(reader)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            status, content_type, body = 400, "text/plain", b"bad request"
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        try:
+            await asyncio.wait_for(writer.drain(), self.read_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        writer.close()
+
+    async def _read_and_route(self, reader: asyncio.StreamReader) -> Tuple[int, str, bytes]:
+        try:
+            method, target, headers, body = await asyncio.wait_for(self._read_request(reader), self.read_timeout)
+        except asyncio.TimeoutError:
+            return 408, "text/plain", b"request timeout"
+        if body is None:
+            return 413, "text/plain", b"payload too large"
+
+        path = target.split("?", 1)[0]
+        handler = self._routes.get((method.upper(), path))
+        if handler is None:
+            known_path = any(route_path == path for _, route_path in self._routes)
+            return (405, "text/plain", b"method not allowed") if known_path else (404, "text/plain", b"not found")
+        return await handler(body, headers)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], Optional[bytes]]:
+        """(метод, цель, заголовки, тело); тело None - если больше WEBHOOK_MAX_BODY"""
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("bad request line")
+        method, target, _ = request_line
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", "0"))
+        if length > WEBHOOK_MAX_BODY:
+            return method, target, headers, None
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+
+class WebhookServer(HttpServer):
+    """
+    HTTP-сервер для обновлений Telegram
+
+    POST на path проверяет X-Telegram-Bot-Api-Secret-Token и кладёт обновление
+    в ограниченную очередь, которую разбирают workers задач через
+    application.process_update - те же обработчики, что и в режиме polling.
+    Дополнительные маршруты (метрики) регистрируются через add_route().
+    """
+
+    def __init__(self, application, path: str = WEBHOOK_PATH, secret_token: str = WEBHOOK_SECRET,
+                 workers: int = WEBHOOK_WORKERS, queue_size: int = WEBHOOK_QUEUE_SIZE,
+                 host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT, read_timeout: float = HTTP_READ_TIMEOUT):
+        super().__init__(host, port, read_timeout)
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = workers
+        self.received = 0
+        self.rejected = 0
+        self.processed = 0
+        self._queue: "asyncio.Queue" = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self.add_route("POST", path, self._handle_update)
+        self.add_route("GET", "/healthz", self._handle_health)
+
+    async def start(self):
+        await super().start()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        logger.info(f"🌐 Webhook: {self.path} ({self.workers} обработчиков)")
+
+    async def stop(self, timeout: float = 10.0):
+        """Перестаёт принимать запросы и дорабатывает очередь (не дольше timeout)"""
+        await super().stop()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не обработано обновлений: {self._queue.qsize()}")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _handle_update(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+        token = headers.get("x-telegram-bot-api-secret-token", "")
+        if self.secret_token and not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+            self.rejected += 1
+            logger.warning("🚫 Webhook-запрос с неверным секретом отклонён")
+            return 403, "text/plain", b"forbidden"
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, "text/plain", b"invalid json"
+
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            logger.warning(f"⚠️ Очередь обновлений переполнена ({self._queue.maxsize}), Telegram повторит")
+            return 503, "text/plain", b"busy"
+        self.received += 1
+        return 200, "text/plain", b"ok"
+
+    async def _handle_health(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+        return 200, "application/json", json.dumps({
+            "queued": self._queue.qsize(),
+            "received": self.received,
+            "processed": self.processed,
+            "rejected": self.rejected,
+        }).encode()
+
+    async def _worker(self):
+        while True:
+            data = await self._queue.get()
+            try:
+                update = Update.de_json(data, self.application.bot)
+                await self.application.process_update(update)
+                self.processed += 1
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки обновления: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+
+async def serve_webhook(application, server: WebhookServer, webhook_url: str = WEBHOOK_URL,
+                        allowed_updates: Optional[list] = None):
+    """
+    Жизненный цикл приложения в webhook-режиме (аналог Application.run_polling)
+
+    initialize -> post_init -> сервер -> setWebhook -> start; по SIGINT/SIGTERM -
+    остановка сервера с доработкой очереди, stop -> post_stop -> shutdown -> post_shutdown.
+    """
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopped.set)
+        except NotImplementedError:
+            pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await server.start()
+        await application.bot.set_webhook(
+            url=webhook_url.rstrip("/") + server.path,
+            secret_token=server.secret_token or None,
+            allowed_updates=allowed_updates,
+            max_connections=max(1, min(server.workers, 100)),
+        )
+        logger.info(f"✅ Webhook зарегистрирован: {webhook_url.rstrip('/')}{server.path}")
+        await application.start()
+        await stopped.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(application, webhook_url: str = WEBHOOK_URL, allowed_updates: Optional[list] = None,
+                routes: Optional[Dict[Tuple[str, str], RouteHandler]] = None, **server_options):
+    """Блокирующий запуск бота в webhook-режиме; routes - дополнительные маршруты {(метод, путь): обработчик}"""
+    async def main():
+        server = WebhookServer(application, **server_options)
+        for (method, path), handler in (routes or {}).items():
+            server.add_route(method, path, handler)
+        await serve_webhook(application, server, webhook_url, allowed_updates)
+
+    asyncio.run(main())
+
+
+def post_updates(url: str, updates: Iterable[dict], secret_token: str = WEBHOOK_SECRET) -> Dict[int, int]:
+    """Отправляет записанные обновления на локальный webhook; возвращает {HTTP-статус: количество}"""
+    import requests
+
+    statuses: Dict[int, int] = {}
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret_token} if secret_token else {}
+    with requests.Session() as session:
+        for update in updates:
+            status = session.post(url, json=update, headers=headers, timeout=10).status_code
+            statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+if __name__ == "__main__":
+    # python webhook.py updates.jsonl [http://localhost:8080/telegram]
+    if len(sys.argv) < 2:
+        print("Использование: python webhook.py <updates.jsonl> [url]")
+        sys.exit(1)
+    target = sys.argv[2] if len(sys.argv) > 2 else f"http://localhost:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    with open(sys.argv[1], encoding="utf-8") as f:
+        recorded = [json.loads(line) for line in f if line.strip()]
+    print(post_updates(target, recorded))